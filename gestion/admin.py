@@ -10,6 +10,10 @@ from datetime import datetime, timedelta
 from django.urls import path, reverse
 from django.shortcuts import render, redirect, get_object_or_404
 from .models import Client, Vehicule, Contrat
+from .replique import utiliser_replique
+from . import tableau_bord
+from asgiref.sync import async_to_sync
+from django.conf import settings
 from django.contrib.auth.models import User
 
 
@@ -19,50 +23,30 @@ class GestionAdminSite(AdminSite):
     index_title = 'Tableau de bord'
     index_template = 'admin/index.html'
 
+    @staticmethod
+    def _contexte(valeurs):
+        # Statistiques de base (table de cumul), tendances mensuelles (6 mois),
+        # top véhicules, contrats récents, véhicules disponibles (tableau_bord)
+        contrats_par_mois, revenus_par_mois = valeurs.pop('tendances')
+        return dict(valeurs, contrats_par_mois=contrats_par_mois, revenus_par_mois=revenus_par_mois)
+
     def get_stats_context(self, request):
-        # Statistiques de base
-        stats = {
-            'total_clients': Client.objects.count(),
-            'total_vehicules': Vehicule.objects.count(),
-            'vehicules_disponibles': Vehicule.objects.filter(disponible=True).count(),
-            'contrats_actifs': Contrat.objects.filter(statut='actif').count(),
-            'contrats_retard': Contrat.objects.filter(statut='en_retard').count(),
-        }
-        
-        # Tendances mensuelles
-        six_months_ago = datetime.now() - timedelta(days=180)
-        contrats_par_mois = (Contrat.objects
-            .filter(date_creation__gte=six_months_ago)
-            .annotate(mois=TruncMonth('date_creation'))
-            .values('mois')
-            .annotate(total=Count('id'))
-            .order_by('mois'))
-
-        revenus_par_mois = (Contrat.objects
-            .filter(date_creation__gte=six_months_ago)
-            .annotate(mois=TruncMonth('date_creation'))
-            .values('mois')
-            .annotate(total=Sum('montant_total'))
-            .order_by('mois'))
-
-        # Top véhicules
-        top_vehicules = (Vehicule.objects
-            .annotate(nombre_contrats=Count('contrat'))
-            .order_by('-nombre_contrats')[:5])
-
-        return {
-            'stats': stats,
-            'contrats_par_mois': list(contrats_par_mois),
-            'revenus_par_mois': list(revenus_par_mois),
-            'top_vehicules': top_vehicules,
-            'contrats_recent': Contrat.objects.all().order_by('-date_creation')[:5],
-            'vehicules_disponibles': Vehicule.objects.filter(disponible=True).order_by('prix_journalier')[:5],
-            'total_users': User.objects.count(),
-        }
+        return self._contexte(tableau_bord.calculer(tableau_bord.AGREGATS_ADMIN))
+
+    async def aget_stats_context(self, request):
+        """Version asynchrone : les agrégats indépendants sont calculés en parallèle."""
+        return self._contexte(await tableau_bord.acalculer(tableau_bord.AGREGATS_ADMIN))
 
     def index(self, request, extra_context=None):
         """Affiche le dashboard personnalisé avec stats."""
-        context = self.get_stats_context(request)
+        # Listes évaluées dans le bloc : le gabarit est rendu après la sortie.
+        # Sous ASGI, la vue admin reste synchrone (Django 4.2) : les agrégats sont
+        # calculés en parallèle sur la boucle du serveur
+        with utiliser_replique():
+            if settings.VUES_ASYNC:
+                context = async_to_sync(self.aget_stats_context)(request)
+            else:
+                context = self.get_stats_context(request)
         if extra_context:
             context.update(extra_context)
         return super().index(request, context)
@@ -97,7 +81,10 @@ class VehiculeAdmin(admin.ModelAdmin):
 
     def image_preview(self, obj):
         if obj.image:
-            return format_html('<img src="{}" style="width:80px;height:auto;border-radius:4px;" class="image-preview"/>', obj.image.url)
+            return format_html(
+                '<img src="{}" loading="lazy" decoding="async" style="width:80px;height:auto;border-radius:4px;" class="image-preview"/>',
+                obj.image_miniature_url,
+            )
         return "-"
     image_preview.short_description = 'Photo'
 
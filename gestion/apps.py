@@ -4,3 +4,19 @@ import os
 class GestionConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "gestion"
+
+    def ready(self):
+        # Connexion des signaux qui tiennent à jour les tables de cumul et le calendrier,
+        # de ceux du journal d'audit, du journal des contrats, du cache des PDF de contrats
+        # et des images dérivées
+        from . import signals_stats  # noqa: F401
+        from . import signals_calendrier  # noqa: F401
+        from . import signals_audit  # noqa: F401
+        from . import signals_journal  # noqa: F401
+        from . import signals_pdf  # noqa: F401
+        from . import signals_images  # noqa: F401
+
+        # Profil SQLite (WAL, busy_timeout...) appliqué à chaque nouvelle connexion
+        from django.db.backends.signals import connection_created
+        from .sqlite import configurer_connexion
+        connection_created.connect(configurer_connexion, dispatch_uid='gestion_sqlite_profil')
@@ -0,0 +1,105 @@
+"""Journal d'audit bufferisé (écriture différée).
+
+Les signaux de ``signals_audit`` appellent ``enregistrer()`` avec les seuls
+champs modifiés, au format JSON ``{"champ": [ancienne, nouvelle]}``.
+L'entrée n'est retenue qu'après le commit de la transaction (une écriture
+annulée n'est donc pas auditée), puis placée dans le tampon courant :
+
+* pendant une requête, ``AuditMiddleware`` ouvre un tampon écrit en un seul
+  ``bulk_create`` à la fin de la requête, et fournit l'utilisateur connecté ;
+* hors requête (commandes, tâches), ``with tampon(acteur=...)`` fait de même ;
+* sans tampon, l'entrée est écrite dès le commit.
+
+Le tampon d'une requête est écrit en une transaction ``IMMEDIATE``
+(``sqlite.ecrire``).
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+
+from .instrumentation import mesurer
+from .models import AuditLog
+from .sqlite import ecrire
+
+_tampon = ContextVar('audit_tampon', default=None)
+_acteur = ContextVar('audit_acteur', default=None)
+
+
+def acteur_courant():
+    """Nom de l'utilisateur de la requête ou du tampon courant ('' si inconnu)."""
+    acteur = _acteur.get()
+    if acteur is None:
+        return ''
+    if isinstance(acteur, str):
+        return acteur
+    # Requête : l'utilisateur n'est chargé qu'au premier enregistrement d'audit
+    user = getattr(acteur, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.get_username()
+    return ''
+
+
+def _apres_commit(*entrees):
+    tampon = _tampon.get()
+    if tampon is None:
+        with mesurer('audit'):
+            AuditLog.objects.bulk_create(entrees, batch_size=500)
+    else:
+        tampon.extend(entrees)
+
+
+def enregistrer(model, object_id, action, changes=None, acteur=None):
+    """Ajoute une entrée d'audit, écrite après le commit avec le tampon courant."""
+    entree = AuditLog(
+        actor=acteur or acteur_courant(),
+        model=model,
+        object_id=str(object_id),
+        action=action,
+        changes=changes,
+    )
+    transaction.on_commit(lambda: _apres_commit(entree))
+
+
+def enregistrer_lot(model, changements, action='created', acteur=None):
+    """Ajoute en une fois les entrées ``(object_id, changes)`` d'un même modèle (imports en masse)."""
+    acteur = acteur or acteur_courant()
+    entrees = [
+        AuditLog(actor=acteur, model=model, object_id=str(object_id), action=action, changes=changes)
+        for object_id, changes in changements
+    ]
+    if entrees:
+        transaction.on_commit(lambda: _apres_commit(*entrees))
+
+
+def vider(entrees):
+    if entrees:
+        with mesurer('audit'):
+            ecrire(lambda: AuditLog.objects.bulk_create(entrees, batch_size=500))
+
+
+@contextmanager
+def tampon(acteur=None):
+    """Regroupe les entrées d'audit du bloc et les écrit en une fois à la sortie.
+
+    ``acteur`` est un nom d'utilisateur ou une requête (utilisateur résolu à la demande).
+    Un tampon imbriqué réutilise le tampon englobant.
+    """
+    jeton_acteur = _acteur.set(acteur) if acteur is not None else None
+    if _tampon.get() is not None:
+        try:
+            yield
+        finally:
+            if jeton_acteur is not None:
+                _acteur.reset(jeton_acteur)
+        return
+
+    entrees = []
+    jeton_tampon = _tampon.set(entrees)
+    try:
+        yield
+    finally:
+        _tampon.reset(jeton_tampon)
+        if jeton_acteur is not None:
+            _acteur.reset(jeton_acteur)
+        vider(entrees)
@@ -0,0 +1,408 @@
+"""Banc d'essai des vues de ``gestion/urls.py`` (commande ``benchmark``).
+
+``generer_donnees()`` remplit une base vide avec un jeu synthétique
+reproductible (graine fixe) : clients, véhicules et contrats dont les dates
+de début sont concentrées sur les derniers mois, avec des durées surtout
+courtes et quelques locations longues. Les statuts suivent les dates
+(terminé, en retard, actif), avec une petite part de ruptures.
+
+``mesurer()`` appelle chaque URL via le client de test Django et relève les
+percentiles de latence, le nombre de requêtes SQL et le pic de mémoire
+Python (``tracemalloc``, sur un appel séparé pour ne pas fausser les
+latences). ``comparer()`` signale les régressions par rapport à un
+résultat précédent.
+
+``mesurer_concurrence()`` (commande ``benchmark_sqlite``) mesure le débit
+de lectures et d'écritures concurrentes sur un fichier SQLite jetable :
+des threads lecteurs (agrégats et pages de contrats) et des threads
+écrivains (création de contrat : lecture du véhicule, insertion du contrat,
+mise à jour du véhicule, entrée d'audit), avec ou sans profil SQLite et
+transactions ``IMMEDIATE`` (voir ``sqlite``).
+"""
+import logging
+import os
+import random
+import threading
+import time
+import tracemalloc
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import OperationalError, connection, connections, transaction
+from django.test import Client as TestClient
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+
+from . import calendrier, sqlite, stats
+from .models import AuditLog, Client, Contrat, Vehicule
+from .tarifs import prix_location
+from .urls import urlpatterns
+
+TAILLE_LOT = 1000
+PERCENTILES = (50, 90, 95, 99)
+
+# Paramètres GET des vues qui en exigent
+PARAMETRES = {
+    'api_disponibilites': lambda: {'date_debut': (timezone.now().date() + timedelta(days=7)).isoformat(), 'nb_jours': 5},
+    'calculer_prix': lambda: {'vehicule_id': Vehicule.objects.order_by('id').values_list('id', flat=True).first(), 'nb_jours': 10},
+    'api_devis': lambda: {'jours_min': 1, 'jours_max': 30},
+}
+
+# Modèle dont l'identifiant remplit le paramètre ``id`` de l'URL
+MODELE_ID = {
+    'client': Client,
+    'vehicule': Vehicule,
+    'contrat': Contrat,
+}
+
+
+def generer_donnees(nb_clients, nb_vehicules, nb_contrats, graine=42):
+    """Crée le jeu de données synthétique puis reconstruit calendrier et statistiques."""
+    aleatoire = random.Random(graine)
+    maintenant = timezone.now()
+    aujourdhui = maintenant.date()
+    marques = [('Renault', 'Clio'), ('Peugeot', '208'), ('Toyota', 'Corolla'), ('Honda', 'CB500'), ('Yamaha', 'MT-07')]
+
+    Client.objects.bulk_create(
+        (
+            Client(nom=f'Nom{i}', prenom=f'Prenom{i}', telephone=f'06{i:08d}', email=f'client{i}@example.com')
+            for i in range(nb_clients)
+        ),
+        batch_size=TAILLE_LOT,
+    )
+    vehicules = []
+    for i in range(nb_vehicules):
+        marque, modele = aleatoire.choice(marques)
+        moto = modele in ('CB500', 'MT-07')
+        vehicules.append(Vehicule(
+            type_vehicule='moto' if moto else 'voiture',
+            marque=marque,
+            modele=modele,
+            annee=aleatoire.randint(2012, aujourdhui.year),
+            immatriculation=f'BE-{i:06d}',
+            prix_journalier=Decimal(aleatoire.randrange(2000, 15000, 500)) / 100,
+            cylindree=aleatoire.choice([125, 500, 700]) if moto else None,
+            nombre_portes=None if moto else aleatoire.choice([3, 5]),
+            disponible=aleatoire.random() < 0.7,
+        ))
+    Vehicule.objects.bulk_create(vehicules, batch_size=TAILLE_LOT)
+
+    client_ids = list(Client.objects.values_list('id', flat=True))
+    tarifs = list(Vehicule.objects.values_list('id', 'prix_journalier'))
+    contrats = []
+    for _ in range(nb_contrats):
+        # Début sur les deux dernières années, plus dense sur les mois récents
+        debut = aujourdhui - timedelta(days=int(aleatoire.triangular(-30, 730, 0)))
+        nb_jours = aleatoire.choice([1, 2, 3, 3, 5, 7, 7, 10, 14, 21, 30, 45])
+        fin = debut + timedelta(days=nb_jours)
+        if aleatoire.random() < 0.03:
+            statut = 'rompu'
+        elif fin < aujourdhui:
+            statut = 'en_retard' if aleatoire.random() < 0.05 else 'termine'
+        else:
+            statut = 'actif'
+        vehicule_id, prix = aleatoire.choice(tarifs)
+        contrats.append(Contrat(
+            client_id=aleatoire.choice(client_ids),
+            vehicule_id=vehicule_id,
+            date_debut=debut,
+            date_fin=fin,
+            nb_jours=nb_jours,
+            montant_total=Decimal(str(prix_location(prix, nb_jours))),
+            statut=statut,
+            mode_paiement=aleatoire.choice(['especes', 'carte', 'virement', 'mobile']),
+        ))
+    contrats = Contrat.objects.bulk_create(contrats, batch_size=TAILLE_LOT)
+    # date_creation est imposée à l'insertion (auto_now_add) : la ramener quelques jours avant le début
+    for contrat in contrats:
+        contrat.date_creation = maintenant - timedelta(days=max(0, (aujourdhui - contrat.date_debut).days + aleatoire.randint(0, 10)))
+    Contrat.objects.bulk_update(contrats, ['date_creation'], batch_size=TAILLE_LOT)
+
+    AuditLog.objects.bulk_create(
+        (
+            AuditLog(actor='benchmark', model='Contrat', object_id=str(c.pk), action='created', changes={})
+            for c in contrats
+        ),
+        batch_size=TAILLE_LOT,
+    )
+
+    calendrier.reconstruire()
+    stats.reconstruire()
+
+
+def urls_a_mesurer():
+    """Liste ``(nom, url, parametres)`` de chaque URL nommée de ``gestion/urls.py``."""
+    ids = {}
+    urls = []
+    vues = set()
+    for motif in urlpatterns:
+        if not isinstance(motif, URLPattern) or not motif.name:
+            continue
+        # Même vue sous deux chemins (ex. admin_dashboard) : la première suffit
+        if (motif.callback, motif.name) in vues:
+            continue
+        vues.add((motif.callback, motif.name))
+        if set(motif.pattern.converters) - {'id'}:
+            continue  # paramètre sans valeur générique (ex. nom d'un profil)
+        kwargs = {}
+        if 'id' in motif.pattern.converters:
+            type_objet = motif.default_args.get('type_objet') or next(
+                (t for t in MODELE_ID if t in motif.name), 'contrat'
+            )
+            if type_objet not in ids:
+                ids[type_objet] = MODELE_ID[type_objet].objects.order_by('-id').values_list('id', flat=True).first()
+            kwargs['id'] = ids[type_objet]
+        parametres = PARAMETRES[motif.name]() if motif.name in PARAMETRES else {}
+        urls.append((motif.name, reverse(motif.name, kwargs=kwargs), parametres))
+    return urls
+
+
+def _percentile(valeurs, p):
+    """Percentile au rang le plus proche sur une liste triée."""
+    rang = max(0, min(len(valeurs) - 1, round(p / 100 * len(valeurs) + 0.5) - 1))
+    return valeurs[rang]
+
+
+class CompteurRequetes:
+    """Compte les requêtes SQL exécutées (``connection.execute_wrapper``).
+
+    ``CaptureQueriesContext`` ne convient pas : le journal des requêtes est
+    vidé au début de chaque requête HTTP.
+    """
+
+    def __init__(self):
+        self.nb = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.nb += 1
+        return execute(sql, params, many, context)
+
+
+def _appeler(client, url, parametres):
+    response = client.get(url, parametres)
+    if response.streaming:
+        # Exports CSV et PDF : le contenu est produit pendant la lecture
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def mesurer(client, url, parametres, repetitions=20):
+    """Mesures d'une URL : latences (ms), requêtes SQL et pic de mémoire (Kio)."""
+    cache.clear()
+    premier = CompteurRequetes()
+    with connection.execute_wrapper(premier):
+        response = _appeler(client, url, parametres)  # premier appel, cache vide
+
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        _appeler(client, url, parametres)
+        durees.append((time.perf_counter() - debut) * 1000)
+    durees.sort()
+
+    suivant = CompteurRequetes()
+    with connection.execute_wrapper(suivant):
+        _appeler(client, url, parametres)
+
+    tracemalloc.start()
+    try:
+        _appeler(client, url, parametres)
+        _, pic = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    resultat = {
+        'url': url,
+        'statut': response.status_code,
+        'requetes_sql': premier.nb,
+        'requetes_sql_cache_chaud': suivant.nb,
+        'memoire_pic_kio': round(pic / 1024, 1),
+        'moyenne_ms': round(sum(durees) / len(durees), 3),
+        'max_ms': round(durees[-1], 3),
+    }
+    for p in PERCENTILES:
+        resultat[f'p{p}_ms'] = round(_percentile(durees, p), 3)
+    return resultat
+
+
+def mesurer_tout(utilisateur, repetitions=20, filtre=None):
+    client = TestClient()
+    client.force_login(utilisateur)
+    resultats = {}
+    # Les erreurs 500 (ex. PDF sans reportlab) sont relevées dans le statut, pas journalisées
+    journal_requetes = logging.getLogger('django.request')
+    niveau = journal_requetes.level
+    journal_requetes.setLevel(logging.CRITICAL)
+    try:
+        for nom, url, parametres in urls_a_mesurer():
+            if filtre and nom not in filtre:
+                continue
+            resultats[nom] = mesurer(client, url, parametres, repetitions)
+    finally:
+        journal_requetes.setLevel(niveau)
+    return resultats
+
+
+def comparer(reference, resultats, tolerance_latence=0.25, tolerance_memoire=0.25, marge_ms=1.0):
+    """Régressions de ``resultats`` par rapport à ``reference`` (dictionnaires ``urls`` des deux fichiers).
+
+    Une latence médiane (p50, moins sensible au bruit que p95) ou un pic de
+    mémoire au-delà de la tolérance relative, une requête SQL de plus (cache
+    vide ou chaud) ou un changement de statut HTTP est une régression.
+    ``marge_ms`` évite de signaler le bruit des vues très rapides.
+    """
+    regressions = []
+    for nom, mesure in sorted(resultats.items()):
+        ancienne = reference.get(nom)
+        if ancienne is None:
+            continue
+        for cle in ('requetes_sql', 'requetes_sql_cache_chaud'):
+            if mesure[cle] > ancienne.get(cle, mesure[cle]):
+                regressions.append(f"{nom}: {ancienne[cle]} -> {mesure[cle]} {cle.replace('_', ' ')}")
+        if mesure['p50_ms'] > ancienne['p50_ms'] * (1 + tolerance_latence) + marge_ms:
+            regressions.append(f"{nom}: p50 {ancienne['p50_ms']} -> {mesure['p50_ms']} ms")
+        if mesure['memoire_pic_kio'] > ancienne['memoire_pic_kio'] * (1 + tolerance_memoire) + 64:
+            regressions.append(f"{nom}: mémoire {ancienne['memoire_pic_kio']} -> {mesure['memoire_pic_kio']} Kio")
+        if mesure['statut'] != ancienne['statut']:
+            regressions.append(f"{nom}: statut {ancienne['statut']} -> {mesure['statut']}")
+    return regressions
+
+
+SCHEMA_CONCURRENCE = (
+    'CREATE TABLE vehicule (id INTEGER PRIMARY KEY, prix REAL NOT NULL, disponible INTEGER NOT NULL)',
+    'CREATE TABLE contrat (id INTEGER PRIMARY KEY, vehicule_id INTEGER NOT NULL, statut TEXT NOT NULL, '
+    'montant REAL NOT NULL, date_creation TEXT NOT NULL)',
+    'CREATE INDEX contrat_vehicule ON contrat (vehicule_id)',
+    'CREATE TABLE audit (id INTEGER PRIMARY KEY, objet TEXT NOT NULL, changements TEXT NOT NULL)',
+)
+
+
+def _preparer_base(alias, nb_vehicules, nb_contrats):
+    with connections[alias].cursor() as cursor:
+        for sql in SCHEMA_CONCURRENCE:
+            cursor.execute(sql)
+        cursor.executemany(
+            'INSERT INTO vehicule (id, prix, disponible) VALUES (%s, %s, 1)',
+            [(i, 20 + i % 100) for i in range(1, nb_vehicules + 1)],
+        )
+        cursor.executemany(
+            "INSERT INTO contrat (vehicule_id, statut, montant, date_creation) VALUES (%s, %s, %s, datetime('now'))",
+            [(1 + i % nb_vehicules, ('actif', 'termine', 'rompu')[i % 3], 100 + i % 500) for i in range(nb_contrats)],
+        )
+
+
+def _lire(cursor, aleatoire):
+    cursor.execute('SELECT statut, COUNT(*), SUM(montant) FROM contrat GROUP BY statut')
+    cursor.fetchall()
+    cursor.execute(
+        'SELECT id, vehicule_id, montant FROM contrat WHERE vehicule_id = %s ORDER BY id DESC LIMIT 20',
+        [aleatoire.randint(1, 50)],
+    )
+    cursor.fetchall()
+
+
+def _creer_contrat(alias, vehicule_id):
+    """Écriture courte d'une création de contrat (à exécuter dans une transaction)."""
+    with connections[alias].cursor() as cursor:
+        cursor.execute('SELECT prix FROM vehicule WHERE id = %s', [vehicule_id])
+        prix = cursor.fetchone()[0]
+        cursor.execute(
+            "INSERT INTO contrat (vehicule_id, statut, montant, date_creation) VALUES (%s, 'actif', %s, datetime('now'))",
+            [vehicule_id, prix * 3],
+        )
+        cursor.execute('UPDATE vehicule SET disponible = 0 WHERE id = %s', [vehicule_id])
+        cursor.execute(
+            'INSERT INTO audit (objet, changements) VALUES (%s, %s)',
+            [f'Contrat {cursor.lastrowid}', '{"disponible": [true, false]}'],
+        )
+
+
+def mesurer_concurrence(dossier, nb_lecteurs=4, nb_ecrivains=4, duree=5.0, via_ecrire=False,
+                        nb_vehicules=50, nb_contrats=5000):
+    """Débit des lectures et écritures concurrentes sur une base SQLite neuve dans ``dossier``.
+
+    Le profil appliqué aux connexions est celui de ``settings.SQLITE_PROFIL`` au
+    moment de l'appel. Avec ``via_ecrire``, les écritures passent par
+    ``sqlite.ecrire`` (transaction ``IMMEDIATE``) au lieu d'un ``atomic()``
+    simple. Retourne lectures et écritures par seconde, erreurs « database is
+    locked » et percentiles de latence des écritures (ms).
+    """
+    alias = f'concurrence_{threading.get_ident()}_{time.monotonic_ns()}'
+    chemin = os.path.join(dossier, f'{alias}.sqlite3')
+    connections.settings[alias] = dict(connections.settings[connection.alias], NAME=chemin)
+    arret = threading.Event()
+    compteurs = {'lectures': 0, 'ecritures': 0, 'verrous': 0, 'autres_erreurs': 0}
+    latences = []
+    verrou = threading.Lock()
+
+    def compter(cle, latence=None):
+        with verrou:
+            compteurs[cle] += 1
+            if latence is not None:
+                latences.append(latence)
+
+    def erreur(e):
+        compter('verrous' if 'locked' in str(e) or 'busy' in str(e) else 'autres_erreurs')
+
+    def lecteur(graine):
+        aleatoire = random.Random(graine)
+        try:
+            while not arret.is_set():
+                try:
+                    with connections[alias].cursor() as cursor:
+                        _lire(cursor, aleatoire)
+                    compter('lectures')
+                except OperationalError as e:
+                    erreur(e)
+        finally:
+            connections[alias].close()
+
+    def ecrivain(graine):
+        aleatoire = random.Random(graine)
+        try:
+            while not arret.is_set():
+                vehicule_id = aleatoire.randint(1, nb_vehicules)
+                debut = time.perf_counter()
+                try:
+                    if via_ecrire:
+                        sqlite.ecrire(lambda: _creer_contrat(alias, vehicule_id), using=alias)
+                    else:
+                        with transaction.atomic(using=alias):
+                            _creer_contrat(alias, vehicule_id)
+                    compter('ecritures', (time.perf_counter() - debut) * 1000)
+                except OperationalError as e:
+                    erreur(e)
+        finally:
+            connections[alias].close()
+
+    try:
+        _preparer_base(alias, nb_vehicules, nb_contrats)
+        threads = [threading.Thread(target=lecteur, args=(i,)) for i in range(nb_lecteurs)]
+        threads += [threading.Thread(target=ecrivain, args=(1000 + i,)) for i in range(nb_ecrivains)]
+        debut = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(duree)
+        arret.set()
+        for thread in threads:
+            thread.join()
+        ecoule = time.perf_counter() - debut
+    finally:
+        connections[alias].close()
+        del connections.settings[alias]
+        for suffixe in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(chemin + suffixe):
+                os.remove(chemin + suffixe)
+
+    latences.sort()
+    resultat = {
+        'lectures_par_s': round(compteurs['lectures'] / ecoule, 1),
+        'ecritures_par_s': round(compteurs['ecritures'] / ecoule, 1),
+        'verrous': compteurs['verrous'],
+        'autres_erreurs': compteurs['autres_erreurs'],
+    }
+    for p in (50, 95, 99):
+        resultat[f'ecriture_p{p}_ms'] = round(_percentile(latences, p), 2) if latences else None
+    return resultat
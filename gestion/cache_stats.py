@@ -0,0 +1,196 @@
+"""Cache des endpoints JSON du dashboard, invalidé par les signaux.
+
+Chaque groupe de données a un numéro de version stocké dans le cache Django.
+Les signaux post_save/post_delete de ``Client``, ``Contrat`` et ``Vehicule``
+changent la version des seuls groupes concernés (après le commit de la
+transaction), ce qui rend obsolètes les réponses mises en cache sans attendre une expiration.
+
+La version sert aussi d'ETag et de Last-Modified : une requête
+conditionnelle dont les données n'ont pas changé reçoit un 304, et un
+succès de cache ne lit que le cache (aucune requête SQL pour les données).
+
+Le catalogue public utilise le même mécanisme avec le groupe ``catalogue``
+(version de la flotte, changée à chaque écriture d'un ``Vehicule``) : la page
+complète est mise en cache pour les visiteurs anonymes, et chaque carte de
+véhicule est mise en cache comme fragment de gabarit.
+
+Avec plusieurs processus, configurer un cache partagé (Redis, Memcached)
+dans ``CACHES`` ; le cache mémoire par défaut est propre à chaque processus.
+
+Une vue servie par la réplique en lecture (``replique.vue_replique``) n'y lit
+qu'avec un instantané postérieur à la version du groupe : une réponse remise
+en cache après une invalidation contient l'écriture qui l'a provoquée.
+"""
+import asyncio
+import hashlib
+from functools import wraps
+from uuid import uuid4
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.http import condition
+
+from .replique import exiger_fraicheur
+
+PREFIXE = 'gestion:stats'
+DUREE_CACHE = 24 * 60 * 60  # filet de sécurité : les entrées sont invalidées par les signaux
+
+# Groupes de données et modèles dont ils dépendent
+CONTRATS = 'contrats'
+OCCUPATION = 'occupation'
+TARIFS = 'tarifs'
+CATALOGUE = 'catalogue'
+CLIENTS = 'clients'
+DEPENDANCES = {
+    'Client': (CLIENTS,),
+    'Contrat': (CONTRATS, OCCUPATION),
+    'Vehicule': (OCCUPATION, TARIFS, CATALOGUE),
+}
+
+
+def _cle_version(groupe):
+    return f'{PREFIXE}:{groupe}:version'
+
+
+def version(groupe):
+    """Retourne ``(jeton, date_modification)`` du groupe, en créant la version si besoin."""
+    valeur = cache.get(_cle_version(groupe))
+    if valeur is None:
+        valeur = (uuid4().hex, timezone.now().replace(microsecond=0))
+        cache.add(_cle_version(groupe), valeur, None)
+        valeur = cache.get(_cle_version(groupe), valeur)
+    return valeur
+
+
+def invalider(*groupes):
+    """Change la version des groupes donnés ; les entrées existantes ne seront plus lues."""
+    maintenant = timezone.now().replace(microsecond=0)
+    cache.set_many({_cle_version(g): (uuid4().hex, maintenant) for g in groupes}, None)
+
+
+def invalider_pour_modele(nom_modele):
+    """Invalide, après le commit, les groupes qui dépendent du modèle donné."""
+    groupes = DEPENDANCES.get(nom_modele)
+    if groupes:
+        transaction.on_commit(lambda: invalider(*groupes))
+
+
+def versions(*groupes):
+    """Version combinée de plusieurs groupes : ``(jetons, date de la modification la plus récente)``."""
+    valeurs = [version(groupe) for groupe in groupes]
+    return ':'.join(jeton for jeton, _ in valeurs), max(date for _, date in valeurs)
+
+
+def _etag(groupes, request):
+    return _etag_jetons(versions(*groupes)[0], request)
+
+
+def _etag_jetons(jetons, request):
+    empreinte = hashlib.md5(
+        f'{jetons}:{request.get_full_path()}:{timezone.now().date()}'.encode(),
+        usedforsecurity=False,
+    ).hexdigest()
+    return f'"{empreinte}"'
+
+
+def cache_json(*groupes):
+    """Décorateur : met en cache la réponse JSON d'une vue pour la version courante des groupes.
+
+    Une vue qui dépend de plusieurs groupes est invalidée dès que l'un d'eux change.
+    La date du jour fait partie de la clé, car les fenêtres glissantes changent chaque jour.
+    Accepte aussi une vue asynchrone.
+    """
+    prefixe = f'{PREFIXE}:{"+".join(groupes)}'
+
+    def decorateur(vue):
+        if asyncio.iscoroutinefunction(vue):
+            return _cache_json_async(groupes, prefixe, vue)
+
+        @condition(
+            etag_func=lambda request, *a, **kw: _etag(groupes, request),
+            last_modified_func=lambda request, *a, **kw: versions(*groupes)[1],
+        )
+        @wraps(vue)
+        def wrapper(request, *args, **kwargs):
+            cle = f'{prefixe}:reponse:{_etag(groupes, request)}'
+            contenu = cache.get(cle)
+            if contenu is not None:
+                return HttpResponse(contenu, content_type='application/json')
+
+            with exiger_fraicheur(versions(*groupes)[1]):
+                response = vue(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(cle, response.content, DUREE_CACHE)
+            return response
+        return wrapper
+    return decorateur
+
+
+def _cache_json_async(groupes, prefixe, vue):
+    # Même logique que condition() + cache_json, avec les méthodes asynchrones du cache
+    @wraps(vue)
+    async def wrapper(request, *args, **kwargs):
+        jetons, date_modification = await sync_to_async(versions)(*groupes)
+        etag = _etag_jetons(jetons, request)
+        if request.method in ('GET', 'HEAD'):
+            response = get_conditional_response(
+                request, etag=etag, last_modified=int(date_modification.timestamp()),
+            )
+            if response is not None:
+                return response
+
+        cle = f'{prefixe}:reponse:{etag}'
+        contenu = await cache.aget(cle)
+        if contenu is not None:
+            response = HttpResponse(contenu, content_type='application/json')
+        else:
+            with exiger_fraicheur(date_modification):
+                response = await vue(request, *args, **kwargs)
+            if response.status_code == 200:
+                await cache.aset(cle, response.content, DUREE_CACHE)
+        if request.method in ('GET', 'HEAD') and response.status_code == 200:
+            response.headers.setdefault('ETag', etag)
+            response.headers.setdefault('Last-Modified', http_date(date_modification.timestamp()))
+        return response
+    return wrapper
+
+
+def cache_page_anonyme(groupe):
+    """Décorateur : met en cache la page HTML servie aux visiteurs anonymes pour la version du groupe.
+
+    Seules les requêtes GET/HEAD sans paramètres et sans cookie de session
+    sont concernées : elles ne peuvent venir que d'un visiteur anonyme sans
+    message en attente, et sont servies sans lire la session ni la base.
+    Les autres requêtes appellent la vue normalement.
+    """
+    def decorateur(vue):
+        @condition(
+            etag_func=lambda request, *a, **kw: _etag((groupe,), request),
+            last_modified_func=lambda request, *a, **kw: version(groupe)[1],
+        )
+        def en_cache(request, *args, **kwargs):
+            cle = f'{PREFIXE}:{groupe}:page:{_etag((groupe,), request)}'
+            contenu = cache.get(cle)
+            if contenu is not None:
+                return HttpResponse(contenu)
+
+            response = vue(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(cle, response.content, DUREE_CACHE)
+            return response
+
+        @wraps(vue)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or request.GET or settings.SESSION_COOKIE_NAME in request.COOKIES:
+                return vue(request, *args, **kwargs)
+            response = en_cache(request, *args, **kwargs)
+            patch_vary_headers(response, ['Cookie'])
+            return response
+        return wrapper
+    return decorateur
@@ -0,0 +1,95 @@
+"""Calendrier de réservation par véhicule.
+
+La table ``Reservation`` ne contient que les intervalles des contrats qui
+bloquent le véhicule (statuts actif et en retard). L'index composite
+``(vehicule, date_fin, date_debut)`` permet de répondre à « ce véhicule
+est-il libre entre ces dates ? » par une recherche dans l'index limitée aux
+réservations du véhicule qui ne sont pas encore terminées, au lieu de filtrer
+toute la table des contrats. Contrairement au champ ``Vehicule.disponible``,
+la réponse tient compte des réservations futures.
+
+Les bornes sont inclusives, comme l'ancienne vérification du formulaire :
+un contrat qui se termine le jour où un autre commence est en conflit.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from .models import Contrat, Reservation, Vehicule
+
+STATUTS_BLOQUANTS = ['actif', 'en_retard']
+
+
+def _date_fin(contrat):
+    return contrat.date_fin or contrat.date_debut + timedelta(days=contrat.nb_jours)
+
+
+def synchroniser(contrat):
+    """Ajoute, met à jour ou retire la réservation correspondant au contrat."""
+    if contrat.statut in STATUTS_BLOQUANTS and contrat.date_debut:
+        Reservation.objects.update_or_create(
+            contrat_id=contrat.pk,
+            defaults={
+                'vehicule_id': contrat.vehicule_id,
+                'date_debut': contrat.date_debut,
+                'date_fin': _date_fin(contrat),
+            },
+        )
+    else:
+        Reservation.objects.filter(contrat_id=contrat.pk).delete()
+
+
+def conflits(vehicule, date_debut, date_fin, exclure_contrat=None):
+    """Réservations du véhicule qui chevauchent ``[date_debut, date_fin]``."""
+    qs = Reservation.objects.filter(
+        vehicule=vehicule,
+        date_fin__gte=date_debut,
+        date_debut__lte=date_fin,
+    )
+    if exclure_contrat is not None:
+        qs = qs.exclude(contrat_id=exclure_contrat)
+    return qs
+
+
+def vehicule_libre(vehicule, date_debut, date_fin, exclure_contrat=None):
+    """Indique si le véhicule est libre sur toute la période (bornes incluses)."""
+    return not conflits(vehicule, date_debut, date_fin, exclure_contrat).exists()
+
+
+def vehicules_libres(date_debut, date_fin, type_vehicule=None, prix_max=None):
+    """Véhicules libres sur toute la période, en une requête (anti-jointure sur le calendrier)."""
+    occupe = Reservation.objects.filter(
+        vehicule=OuterRef('pk'),
+        date_fin__gte=date_debut,
+        date_debut__lte=date_fin,
+    )
+    vehicules = Vehicule.objects.filter(~Exists(occupe))
+    if type_vehicule:
+        vehicules = vehicules.filter(type_vehicule=type_vehicule)
+    if prix_max is not None:
+        vehicules = vehicules.filter(prix_journalier__lte=prix_max)
+    return vehicules.order_by('-date_ajout', '-id')
+
+
+@transaction.atomic
+def reconstruire():
+    """Reconstruit le calendrier à partir des contrats bloquants."""
+    Reservation.objects.all().delete()
+    contrats = (
+        Contrat.objects
+        .filter(statut__in=STATUTS_BLOQUANTS)
+        .only('id', 'vehicule_id', 'date_debut', 'date_fin', 'nb_jours')
+    )
+    Reservation.objects.bulk_create(
+        (
+            Reservation(
+                contrat_id=c.pk,
+                vehicule_id=c.vehicule_id,
+                date_debut=c.date_debut,
+                date_fin=_date_fin(c),
+            )
+            for c in contrats.iterator()
+        ),
+        batch_size=1000,
+    )
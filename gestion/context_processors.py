@@ -1,10 +1,11 @@
-from .models import Contrat, Vehicule
+from .stats import get_stats_globales
 
 def stats_globales(request):
     """Ajoute des statistiques globales au contexte de tous les templates."""
+    stats = get_stats_globales()
     return {
-        'total_vehicules': Vehicule.objects.count(),
-        'vehicules_disponibles': Vehicule.objects.filter(disponible=True).count(),
-        'contrats_actifs': Contrat.objects.filter(statut='actif').count(),
-        'contrats_retard': Contrat.objects.filter(statut='en_retard').count(),
-    }
\ No newline at end of file
+        'total_vehicules': stats['total_vehicules'],
+        'vehicules_disponibles': stats['vehicules_disponibles'],
+        'contrats_actifs': stats['contrats_actifs'],
+        'contrats_retard': stats['contrats_retard'],
+    }
@@ -1,6 +1,7 @@
 from django import forms
 from .models import Client, Vehicule, Contrat
-from datetime import date, timedelta
+from .calendrier import vehicule_libre, vehicules_libres
+from datetime import date, datetime, time, timedelta
 from django.utils import timezone
 
 class ClientForm(forms.ModelForm):
@@ -30,6 +31,67 @@ class VehiculeForm(forms.ModelForm):
             'nombre_portes': forms.NumberInput(attrs={'class': 'form-control'}),
         }
 
+class RechercheDisponibiliteForm(forms.Form):
+    """Recherche des véhicules libres sur une période (catalogue public)."""
+    date_debut = forms.DateField(widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}))
+    nb_jours = forms.IntegerField(min_value=1, max_value=365, widget=forms.NumberInput(attrs={'class': 'form-control', 'min': '1'}))
+    type_vehicule = forms.ChoiceField(
+        choices=[('', 'Tous les types')] + Vehicule.TYPE_VEHICULE,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+    prix_max = forms.DecimalField(min_value=0, required=False, widget=forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}))
+
+    def clean_date_debut(self):
+        date_debut = self.cleaned_data.get('date_debut')
+        if date_debut and date_debut < date.today():
+            raise forms.ValidationError("La date de début ne peut pas être dans le passé.")
+        return date_debut
+
+    def rechercher(self):
+        """Retourne la liste des véhicules libres, chacun avec son devis ``prix_total``."""
+        date_debut = self.cleaned_data['date_debut']
+        nb_jours = self.cleaned_data['nb_jours']
+        vehicules = list(vehicules_libres(
+            date_debut,
+            date_debut + timedelta(days=nb_jours),
+            type_vehicule=self.cleaned_data.get('type_vehicule') or None,
+            prix_max=self.cleaned_data.get('prix_max'),
+        ))
+        for vehicule in vehicules:
+            vehicule.prix_total = vehicule.calculer_prix_location(nb_jours)
+        return vehicules
+
+def _debut_jour(jour):
+    return timezone.make_aware(datetime.combine(jour, time.min))
+
+class AuditFiltreForm(forms.Form):
+    """Filtres du journal d'audit (tous optionnels)."""
+    ACTIONS = [('', 'Toutes'), ('created', 'Création'), ('updated', 'Modification'), ('deleted', 'Suppression')]
+    MODELES = [('', 'Tous'), ('Client', 'Client'), ('Vehicule', 'Véhicule'), ('Contrat', 'Contrat')]
+
+    model = forms.ChoiceField(choices=MODELES, required=False, widget=forms.Select(attrs={'class': 'form-select'}))
+    object_id = forms.CharField(max_length=150, required=False, widget=forms.TextInput(attrs={'class': 'form-control'}))
+    actor = forms.CharField(max_length=150, required=False, widget=forms.TextInput(attrs={'class': 'form-control'}))
+    action = forms.ChoiceField(choices=ACTIONS, required=False, widget=forms.Select(attrs={'class': 'form-select'}))
+    depuis = forms.DateField(required=False, widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}))
+    jusqua = forms.DateField(required=False, widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}))
+
+    def filtrer(self, queryset):
+        """Applique les filtres valides au queryset d'``AuditLog``."""
+        if not self.is_valid():
+            return queryset
+        data = self.cleaned_data
+        for champ in ('model', 'object_id', 'actor', 'action'):
+            if data.get(champ):
+                queryset = queryset.filter(**{champ: data[champ]})
+        # Bornes en datetime (et non timestamp__date) pour que l'index sur timestamp serve
+        if data.get('depuis'):
+            queryset = queryset.filter(timestamp__gte=_debut_jour(data['depuis']))
+        if data.get('jusqua'):
+            queryset = queryset.filter(timestamp__lt=_debut_jour(data['jusqua'] + timedelta(days=1)))
+        return queryset
+
 class ContratForm(forms.ModelForm):
     # Champs supplémentaires pour les détails de paiement
     numero_carte = forms.CharField(max_length=16, required=False, widget=forms.TextInput(attrs={'class': 'form-control'}))
@@ -67,9 +129,10 @@ class ContratForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Afficher uniquement les véhicules disponibles
+        # Tous les véhicules sont proposés : la disponibilité sur la période
+        # demandée est vérifiée dans clean() avec le calendrier de réservation
         try:
-            self.fields['vehicule'].queryset = Vehicule.objects.filter(disponible=True)
+            self.fields['vehicule'].queryset = Vehicule.objects.order_by('marque', 'modele')
         except Exception:
             # Si le modèle n'est pas encore migré, ignorer l'erreur lors de la découverte
             pass
@@ -81,9 +144,6 @@ class ContratForm(forms.ModelForm):
         nb_jours = cleaned_data.get('nb_jours')
 
         # Vérifications basiques
-        if vehicule and not getattr(vehicule, 'disponible', True):
-            raise forms.ValidationError("Ce véhicule n'est pas disponible.")
-
         if date_debut and date_debut < date.today():
             raise forms.ValidationError("La date de début ne peut pas être dans le passé.")
 
@@ -93,18 +153,9 @@ class ContratForm(forms.ModelForm):
         # Vérifier les conflits de réservation si toutes les données sont présentes
         if vehicule and date_debut and nb_jours:
             date_fin = date_debut + timedelta(days=nb_jours)
-            # Statuts qui bloquent la disponibilité
-            statuts_bloquants = ['actif', 'en_retard']
-            conflits = Contrat.objects.filter(
-                vehicule=vehicule,
-                date_debut__lte=date_fin,
-                date_fin__gte=date_debut,
-                statut__in=statuts_bloquants
-            )
             # Si on édite un contrat existant, exclure-le
-            if self.instance and self.instance.pk:
-                conflits = conflits.exclude(pk=self.instance.pk)
-            if conflits.exists():
+            exclure = self.instance.pk if self.instance and self.instance.pk else None
+            if not vehicule_libre(vehicule, date_debut, date_fin, exclure_contrat=exclure):
                 raise forms.ValidationError("Ce véhicule est déjà réservé pour cette période")
 
         return cleaned_data
\ No newline at end of file
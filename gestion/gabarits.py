@@ -0,0 +1,27 @@
+"""Moteur de gabarits Django dont le rendu est chronométré (catégorie ``gabarit`` de Server-Timing)."""
+from django.template.backends.django import DjangoTemplates
+
+from .instrumentation import mesurer
+
+
+class GabaritChronometre:
+    """Enveloppe d'un gabarit du moteur Django qui chronomètre ``render()``."""
+
+    def __init__(self, gabarit):
+        self.gabarit = gabarit
+
+    def __getattr__(self, nom):
+        return getattr(self.gabarit, nom)
+
+    def render(self, context=None, request=None):
+        with mesurer('gabarit'):
+            return self.gabarit.render(context, request)
+
+
+class DjangoTemplatesChronometres(DjangoTemplates):
+
+    def from_string(self, template_code):
+        return GabaritChronometre(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return GabaritChronometre(super().get_template(template_name))
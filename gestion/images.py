@@ -0,0 +1,175 @@
+"""Images dérivées des photos de véhicules.
+
+Pour chaque photo téléversée (``Vehicule.image``), Pillow génère une fois
+des variantes WebP de largeurs fixes (miniature, carte, grande) dans
+``vehicules/derives/``, nommées d'après le chemin complet de la photo, extension
+comprise (``photo.jpg`` et ``photo.png`` ont chacune leurs variantes). Les gabarits les servent via ``srcset`` avec
+chargement différé, au lieu de l'original de plusieurs Mo réduit en CSS.
+
+Les largeurs générées sont enregistrées dans ``Vehicule.image_variantes``
+avec le nom de la photo source : tant que les variantes d'une nouvelle
+photo ne sont pas prêtes, l'original reste servi.
+
+La génération est déclenchée après le commit (``signals_images``) et réalisée
+par un thread d'arrière-plan. La commande ``generate_vehicle_images``
+traite les photos existantes en parallèle.
+
+Réglage (``settings``) : ``VEHICULES_IMAGES_ASYNC``.
+"""
+import atexit
+import io
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+
+from .instrumentation import mesurer
+
+logger = logging.getLogger(__name__)
+
+MINIATURE = 160
+CARTE = 480
+GRANDE = 1200
+LARGEURS = (MINIATURE, CARTE, GRANDE)
+FORMAT = 'WEBP'
+EXTENSION = '.webp'
+QUALITE = 80
+DOSSIER = 'vehicules/derives'
+
+_file = queue.Queue()
+_thread = None
+
+
+def nom_derive(nom_image, largeur):
+    # Chemin relatif complet : deux photos distinctes n'ont jamais les mêmes variantes
+    return f'{DOSSIER}/{nom_image}_{largeur}{EXTENSION}'
+
+
+def generer(nom_image):
+    """Génère les variantes de la photo donnée ; retourne la liste des largeurs produites.
+
+    Ne touche pas à la base de données (utilisable dans un processus séparé).
+    Une photo plus étroite qu'une largeur cible n'est pas agrandie : la variante
+    prend alors la largeur de l'original.
+    """
+    from PIL import Image, ImageOps
+
+    with default_storage.open(nom_image, 'rb') as f:
+        image = Image.open(f)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+    largeurs = sorted({min(largeur, image.width) for largeur in LARGEURS})
+    for largeur in largeurs:
+        hauteur = max(1, round(image.height * largeur / image.width))
+        variante = image if largeur == image.width else image.resize((largeur, hauteur), Image.LANCZOS)
+        sortie = io.BytesIO()
+        variante.save(sortie, FORMAT, quality=QUALITE, method=4)
+        nom = nom_derive(nom_image, largeur)
+        if default_storage.exists(nom):
+            default_storage.delete(nom)
+        default_storage.save(nom, ContentFile(sortie.getvalue()))
+    return largeurs
+
+
+def enregistrer(vehicule_id, nom_image, largeurs):
+    """Associe les variantes au véhicule si sa photo n'a pas changé entre-temps."""
+    from .models import Vehicule
+
+    from .cache_stats import invalider, CATALOGUE
+
+    # update() : pas de signaux, la fiche du véhicule n'a pas changé ;
+    # seul le catalogue, qui affiche les variantes, est à invalider
+    if Vehicule.objects.filter(id=vehicule_id, image=nom_image).update(
+        image_variantes={'source': nom_image, 'largeurs': largeurs},
+    ):
+        invalider(CATALOGUE)
+
+
+def traiter(vehicule_id):
+    from .models import Vehicule
+
+    nom_image = Vehicule.objects.filter(id=vehicule_id).values_list('image', flat=True).first()
+    if nom_image:
+        enregistrer(vehicule_id, nom_image, generer(nom_image))
+
+
+def variantes(vehicule):
+    """Liste ``[(largeur, url), ...]`` des variantes prêtes pour la photo courante."""
+    if not vehicule.image or not vehicule.image_variantes:
+        return []
+    if vehicule.image_variantes.get('source') != vehicule.image.name:
+        return []
+    return [
+        (largeur, default_storage.url(nom_derive(vehicule.image.name, largeur)))
+        for largeur in vehicule.image_variantes.get('largeurs', [])
+    ]
+
+
+def url(vehicule, largeur):
+    """URL de la plus petite variante au moins aussi large que ``largeur`` (ou de l'original)."""
+    disponibles = variantes(vehicule)
+    for largeur_variante, url_variante in disponibles:
+        if largeur_variante >= largeur:
+            return url_variante
+    if disponibles:
+        # Original plus étroit que la cible : sa plus grande variante suffit
+        return disponibles[-1][1]
+    return vehicule.image.url if vehicule.image else ''
+
+
+def srcset(vehicule):
+    return ', '.join(f'{url_variante} {largeur}w' for largeur, url_variante in variantes(vehicule))
+
+
+def _travailleur():
+    while True:
+        vehicule_id = _file.get()
+        try:
+            close_old_connections()
+            traiter(vehicule_id)
+        except Exception:
+            logger.exception('Erreur génération des images du véhicule %s', vehicule_id)
+        finally:
+            close_old_connections()
+            _file.task_done()
+
+
+def _demarrer():
+    global _thread
+    if _thread is None or not _thread.is_alive():
+        _thread = threading.Thread(target=_travailleur, name='images-vehicules', daemon=True)
+        _thread.start()
+
+
+def generer_apres_commit(vehicule_id):
+    """Programme la génération des variantes après le commit de la transaction courante."""
+    if getattr(settings, 'VEHICULES_IMAGES_ASYNC', True):
+        def planifier():
+            with mesurer('images'):
+                _demarrer()
+                _file.put(vehicule_id)
+    else:
+        def planifier():
+            try:
+                with mesurer('images'):
+                    traiter(vehicule_id)
+            except Exception:
+                # Photo illisible : l'original reste servi
+                logger.exception('Erreur génération des images du véhicule %s', vehicule_id)
+    transaction.on_commit(planifier)
+
+
+def vider():
+    """Attend la fin des générations en attente."""
+    if _thread is not None and _thread.is_alive():
+        _file.join()
+
+
+atexit.register(vider)
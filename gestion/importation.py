@@ -0,0 +1,295 @@
+"""Import en masse de clients, véhicules et contrats (commande ``import_data``).
+
+Le fichier (CSV avec en-tête, ou JSONL : un objet JSON par ligne) est lu
+en flux et traité par lots de ``taille_lot`` lignes. Chaque ligne est
+validée sans requête SQL (``clean_fields`` du modèle) ; les références des
+contrats vers les clients et les véhicules sont résolues par des
+dictionnaires chargés une fois au début de l'import :
+
+* client : colonne ``client_email`` ou ``client_telephone`` ;
+* véhicule : colonne ``vehicule_immatriculation``.
+
+Un contrat bloquant (actif ou en retard) qui chevauche une réservation du
+calendrier ou un contrat bloquant déjà lu dans le fichier est rejeté, comme
+dans le formulaire : les réservations d'un véhicule sont chargées à sa
+première ligne, puis le contrôle se fait en mémoire.
+
+Les lignes valides d'un lot sont insérées par ``bulk_create`` dans une
+transaction. Les effets de bord des signaux, court-circuités par
+``bulk_create``, sont produits par lot : journal d'audit, calendrier de
+réservation, instantanés du journal des contrats, invalidation des caches.
+Les tables de cumul des statistiques sont recalculées une fois à la fin.
+"""
+import csv
+import json
+from collections import defaultdict
+from datetime import timedelta
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from . import audit, stats
+from .cache_stats import invalider_pour_modele
+from .calendrier import STATUTS_BLOQUANTS
+from .journal import enregistrer_apres_commit
+from .models import Client, Contrat, Reservation, Vehicule
+from .signals_audit import etat, serialiser
+from .tarifs import prix_location
+from .tasks import generer_rappels
+
+TAILLE_LOT = 5000
+VRAI = {'1', 'true', 'vrai', 'oui', 'yes'}
+
+
+class LigneInvalide(ValueError):
+    pass
+
+
+def lire_lignes(fichier, format_fichier):
+    """Itère sur ``(numero_ligne, dict)`` sans charger le fichier en mémoire."""
+    if format_fichier == 'csv':
+        lecteur = csv.DictReader(fichier)
+        for ligne in lecteur:
+            yield lecteur.line_num, ligne
+    else:
+        for numero, ligne in enumerate(fichier, start=1):
+            if ligne.strip():
+                try:
+                    yield numero, json.loads(ligne)
+                except ValueError as e:
+                    yield numero, LigneInvalide(f'JSON invalide : {e}')
+
+
+def _valeur(ligne, champ):
+    valeur = ligne.get(champ)
+    if isinstance(valeur, str):
+        valeur = valeur.strip()
+    return None if valeur == '' else valeur
+
+
+def _booleen(valeur, defaut):
+    if valeur is None:
+        return defaut
+    if isinstance(valeur, bool):
+        return valeur
+    return str(valeur).strip().lower() in VRAI
+
+
+def _valider(instance, exclure):
+    try:
+        instance.clean_fields(exclude=exclure)
+    except ValidationError as e:
+        raise LigneInvalide('; '.join(f'{champ}: {" ".join(erreurs)}' for champ, erreurs in e.message_dict.items()))
+    return instance
+
+
+class Importeur:
+    """Construction et effets de bord des lignes d'un modèle."""
+    modele = None
+
+    def __init__(self, acteur=''):
+        self.acteur = acteur
+        self.mois_modifies = set()
+
+    def construire(self, ligne):
+        raise NotImplementedError
+
+    def apres_insertion(self, objets):
+        """Effets de bord des signaux, pour un lot inséré (dans sa transaction)."""
+        nom = self.modele.__name__
+        audit.enregistrer_lot(
+            nom,
+            [(obj.pk, serialiser({champ: [None, valeur] for champ, valeur in etat(obj).items()})) for obj in objets],
+            acteur=self.acteur,
+        )
+        invalider_pour_modele(nom)
+
+    def terminer(self):
+        """Mise à jour des tables de cumul, une fois pour tout l'import."""
+
+
+class ImporteurClients(Importeur):
+    modele = Client
+
+    def construire(self, ligne):
+        return _valider(Client(
+            nom=_valeur(ligne, 'nom'),
+            prenom=_valeur(ligne, 'prenom'),
+            telephone=_valeur(ligne, 'telephone'),
+            email=_valeur(ligne, 'email'),
+        ), exclure=['date_creation'])
+
+    def terminer(self):
+        stats.rafraichir_clients()
+
+
+class ImporteurVehicules(Importeur):
+    modele = Vehicule
+
+    def __init__(self, acteur=''):
+        super().__init__(acteur)
+        # Immatriculations existantes et déjà lues : l'unicité est vérifiée en mémoire
+        self.immatriculations = set(Vehicule.objects.values_list('immatriculation', flat=True))
+
+    def construire(self, ligne):
+        vehicule = _valider(Vehicule(
+            type_vehicule=_valeur(ligne, 'type_vehicule'),
+            marque=_valeur(ligne, 'marque'),
+            modele=_valeur(ligne, 'modele'),
+            annee=_valeur(ligne, 'annee'),
+            immatriculation=_valeur(ligne, 'immatriculation'),
+            prix_journalier=_valeur(ligne, 'prix_journalier'),
+            cylindree=_valeur(ligne, 'cylindree'),
+            nombre_portes=_valeur(ligne, 'nombre_portes'),
+            disponible=_booleen(_valeur(ligne, 'disponible'), True),
+        ), exclure=['image', 'image_variantes', 'date_ajout'])
+        if vehicule.immatriculation in self.immatriculations:
+            raise LigneInvalide(f'immatriculation: {vehicule.immatriculation} existe déjà')
+        self.immatriculations.add(vehicule.immatriculation)
+        return vehicule
+
+    def terminer(self):
+        stats.rafraichir_vehicules()
+
+
+class ImporteurContrats(Importeur):
+    modele = Contrat
+
+    def __init__(self, acteur=''):
+        super().__init__(acteur)
+        self.vehicules_modifies = set()
+        self.clients_email = {}
+        self.clients_telephone = {}
+        for client_id, email, telephone in Client.objects.order_by('-id').values_list('id', 'email', 'telephone'):
+            # En cas de doublon, le client le plus ancien l'emporte
+            if email:
+                self.clients_email[email.lower()] = client_id
+            self.clients_telephone[telephone] = client_id
+        self.vehicules = {
+            immatriculation: (vehicule_id, prix)
+            for vehicule_id, immatriculation, prix in Vehicule.objects.values_list('id', 'immatriculation', 'prix_journalier')
+        }
+        self.aujourdhui = timezone.now().date()
+        # Intervalles bloquants par véhicule : calendrier + lignes déjà acceptées
+        self.reservations = defaultdict(list)
+        self.vehicules_charges = set()
+
+    def _reservations(self, vehicule_id):
+        if vehicule_id not in self.vehicules_charges:
+            self.vehicules_charges.add(vehicule_id)
+            self.reservations[vehicule_id].extend(
+                Reservation.objects.filter(vehicule_id=vehicule_id).values_list('date_debut', 'date_fin')
+            )
+        return self.reservations[vehicule_id]
+
+    def _verifier_calendrier(self, contrat, immatriculation):
+        """Rejette un contrat bloquant qui chevauche une réservation (bornes incluses)."""
+        if contrat.statut not in STATUTS_BLOQUANTS:
+            return
+        reservations = self._reservations(contrat.vehicule_id)
+        for debut, fin in reservations:
+            if fin >= contrat.date_debut and debut <= contrat.date_fin:
+                raise LigneInvalide(
+                    f'vehicule: {immatriculation} déjà réservé du {debut:%d/%m/%Y} au {fin:%d/%m/%Y}'
+                )
+        reservations.append((contrat.date_debut, contrat.date_fin))
+
+    def _client_id(self, ligne):
+        email = _valeur(ligne, 'client_email')
+        if email:
+            client_id = self.clients_email.get(str(email).lower())
+        else:
+            client_id = self.clients_telephone.get(_valeur(ligne, 'client_telephone'))
+        if client_id is None:
+            raise LigneInvalide(f"client: introuvable ({email or _valeur(ligne, 'client_telephone')})")
+        return client_id
+
+    def construire(self, ligne):
+        client_id = self._client_id(ligne)
+        immatriculation = _valeur(ligne, 'vehicule_immatriculation')
+        if immatriculation not in self.vehicules:
+            raise LigneInvalide(f'vehicule: immatriculation {immatriculation} introuvable')
+        vehicule_id, prix_journalier = self.vehicules[immatriculation]
+
+        contrat = _valider(Contrat(
+            client_id=client_id,
+            vehicule_id=vehicule_id,
+            date_debut=_valeur(ligne, 'date_debut'),
+            date_fin=_valeur(ligne, 'date_fin'),
+            nb_jours=_valeur(ligne, 'nb_jours'),
+            montant_total=_valeur(ligne, 'montant_total'),
+            statut=_valeur(ligne, 'statut') or 'actif',
+            mode_paiement=_valeur(ligne, 'mode_paiement') or 'especes',
+        ), exclure=['client', 'vehicule', 'date_creation', 'details_paiement'])
+        if contrat.date_fin is None:
+            contrat.date_fin = contrat.date_debut + timedelta(days=contrat.nb_jours)
+        if contrat.montant_total is None:
+            contrat.montant_total = prix_location(prix_journalier, contrat.nb_jours)
+        # Même règle que Contrat.save()
+        if contrat.statut == 'actif' and contrat.date_fin < self.aujourdhui:
+            contrat.statut = 'en_retard'
+        self._verifier_calendrier(contrat, immatriculation)
+        return contrat
+
+    def apres_insertion(self, objets):
+        super().apres_insertion(objets)
+        Reservation.objects.bulk_create([
+            Reservation(contrat_id=c.pk, vehicule_id=c.vehicule_id, date_debut=c.date_debut, date_fin=c.date_fin)
+            for c in objets if c.statut in STATUTS_BLOQUANTS
+        ])
+        enregistrer_apres_commit(*(c.pk for c in objets))
+        self.mois_modifies.update(stats.debut_mois(c.date_creation) for c in objets)
+        self.vehicules_modifies.update(c.vehicule_id for c in objets)
+
+    def terminer(self):
+        stats.rafraichir_contrats()
+        for mois in sorted(self.mois_modifies):
+            stats.rafraichir_mois(mois)
+        stats.rafraichir_vehicules_contrats(self.vehicules_modifies)
+        generer_rappels()
+
+
+IMPORTEURS = {
+    'clients': ImporteurClients,
+    'vehicules': ImporteurVehicules,
+    'contrats': ImporteurContrats,
+}
+
+
+def importer(fichier, type_donnees, format_fichier='csv', taille_lot=TAILLE_LOT, simulation=False, acteur='import_data'):
+    """Importe le fichier ouvert ; retourne ``(nb_importes, erreurs)``.
+
+    ``erreurs`` est la liste des ``(numero_ligne, message)`` des lignes rejetées.
+    Avec ``simulation``, les lignes sont seulement validées.
+    """
+    importeur = IMPORTEURS[type_donnees](acteur)
+    lignes = lire_lignes(fichier, format_fichier)
+    nb_importes = 0
+    erreurs = []
+
+    while True:
+        lot = list(islice(lignes, taille_lot))
+        if not lot:
+            break
+        objets = []
+        for numero, ligne in lot:
+            try:
+                if isinstance(ligne, LigneInvalide):
+                    raise ligne
+                objets.append(importeur.construire(ligne))
+            except LigneInvalide as e:
+                erreurs.append((numero, str(e)))
+        if simulation or not objets:
+            nb_importes += len(objets)
+            continue
+        # Les entrées d'audit du lot sont écrites au commit de sa transaction
+        with transaction.atomic():
+            objets = importeur.modele.objects.bulk_create(objets)
+            importeur.apres_insertion(objets)
+        nb_importes += len(objets)
+
+    if nb_importes and not simulation:
+        importeur.terminer()
+    return nb_importes, erreurs
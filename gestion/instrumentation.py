@@ -0,0 +1,195 @@
+"""Relevé des requêtes SQL d'une requête HTTP (``InstrumentationSQLMiddleware``).
+
+Un ``execute_wrapper`` installé sur chaque connexion compte les requêtes,
+cumule leur durée et les regroupe par forme : le texte SQL avec ses
+paramètres (``%s``), les listes ``IN (%s, %s, ...)`` ramenées à un seul
+élément et les nombres remplacés par ``?``. Une même forme exécutée au moins
+``SQL_SEUIL_N_PLUS_UN`` fois est signalée comme N+1 probable.
+
+Le coût par requête SQL se limite à deux lectures d'horloge et à une mise à
+jour de dictionnaire ; la normalisation du texte n'a lieu qu'une fois par
+texte distinct. ``SQL_INSTRUMENTATION_TAUX`` fixe la part des requêtes HTTP
+instrumentées (1.0 en développement, quelques pour cent en production).
+
+Réglages (``settings``) : ``SQL_INSTRUMENTATION_TAUX``,
+``SQL_REQUETE_LENTE_MS``, ``SQL_SEUIL_N_PLUS_UN``.
+
+Le même relevé sert à l'en-tête ``Server-Timing`` (``ServerTimingMiddleware``),
+ajouté aux requêtes de l'échantillon et à toutes celles du personnel (le
+tirage est fait une fois par requête, ``echantillonnee()``, et le relevé
+installé une seule fois, ``releve_courant()``) : le temps y est réparti entre la
+base (``db``), le rendu des gabarits (``gabarit``, voir ``gabarits``), les
+effets de bord chronométrés par ``mesurer()`` (``journal``, ``audit``,
+``pdf``, ``images``) et le reste, attribué au code de la vue (``vue``).
+Chaque catégorie est comptée hors SQL, déjà compté dans ``db``. Le nombre
+de requêtes SQL (description de ``db``) n'est envoyé qu'au personnel.
+"""
+import random
+import re
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections
+
+NB_PIRES_REQUETES = 3
+
+_LISTE_PARAMETRES = re.compile(r'\(\s*%s(?:\s*,\s*%s)+\s*\)')
+_NOMBRE = re.compile(r'\b\d+\b')
+
+
+def taux_echantillonnage():
+    return getattr(settings, 'SQL_INSTRUMENTATION_TAUX', 1.0 if settings.DEBUG else 0.05)
+
+
+def echantillonnee(request):
+    """Indique si la requête HTTP fait partie de l'échantillon instrumenté (tirage unique par requête)."""
+    echantillon = getattr(request, '_instrumentation_echantillon', None)
+    if echantillon is None:
+        taux = taux_echantillonnage()
+        echantillon = request._instrumentation_echantillon = taux >= 1 or (taux > 0 and random.random() < taux)
+    return echantillon
+
+
+def seuil_requete_lente():
+    return getattr(settings, 'SQL_REQUETE_LENTE_MS', 500)
+
+
+def seuil_n_plus_un():
+    return getattr(settings, 'SQL_SEUIL_N_PLUS_UN', 5)
+
+
+@lru_cache(maxsize=1024)
+def forme(sql):
+    """Forme normalisée d'une requête, pour regrouper les requêtes identiques aux paramètres près."""
+    return _NOMBRE.sub('?', _LISTE_PARAMETRES.sub('(%s)', sql))
+
+
+class ReleveSQL:
+    """``execute_wrapper`` qui compte et chronomètre les requêtes SQL."""
+
+    def __init__(self):
+        self.nb = 0
+        self.duree = 0.0  # secondes
+        self.par_forme = {}  # sql -> [nombre, durée]
+
+    def __call__(self, execute, sql, params, many, context):
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duree = time.perf_counter() - debut
+            self.nb += 1
+            self.duree += duree
+            stats = self.par_forme.get(sql)
+            if stats is None:
+                self.par_forme[sql] = [1, duree]
+            else:
+                stats[0] += 1
+                stats[1] += duree
+
+    def installer(self, pile):
+        """Installe le relevé sur toutes les connexions dans la pile (``ExitStack``)."""
+        for connexion in connections.all():
+            pile.enter_context(connexion.execute_wrapper(self))
+        return pile
+
+    def _formes(self):
+        formes = {}
+        for sql, (nombre, duree) in self.par_forme.items():
+            cumul = formes.setdefault(forme(sql), [0, 0.0])
+            cumul[0] += nombre
+            cumul[1] += duree
+        return formes
+
+    def n_plus_un(self, seuil=None):
+        """Formes exécutées au moins ``seuil`` fois : ``[(forme, nombre, durée_ms), ...]``."""
+        seuil = seuil or seuil_n_plus_un()
+        return sorted(
+            ((sql, nombre, round(duree * 1000, 2)) for sql, (nombre, duree) in self._formes().items() if nombre >= seuil),
+            key=lambda ligne: -ligne[1],
+        )
+
+    def doublons(self):
+        """Nombre de requêtes dont la forme a déjà été exécutée dans la requête HTTP."""
+        return sum(nombre - 1 for nombre, _ in self._formes().values())
+
+    def pires(self, nombre=NB_PIRES_REQUETES):
+        """Formes les plus coûteuses en temps cumulé : ``[(forme, nombre, durée_ms), ...]``."""
+        return sorted(
+            ((sql, n, round(duree * 1000, 2)) for sql, (n, duree) in self._formes().items()),
+            key=lambda ligne: -ligne[2],
+        )[:nombre]
+
+
+def relever():
+    """Retourne ``(releve, pile)`` : le relevé est actif jusqu'à ``pile.close()``."""
+    releve = ReleveSQL()
+    return releve, releve.installer(ExitStack())
+
+
+_mesures = ContextVar('instrumentation_mesures', default=None)
+
+
+class Mesures:
+    """Durées (secondes, hors SQL) des catégories chronométrées pendant une requête HTTP."""
+
+    def __init__(self, releve):
+        self.releve = releve
+        self.durees = {}
+        self.profondeur = {}
+
+    def server_timing(self, total, detail=True):
+        """Valeur de l'en-tête ``Server-Timing`` pour une durée totale en secondes.
+
+        Sans ``detail``, le nombre de requêtes SQL n'est pas indiqué.
+        """
+        entrees = [f'db;dur={self.releve.duree * 1000:.1f}']
+        if detail:
+            entrees[0] += f';desc="{self.releve.nb} requêtes"'
+        for categorie, duree in self.durees.items():
+            entrees.append(f'{categorie};dur={duree * 1000:.1f}')
+        vue = max(0.0, total - self.releve.duree - sum(self.durees.values()))
+        entrees.append(f'vue;dur={vue * 1000:.1f}')
+        entrees.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(entrees)
+
+
+def releve_courant():
+    """Relevé SQL de la requête HTTP en cours de chronométrage, ou ``None``."""
+    mesures = _mesures.get()
+    return mesures.releve if mesures is not None else None
+
+
+@contextmanager
+def suivre_requete(releve):
+    """Active le chronométrage des catégories pour la requête HTTP courante."""
+    mesures = Mesures(releve)
+    jeton = _mesures.set(mesures)
+    try:
+        yield mesures
+    finally:
+        _mesures.reset(jeton)
+
+
+@contextmanager
+def mesurer(categorie):
+    """Chronomètre le bloc dans la catégorie donnée (sans effet hors requête HTTP).
+
+    Un bloc imbriqué dans un bloc de la même catégorie n'est compté qu'une fois.
+    """
+    mesures = _mesures.get()
+    if mesures is None or mesures.profondeur.get(categorie):
+        yield
+        return
+    mesures.profondeur[categorie] = 1
+    debut = time.perf_counter()
+    sql_debut = mesures.releve.duree
+    try:
+        yield
+    finally:
+        mesures.profondeur[categorie] = 0
+        duree = time.perf_counter() - debut - (mesures.releve.duree - sql_debut)
+        mesures.durees[categorie] = mesures.durees.get(categorie, 0.0) + duree
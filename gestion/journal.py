@@ -0,0 +1,316 @@
+"""Journal des instantanés JSON des contrats.
+
+Remplace l'ancien fichier ``contrats/contrat_<id>.json`` réécrit à chaque
+``Contrat.save()``. Chaque sauvegarde ajoute un enregistrement JSON compact à
+la fin du segment courant (``segment_000001.jsonl``). Un nouveau segment est
+ouvert quand le courant dépasse ``CONTRATS_JOURNAL_SEGMENT_MAX`` octets.
+
+Le fichier ``index.tsv`` (lui aussi en ajout seul) associe à chaque contrat
+le segment, la position et la longueur de son dernier enregistrement, ce
+qui permet de relire un instantané sans parcourir le journal.
+
+La suppression d'un contrat ajoute une pierre tombale
+(``{"contrat_id": ..., "supprime": true}``) au segment et une ligne d'index
+de segment ``-`` : le contrat disparaît de l'index, donc de la relecture et
+de l'export, et un parcours des segments voit aussi la suppression.
+
+Avec la compression, les segments pleins sont compressés au moment où le
+suivant est ouvert, par blocs de ``TAILLE_BLOC`` octets : chaque bloc est un
+membre gzip (le fichier ``.jsonl.gz`` reste lisible par ``zcat``) et
+``<segment>.gz.blocs`` donne la position de chaque membre. Les positions de
+l'index restent celles du segment non compressé : relire un instantané ne
+décompresse que le ou les blocs qui le contiennent.
+
+L'écriture est déclenchée après le commit de la transaction et réalisée par
+un thread d'arrière-plan qui regroupe les contrats en attente et les charge
+en une requête avec client et véhicule. La commande ``export_contrats_json``
+régénère l'ancien format un fichier par contrat.
+
+Réglages (``settings``) : ``CONTRATS_JOURNAL_DIR``,
+``CONTRATS_JOURNAL_SEGMENT_MAX``, ``CONTRATS_JOURNAL_COMPRESSION``,
+``CONTRATS_JOURNAL_ASYNC``.
+"""
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .instrumentation import mesurer
+
+try:
+    import fcntl
+except ImportError:  # Windows : verrou limité au processus
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+TAILLE_LOT = 500
+TAILLE_BLOC = 64 * 1024  # octets non compressés par membre gzip d'un segment compressé
+NOM_INDEX = 'index.tsv'
+SUPPRIME = '-'  # segment des lignes d'index d'un contrat supprimé
+
+_verrou = threading.Lock()
+_file = queue.Queue()
+_thread = None
+_index = {}
+_supprimes = set()
+_index_position = 0
+_index_dossier = None
+_blocs = {}
+
+
+def _dossier():
+    dossier = getattr(settings, 'CONTRATS_JOURNAL_DIR', None) or Path(settings.BASE_DIR) / 'contrats' / 'journal'
+    return Path(dossier)
+
+
+def _taille_segment_max():
+    return getattr(settings, 'CONTRATS_JOURNAL_SEGMENT_MAX', 8 * 1024 * 1024)
+
+
+def _compression():
+    return getattr(settings, 'CONTRATS_JOURNAL_COMPRESSION', False)
+
+
+def _numero(nom):
+    return int(nom[len('segment_'):len('segment_') + 6])
+
+
+def _compresser_segment(dossier, nom):
+    """Remplace le segment ``nom`` par sa version compressée par blocs et la table des blocs."""
+    source = dossier / nom
+    destination = dossier / f'{nom}.gz'
+    temporaire = dossier / f'{nom}.gz.tmp'
+    positions = []
+    with open(source, 'rb') as entree, open(temporaire, 'wb') as sortie:
+        while bloc := entree.read(TAILLE_BLOC):
+            positions.append(sortie.tell())
+            sortie.write(gzip.compress(bloc))
+        positions.append(sortie.tell())
+    # Table des blocs écrite avant le segment compressé, segment non compressé supprimé en dernier :
+    # un lecteur trouve toujours l'une des deux versions
+    (dossier / f'{nom}.gz.blocs').write_text(''.join(f'{position}\n' for position in positions))
+    os.replace(temporaire, destination)
+    os.remove(source)
+
+
+def _segment_courant(dossier):
+    """Nom du segment où écrire, en ouvrant un nouveau segment si le dernier est plein."""
+    noms = [nom for nom in os.listdir(dossier) if nom.startswith('segment_')]
+    numero = max((_numero(nom) for nom in noms), default=1)
+    nom = f'segment_{numero:06d}.jsonl'
+    chemin = dossier / nom
+    if chemin.exists() and chemin.stat().st_size >= _taille_segment_max():
+        nom = f'segment_{numero + 1:06d}.jsonl'
+    elif not chemin.exists() and noms:
+        # Dernier segment déjà compressé
+        nom = f'segment_{numero + 1:06d}.jsonl'
+    if _compression():
+        for ancien in noms:
+            if ancien.endswith('.jsonl') and ancien != nom:
+                _compresser_segment(dossier, ancien)
+    return nom
+
+
+def ajouter(instantanes):
+    """Ajoute des instantanés (dictionnaires avec ``contrat_id``) au journal."""
+    if not instantanes:
+        return
+    dossier = _dossier()
+    dossier.mkdir(parents=True, exist_ok=True)
+
+    with _verrou, open(dossier / 'journal.lock', 'a') as verrou_fichier:
+        if fcntl is not None:
+            fcntl.flock(verrou_fichier, fcntl.LOCK_EX)
+        try:
+            nom_segment = _segment_courant(dossier)
+            lignes_index = []
+            with open(dossier / nom_segment, 'ab') as segment:
+                position = segment.tell()
+                for instantane in instantanes:
+                    donnees = (json.dumps(instantane, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+                    segment.write(donnees)
+                    if instantane.get('supprime'):
+                        lignes_index.append(f"{instantane['contrat_id']}\t{SUPPRIME}\t0\t0\n")
+                    else:
+                        lignes_index.append(f"{instantane['contrat_id']}\t{nom_segment}\t{position}\t{len(donnees)}\n")
+                    position += len(donnees)
+            with open(dossier / NOM_INDEX, 'a', encoding='utf-8') as index:
+                index.writelines(lignes_index)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(verrou_fichier, fcntl.LOCK_UN)
+
+
+def _charger_index():
+    """Met à jour l'index en mémoire en ne lisant que les lignes ajoutées depuis la dernière lecture."""
+    global _index, _supprimes, _index_position, _index_dossier
+    dossier = _dossier()
+    if dossier != _index_dossier:
+        _index, _supprimes, _index_position, _index_dossier = {}, set(), 0, dossier
+    chemin = dossier / NOM_INDEX
+    if not chemin.exists():
+        return _index
+    with open(chemin, 'rb') as f:
+        f.seek(_index_position)
+        for ligne in f:
+            if not ligne.endswith(b'\n'):
+                break  # ligne en cours d'écriture par un autre processus
+            contrat_id, segment, position, longueur = ligne.decode('utf-8').rstrip('\n').split('\t')
+            if segment == SUPPRIME:
+                _index.pop(int(contrat_id), None)
+                _supprimes.add(int(contrat_id))
+            else:
+                _index[int(contrat_id)] = (segment, int(position), int(longueur))
+                _supprimes.discard(int(contrat_id))
+            _index_position += len(ligne)
+    return _index
+
+
+def _positions_blocs(chemin):
+    # Segment compressé : fichier immuable, table gardée en mémoire
+    positions = _blocs.get(chemin)
+    if positions is None:
+        positions = _blocs[chemin] = [int(ligne) for ligne in Path(f'{chemin}.blocs').read_text().split()]
+    return positions
+
+
+def _lire_compresse(chemin, position, longueur):
+    positions = _positions_blocs(chemin)
+    premier = position // TAILLE_BLOC
+    dernier = (position + longueur - 1) // TAILLE_BLOC
+    with open(chemin, 'rb') as f:
+        f.seek(positions[premier])
+        donnees = gzip.decompress(f.read(positions[dernier + 1] - positions[premier]))
+    debut = position - premier * TAILLE_BLOC
+    return donnees[debut:debut + longueur]
+
+
+def _lire(segment, position, longueur):
+    chemin = _dossier() / segment
+    try:
+        with open(chemin, 'rb') as f:
+            f.seek(position)
+            donnees = f.read(longueur)
+    except FileNotFoundError:
+        donnees = _lire_compresse(Path(f'{chemin}.gz'), position, longueur)
+    else:
+        if segment.endswith('.gz'):
+            # Ancien format : un membre gzip par enregistrement
+            donnees = gzip.decompress(donnees)
+    return json.loads(donnees)
+
+
+def lire_instantane(contrat_id):
+    """Dernier instantané enregistré pour le contrat, ou None."""
+    with _verrou:
+        entree = _charger_index().get(int(contrat_id))
+    if entree is None:
+        return None
+    return _lire(*entree)
+
+
+def derniers_instantanes(contrat_ids=None):
+    """Itère sur le dernier instantané de chaque contrat (ou des contrats donnés)."""
+    with _verrou:
+        index = dict(_charger_index())
+    ids = sorted(index) if contrat_ids is None else [int(i) for i in contrat_ids if int(i) in index]
+    for contrat_id in ids:
+        yield _lire(*index[contrat_id])
+
+
+def contrats_supprimes():
+    """Identifiants des contrats dont le dernier enregistrement est une pierre tombale."""
+    with _verrou:
+        _charger_index()
+        return set(_supprimes)
+
+
+def journaliser(contrat_ids):
+    """Charge les contrats donnés en une requête et ajoute leurs instantanés au journal."""
+    from .models import Contrat
+
+    contrat_ids = list(dict.fromkeys(contrat_ids))
+    for i in range(0, len(contrat_ids), TAILLE_LOT):
+        contrats = (
+            Contrat.objects
+            .filter(pk__in=contrat_ids[i:i + TAILLE_LOT])
+            .select_related('client', 'vehicule')
+            .order_by('pk')
+        )
+        ajouter([contrat.instantane() for contrat in contrats])
+
+
+def journaliser_suppressions(contrat_ids):
+    """Ajoute au journal la pierre tombale des contrats supprimés."""
+    ajouter([{'contrat_id': contrat_id, 'supprime': True} for contrat_id in dict.fromkeys(contrat_ids)])
+
+
+def _travailleur():
+    while True:
+        taches = [_file.get()]
+        try:
+            while len(taches) < TAILLE_LOT:
+                taches.append(_file.get_nowait())
+        except queue.Empty:
+            pass
+        try:
+            close_old_connections()
+            # Un contrat supprimé n'est plus chargé par journaliser() : sa pierre tombale,
+            # écrite après, reste son dernier enregistrement
+            journaliser([contrat_id for contrat_id, supprime in taches if not supprime])
+            journaliser_suppressions([contrat_id for contrat_id, supprime in taches if supprime])
+        except Exception:
+            logger.exception('Erreur écriture du journal des contrats')
+        finally:
+            close_old_connections()
+            for _ in taches:
+                _file.task_done()
+
+
+def _demarrer():
+    global _thread
+    if _thread is None or not _thread.is_alive():
+        _thread = threading.Thread(target=_travailleur, name='journal-contrats', daemon=True)
+        _thread.start()
+
+
+def _apres_commit(contrat_ids, supprime):
+    if getattr(settings, 'CONTRATS_JOURNAL_ASYNC', True):
+        # Même file que les instantanés : la pierre tombale suit les sauvegardes en attente
+        def planifier():
+            with mesurer('journal'):
+                _demarrer()
+                for contrat_id in contrat_ids:
+                    _file.put((contrat_id, supprime))
+    else:
+        def planifier():
+            with mesurer('journal'):
+                (journaliser_suppressions if supprime else journaliser)(contrat_ids)
+    transaction.on_commit(planifier)
+
+
+def enregistrer_apres_commit(*contrat_ids):
+    """Programme l'instantané des contrats après le commit de la transaction courante."""
+    _apres_commit(contrat_ids, supprime=False)
+
+
+def supprimer_apres_commit(*contrat_ids):
+    """Programme la pierre tombale des contrats supprimés après le commit."""
+    _apres_commit(contrat_ids, supprime=True)
+
+
+def vider():
+    """Attend que les instantanés en attente soient écrits."""
+    if _thread is not None and _thread.is_alive():
+        _file.join()
+
+
+atexit.register(vider)
@@ -0,0 +1,93 @@
+import json
+import platform
+import tempfile
+import time
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from gestion.benchmark import generer_donnees, mesurer_tout, comparer
+
+class Command(BaseCommand):
+    help = (
+        'Mesure latences, requêtes SQL et mémoire de chaque URL de gestion sur un jeu '
+        'de données synthétique, dans une base de test jetable'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=1000)
+        parser.add_argument('--vehicules', type=int, default=100)
+        parser.add_argument('--contrats', type=int, default=5000)
+        parser.add_argument('--repetitions', type=int, default=20, help='Appels mesurés par URL (défaut: 20)')
+        parser.add_argument('--url', action='append', dest='urls', help='Nom d\'URL à mesurer (répétable, toutes par défaut)')
+        parser.add_argument('--sortie', default='benchmark.json', help='Fichier JSON des résultats (défaut: benchmark.json)')
+        parser.add_argument('--reference', help='Résultats précédents : échec en cas de régression')
+        parser.add_argument('--tolerance', type=float, default=0.25, help='Hausse relative tolérée de la latence médiane et de la mémoire (défaut: 0.25)')
+
+    def handle(self, *args, **options):
+        reference = None
+        if options['reference']:
+            try:
+                with open(options['reference'], encoding='utf-8') as f:
+                    reference = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Référence illisible : {e}')
+
+        setup_test_environment()
+        nom_base = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        dossier = tempfile.mkdtemp(prefix='benchmark-')
+        try:
+            # Fichiers produits par les vues dans un dossier temporaire, traitements en ligne,
+            # lectures sur la base de test (pas de réplique)
+            with override_settings(
+                CONTRATS_JOURNAL_DIR=f'{dossier}/journal',
+                CONTRATS_JOURNAL_ASYNC=False,
+                CONTRATS_PDF_DIR=f'{dossier}/pdf',
+                MEDIA_ROOT=f'{dossier}/media',
+                VEHICULES_IMAGES_ASYNC=False,
+                REPLIQUE_ALIAS=None,
+                ALLOWED_HOSTS=['testserver'],
+            ):
+                debut = time.monotonic()
+                generer_donnees(options['clients'], options['vehicules'], options['contrats'])
+                self.stdout.write(f'Jeu de données créé en {time.monotonic() - debut:.1f} s')
+                utilisateur = User.objects.create_superuser('benchmark', 'benchmark@example.com', 'benchmark')
+                resultats = mesurer_tout(utilisateur, options['repetitions'], options['urls'])
+        finally:
+            connection.creation.destroy_test_db(nom_base, verbosity=0)
+            teardown_test_environment()
+
+        document = {
+            'parametres': {
+                'clients': options['clients'],
+                'vehicules': options['vehicules'],
+                'contrats': options['contrats'],
+                'repetitions': options['repetitions'],
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            'urls': resultats,
+        }
+        with open(options['sortie'], 'w', encoding='utf-8') as f:
+            json.dump(document, f, indent=2, sort_keys=True, ensure_ascii=False)
+            f.write('\n')
+
+        for nom, mesure in resultats.items():
+            self.stdout.write(
+                f"{nom:32} {mesure['statut']:>3}  p50 {mesure['p50_ms']:8.2f} ms  p95 {mesure['p95_ms']:8.2f} ms  "
+                f"{mesure['requetes_sql']:4d}/{mesure['requetes_sql_cache_chaud']:<4d} req.  {mesure['memoire_pic_kio']:9.1f} Kio"
+            )
+        self.stdout.write(self.style.SUCCESS(f'Résultats écrits dans {options["sortie"]}'))
+
+        if reference is not None:
+            if reference.get('parametres', {}).get('contrats') != options['contrats']:
+                self.stdout.write(self.style.WARNING('Jeu de données différent de la référence : comparaison indicative'))
+            regressions = comparer(reference.get('urls', {}), resultats, options['tolerance'], options['tolerance'])
+            if regressions:
+                for regression in regressions:
+                    self.stderr.write(regression)
+                raise CommandError(f'{len(regressions)} régression(s) par rapport à {options["reference"]}')
+            self.stdout.write(self.style.SUCCESS('Aucune régression'))
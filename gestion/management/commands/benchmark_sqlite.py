@@ -0,0 +1,59 @@
+import json
+import shutil
+import tempfile
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from gestion.benchmark import mesurer_concurrence
+from gestion.sqlite import PROFIL_DEFAUT
+
+# (nom, profil SQLite, écritures par sqlite.ecrire)
+SCENARIOS = (
+    ('defaut', None, False),
+    ('profil', PROFIL_DEFAUT, False),
+    ('profil+immediate', PROFIL_DEFAUT, True),
+)
+
+class Command(BaseCommand):
+    help = (
+        'Compare le débit de lectures et d\'écritures concurrentes sur SQLite : réglages par défaut, '
+        'profil de gestion/sqlite.py, puis profil avec transactions IMMEDIATE'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lecteurs', type=int, default=4, help='Threads lecteurs (défaut: 4)')
+        parser.add_argument('--ecrivains', type=int, default=4, help='Threads écrivains (défaut: 4)')
+        parser.add_argument('--duree', type=float, default=5.0, help='Durée de chaque scénario en secondes (défaut: 5)')
+        parser.add_argument('--scenario', action='append', dest='scenarios', choices=[s[0] for s in SCENARIOS],
+                            help='Scénario à mesurer (répétable, tous par défaut)')
+        parser.add_argument('--sortie', help='Fichier JSON des résultats')
+
+    def handle(self, *args, **options):
+        dossier = tempfile.mkdtemp(prefix='benchmark-sqlite-')
+        resultats = {}
+        try:
+            for nom, profil, via_ecrire in SCENARIOS:
+                if options['scenarios'] and nom not in options['scenarios']:
+                    continue
+                with override_settings(SQLITE_PROFIL=profil):
+                    resultats[nom] = mesurer_concurrence(
+                        dossier, options['lecteurs'], options['ecrivains'], options['duree'], via_ecrire,
+                    )
+                mesure = resultats[nom]
+                self.stdout.write(
+                    f"{nom:16} lectures {mesure['lectures_par_s']:9.1f}/s  écritures {mesure['ecritures_par_s']:8.1f}/s  "
+                    f"p95 écriture {mesure['ecriture_p95_ms'] or 0:8.2f} ms  verrous {mesure['verrous']:5d}  "
+                    f"autres erreurs {mesure['autres_erreurs']}"
+                )
+        finally:
+            shutil.rmtree(dossier, ignore_errors=True)
+
+        if options['sortie']:
+            document = {
+                'parametres': {k: options[k] for k in ('lecteurs', 'ecrivains', 'duree')},
+                'scenarios': resultats,
+            }
+            with open(options['sortie'], 'w', encoding='utf-8') as f:
+                json.dump(document, f, indent=2, sort_keys=True, ensure_ascii=False)
+                f.write('\n')
+            self.stdout.write(self.style.SUCCESS(f'Résultats écrits dans {options["sortie"]}'))
@@ -1,7 +1,9 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from gestion.models import Contrat
-from gestion.tasks import verifier_contrats_expires, nettoyer_anciens_contrats
+from gestion.tasks import (
+    verifier_contrats_expires, marquer_departs_du_jour, generer_rappels, nettoyer_anciens_contrats,
+)
 
 class Command(BaseCommand):
     help = 'Vérifie les contrats et envoie des notifications'
@@ -10,7 +12,21 @@ class Command(BaseCommand):
         self.stdout.write('Vérification des contrats...')
         
         # Vérifier les contrats expirés et envoyer notifications
-        verifier_contrats_expires()
+        resultat = verifier_contrats_expires()
+        self.stdout.write(
+            f"{resultat['expires']} contrat(s) passés en retard, "
+            f"{resultat['envoyes']} notification(s) envoyée(s)"
+        )
+        for contrat_id, erreur in resultat['echecs']:
+            self.stdout.write(self.style.WARNING(f'Échec notification contrat #{contrat_id}: {erreur}'))
+        
+        # Réservations qui commencent aujourd'hui : véhicules indisponibles
+        nb_departs = marquer_departs_du_jour()
+        self.stdout.write(f'{nb_departs} véhicule(s) marqués indisponibles (départs du jour)')
+        
+        # Précalculer les rappels du jour affichés sur l'accueil
+        nb_rappels = generer_rappels()
+        self.stdout.write(f'{nb_rappels} rappel(s) générés')
         
         # Nettoyer les vieux contrats
         nettoyer_anciens_contrats()
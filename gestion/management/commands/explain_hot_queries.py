@@ -0,0 +1,151 @@
+import re
+from datetime import timedelta
+from decimal import Decimal
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from gestion.calendrier import conflits, vehicules_libres
+from gestion.models import Client, Vehicule, Contrat, Rappel, AuditLog
+from gestion.occupation import bornes_fenetre, intervalles_fenetre
+from gestion.pagination import requete_page
+from gestion.stats import _bornes_mois, debut_mois
+from gestion.tableau_bord import requete_top_vehicules
+from gestion.views import PAR_PAGE_LISTES, TRIS_CLIENTS, TRIS_CONTRATS, TRIS_VEHICULES
+
+
+# Requêtes dont le résultat est, par nature, toute la table parcourue : signalées sans échec.
+# La recherche de disponibilités renvoie tous les véhicules libres (taille de la flotte,
+# pas de l'historique), avec une recherche dans l'index du calendrier par véhicule.
+PARCOURS_ATTENDUS = {'catalogue: recherche de disponibilités'}
+
+
+def requetes_frequentes():
+    """(libellé, queryset) des requêtes sur le chemin critique des vues, tâches et formulaires."""
+    aujourdhui = timezone.now().date()
+    debut_occ, fin_occ = bornes_fenetre(30, aujourdhui)
+    debut_mois_courant, fin_mois_courant = _bornes_mois(debut_mois(aujourdhui))
+    return [
+        ('tasks: contrats proches de l\'expiration',
+         Contrat.objects.filter(statut='actif', date_fin__range=[aujourdhui, aujourdhui + timedelta(days=2)])),
+        ('tasks: contrats expirés',
+         Contrat.objects.filter(statut='actif', date_fin__lt=aujourdhui)),
+        ('stats: contrats actifs', Contrat.objects.filter(statut='actif').values('id')),
+        ('stats: contrats du mois',
+         Contrat.objects.filter(date_creation__gte=debut_mois_courant, date_creation__lt=fin_mois_courant)),
+        ('occupation: intervalles de la fenêtre', intervalles_fenetre(debut_occ, fin_occ)),
+        ('index: contrats récents', Contrat.objects.order_by('-date_creation')[:5]),
+        ('dashboard: top véhicules', requete_top_vehicules()),
+        ('liste_contrats', Contrat.objects.select_related('client', 'vehicule').order_by('-date_creation', '-id')[:26]),
+        ('liste_contrats par date de début',
+         Contrat.objects.select_related('client', 'vehicule').order_by('date_debut', 'id')[:26]),
+        ('liste_contrats par statut', Contrat.objects.filter(statut='termine').order_by('-date_creation', '-id')[:26]),
+        ('exports: contrats en retard', Contrat.objects.filter(statut='en_retard').order_by('id')),
+        ('liste_clients', Client.objects.order_by('nom', 'prenom', 'id')[:26]),
+        ('liste_clients récents', Client.objects.order_by('-date_creation', '-id')[:26]),
+        ('liste_vehicules', Vehicule.objects.order_by('marque', 'modele', 'id')[:26]),
+        ('catalogue: véhicules disponibles', Vehicule.objects.filter(disponible=True).order_by('-date_ajout', '-id')),
+        ('formulaire: conflits de réservation', conflits(1, aujourdhui, aujourdhui + timedelta(days=7))),
+        ('catalogue: recherche de disponibilités', vehicules_libres(aujourdhui, aujourdhui + timedelta(days=7))),
+        ('index: rappels du jour',
+         Rappel.objects.filter(date_rappel=aujourdhui, envoye=False, contrat__statut='actif').select_related('contrat')),
+        ('audit: historique d\'un objet',
+         AuditLog.objects.filter(model='Contrat', object_id='1').order_by('-timestamp', '-id')[:51]),
+    ]
+
+
+def _valeur_exemple(champ):
+    # Valeur du bon type pour le plan : seule la forme de la requête compte
+    type_champ = champ.get_internal_type()
+    if type_champ == 'DateTimeField':
+        return timezone.now()
+    if type_champ == 'DateField':
+        return timezone.now().date()
+    if type_champ == 'DecimalField':
+        return Decimal('50.00')
+    if type_champ in ('CharField', 'TextField'):
+        return 'M'
+    return 1
+
+
+def pages_curseur():
+    """(libellé, queryset) d'une page profonde de chaque liste paginée par curseur.
+
+    Le plan doit être une recherche dans l'index (``SEARCH``) : un parcours de
+    l'index, même avec ``LIMIT``, coûte la profondeur de la page.
+    """
+    listes = [
+        ('liste_clients', Client.objects.all(), TRIS_CLIENTS, PAR_PAGE_LISTES),
+        ('liste_vehicules', Vehicule.objects.all(), TRIS_VEHICULES, PAR_PAGE_LISTES),
+        ('liste_contrats', Contrat.objects.select_related('client', 'vehicule'), TRIS_CONTRATS, PAR_PAGE_LISTES),
+        ('audit_list', AuditLog.objects.all(), {'recent': ['-timestamp', '-id']}, 50),
+    ]
+    pages = []
+    for nom, queryset, tris, par_page in listes:
+        for tri, ordre in tris.items():
+            valeurs = [_valeur_exemple(queryset.model._meta.get_field(champ.lstrip('-'))) for champ in ordre]
+            pages.append((f'{nom} (tri {tri}) : page suivante', requete_page(queryset, ordre, valeurs, par_page)))
+    return pages
+
+
+def index_partiels():
+    """Noms des index partiels (``condition``) des modèles de l'application."""
+    return {
+        index.name
+        for modele in apps.get_app_config('gestion').get_models()
+        for index in modele._meta.indexes
+        if index.condition is not None
+    }
+
+
+def parcours_complets(plan, limite=False):
+    """Lignes du plan SQLite qui parcourent une table entière.
+
+    Un parcours d'index (``SCAN t USING [COVERING] INDEX``) lit lui aussi toutes
+    les lignes, sauf sur un index partiel, ou s'il fournit l'ordre d'une requête
+    avec ``LIMIT`` (aucun tri temporaire) : il s'arrête alors après la page.
+    """
+    borne = limite and 'USE TEMP B-TREE' not in plan
+    partiels = index_partiels()
+    lignes = []
+    for ligne in plan.splitlines():
+        if 'SCAN ' not in ligne or 'CONSTANT ROW' in ligne:
+            continue
+        index = re.search(r'USING (?:COVERING )?INDEX (\w+)', ligne)
+        if index and (borne or index.group(1) in partiels):
+            continue
+        lignes.append(ligne)
+    return lignes
+
+
+class Command(BaseCommand):
+    help = 'Affiche le plan (EXPLAIN QUERY PLAN) des requêtes fréquentes et signale les parcours complets'
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            self.stdout.write(self.style.WARNING(
+                f'Base {connection.vendor} : plans affichés sans détection automatique des parcours complets'
+            ))
+
+        # Pages par curseur : le LIMIT n'excuse pas un parcours d'index
+        requetes = [(libelle, queryset, queryset.query.high_mark is not None) for libelle, queryset in requetes_frequentes()]
+        requetes += [(libelle, queryset, False) for libelle, queryset in pages_curseur()]
+
+        en_echec = []
+        for libelle, queryset, limite in requetes:
+            plan = queryset.explain()
+            self.stdout.write(self.style.MIGRATE_HEADING(libelle))
+            self.stdout.write(plan)
+            if connection.vendor == 'sqlite' and parcours_complets(plan, limite):
+                if libelle in PARCOURS_ATTENDUS:
+                    self.stdout.write(self.style.WARNING('  -> parcours complet attendu'))
+                else:
+                    en_echec.append(libelle)
+                    self.stdout.write(self.style.ERROR('  -> parcours complet de table'))
+            self.stdout.write('')
+
+        if en_echec:
+            raise CommandError(f'{len(en_echec)} requête(s) sans index : ' + ', '.join(en_echec))
+        self.stdout.write(self.style.SUCCESS('Toutes les requêtes fréquentes utilisent un index'))
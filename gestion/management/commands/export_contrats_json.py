@@ -0,0 +1,32 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand
+from gestion.journal import contrats_supprimes, derniers_instantanes, vider
+
+class Command(BaseCommand):
+    help = 'Exporte le journal des contrats au format un fichier JSON par contrat'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int, help='Identifiants des contrats (tous par défaut)')
+        parser.add_argument('--dest', default='contrats', help='Dossier de destination (défaut: contrats)')
+
+    def handle(self, *args, **options):
+        vider()
+        os.makedirs(options['dest'], exist_ok=True)
+
+        nb = 0
+        for data in derniers_instantanes(options['ids'] or None):
+            chemin = os.path.join(options['dest'], f"contrat_{data['contrat_id']}.json")
+            with open(chemin, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=4, ensure_ascii=False)
+            nb += 1
+
+        # Fichiers d'un export précédent pour des contrats supprimés depuis
+        for contrat_id in contrats_supprimes():
+            if not options['ids'] or contrat_id in options['ids']:
+                chemin = os.path.join(options['dest'], f'contrat_{contrat_id}.json')
+                if os.path.exists(chemin):
+                    os.remove(chemin)
+
+        self.stdout.write(self.style.SUCCESS(f'{nb} contrat(s) exporté(s) dans {options["dest"]}'))
@@ -0,0 +1,40 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from gestion.models import Vehicule
+from gestion import images
+
+class Command(BaseCommand):
+    help = 'Génère les images dérivées des photos de véhicules existantes, en parallèle'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Nombre de processus (défaut: nombre de CPU)')
+        parser.add_argument('--force', action='store_true', help='Régénère aussi les variantes déjà à jour')
+
+    def handle(self, *args, **options):
+        a_traiter = [
+            (vehicule.id, vehicule.image.name)
+            for vehicule in Vehicule.objects.exclude(image='').exclude(image__isnull=True).only('id', 'image', 'image_variantes')
+            if options['force'] or not images.variantes(vehicule)
+        ]
+        if not a_traiter:
+            self.stdout.write(self.style.SUCCESS('Aucune image à générer'))
+            return
+
+        # Les processus fils ne touchent pas à la base : les connexions héritées sont fermées
+        connections.close_all()
+        nb = erreurs = 0
+        with ProcessPoolExecutor(max_workers=max(1, options['workers'])) as executeur:
+            taches = {executeur.submit(images.generer, nom): (vehicule_id, nom) for vehicule_id, nom in a_traiter}
+            for tache in as_completed(taches):
+                vehicule_id, nom = taches[tache]
+                try:
+                    images.enregistrer(vehicule_id, nom, tache.result())
+                    nb += 1
+                except Exception as e:
+                    erreurs += 1
+                    self.stderr.write(f'Véhicule {vehicule_id} ({nom}) : {e}')
+
+        self.stdout.write(self.style.SUCCESS(f'{nb} photo(s) traitée(s), {erreurs} erreur(s)'))
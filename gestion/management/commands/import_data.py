@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from gestion.importation import importer, IMPORTEURS, TAILLE_LOT
+from gestion.journal import vider
+
+class Command(BaseCommand):
+    help = 'Importe en masse des clients, véhicules ou contrats depuis un fichier CSV ou JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('type', choices=sorted(IMPORTEURS), help='Type des données du fichier')
+        parser.add_argument('fichier', help='Fichier CSV (avec en-tête) ou JSONL')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Format du fichier (déduit de l\'extension par défaut)')
+        parser.add_argument('--taille-lot', type=int, default=TAILLE_LOT, help=f'Lignes par transaction (défaut: {TAILLE_LOT})')
+        parser.add_argument('--simulation', action='store_true', help='Valide le fichier sans rien importer')
+        parser.add_argument('--max-erreurs-affichees', type=int, default=20)
+
+    def handle(self, *args, **options):
+        format_fichier = options['format'] or ('jsonl' if options['fichier'].endswith(('.jsonl', '.ndjson')) else 'csv')
+        debut = time.monotonic()
+        try:
+            with open(options['fichier'], encoding='utf-8-sig', newline='') as fichier:
+                nb, erreurs = importer(
+                    fichier,
+                    options['type'],
+                    format_fichier=format_fichier,
+                    taille_lot=max(1, options['taille_lot']),
+                    simulation=options['simulation'],
+                )
+        except OSError as e:
+            raise CommandError(f'Lecture impossible : {e}')
+        vider()
+        duree = time.monotonic() - debut
+
+        for numero, message in erreurs[:options['max_erreurs_affichees']]:
+            self.stdout.write(self.style.WARNING(f'Ligne {numero} : {message}'))
+        if len(erreurs) > options['max_erreurs_affichees']:
+            self.stdout.write(self.style.WARNING(f'... {len(erreurs) - options["max_erreurs_affichees"]} autre(s) erreur(s)'))
+
+        debit = (nb + len(erreurs)) / duree * 60 if duree else 0
+        verbe = 'validée(s)' if options['simulation'] else 'importée(s)'
+        self.stdout.write(self.style.SUCCESS(
+            f'{nb} ligne(s) {verbe}, {len(erreurs)} rejetée(s) en {duree:.1f} s ({debit:,.0f} lignes/min)'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from gestion.stats import reconstruire
+
+class Command(BaseCommand):
+    help = 'Reconstruit les tables de cumul des statistiques de la flotte'
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write('Reconstruction des statistiques...')
+
+        stats = reconstruire()
+        for cle, valeur in stats.items():
+            self.stdout.write(f'  {cle}: {valeur}')
+
+        self.stdout.write(self.style.SUCCESS('Statistiques reconstruites avec succès'))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from gestion.replique import rafraichir, retard_max
+
+class Command(BaseCommand):
+    help = (
+        'Rafraîchit la réplique en lecture (copie de la base principale SQLite) ; '
+        'à lancer par cron ou en continu avec --intervalle'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalle', type=int, help='Rafraîchit toutes les N secondes sans s\'arrêter')
+
+    def handle(self, *args, **options):
+        intervalle = options['intervalle']
+        if intervalle and intervalle >= retard_max():
+            self.stdout.write(self.style.WARNING(
+                f'Intervalle >= REPLIQUE_RETARD_MAX ({retard_max()} s) : '
+                'la réplique sera par moments ignorée car trop ancienne'
+            ))
+        while True:
+            debut = time.monotonic()
+            try:
+                date = rafraichir()
+            except ImproperlyConfigured as e:
+                raise CommandError(str(e))
+            finally:
+                close_old_connections()
+            self.stdout.write(self.style.SUCCESS(
+                f'Réplique rafraîchie ({date:%Y-%m-%d %H:%M:%S} UTC) en {time.monotonic() - debut:.2f} s'
+            ))
+            if not intervalle:
+                return
+            time.sleep(max(0, intervalle - (time.monotonic() - debut)))
@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from gestion.models import Contrat
+from gestion import pdf_contrats
+
+class Command(BaseCommand):
+    help = 'Génère à l\'avance les PDF des contrats créés récemment'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jours', type=int, default=7, help='Contrats créés depuis N jours (défaut: 7)')
+        parser.add_argument('--limite', type=int, default=None, help='Nombre maximum de contrats')
+
+    def handle(self, *args, **options):
+        depuis = timezone.now() - timedelta(days=options['jours'])
+        contrats = (
+            Contrat.objects
+            .filter(date_creation__gte=depuis)
+            .select_related('client', 'vehicule')
+            .order_by('-date_creation', '-id')
+        )
+        if options['limite']:
+            contrats = contrats[:options['limite']]
+
+        generes = deja_prets = 0
+        for contrat in contrats.iterator(chunk_size=500):
+            if pdf_contrats.chemin(contrat).exists():
+                deja_prets += 1
+                continue
+            try:
+                pdf_contrats.obtenir(contrat)
+            except ImportError:
+                raise CommandError('La génération PDF nécessite la bibliothèque reportlab.')
+            generes += 1
+
+        self.stdout.write(self.style.SUCCESS(f'{generes} PDF généré(s), {deja_prets} déjà à jour'))
@@ -0,0 +1,134 @@
+import cProfile
+import logging
+import re
+import time
+import uuid
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.urls import reverse
+
+from . import audit, instrumentation
+
+logger = logging.getLogger(__name__)
+
+PARAMETRE_PROFIL = 'profil'
+NOM_PROFIL = re.compile(r'^[\w.-]+\.prof$')
+
+
+def dossier_profils():
+    return Path(getattr(settings, 'PROFILS_DIR', None) or Path(settings.BASE_DIR) / 'profils')
+
+
+def _personnel(request):
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_staff
+
+
+class AuditMiddleware:
+    """Regroupe les écritures d'audit de la requête et les attribue à l'utilisateur connecté."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with audit.tampon(acteur=request):
+            return self.get_response(request)
+
+
+class InstrumentationSQLMiddleware:
+    """Relève les requêtes SQL d'une partie des requêtes HTTP (voir ``instrumentation``).
+
+    Journalise les N+1 probables et les requêtes lentes avec leurs requêtes SQL
+    les plus coûteuses ; pour le personnel, ajoute les en-têtes ``X-SQL-*``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not instrumentation.echantillonnee(request):
+            return self.get_response(request)
+
+        debut = time.perf_counter()
+        releve = instrumentation.releve_courant()
+        if releve is None:
+            releve, pile = instrumentation.relever()
+        else:
+            # Relevé déjà installé par ServerTimingMiddleware
+            pile = ExitStack()
+        with pile:
+            response = self.get_response(request)
+        if response.streaming:
+            # Les requêtes d'un export en flux sont exécutées pendant la lecture du contenu
+            response.streaming_content = self._suivre(request, response.streaming_content, releve, debut)
+        else:
+            self._conclure(request, releve, debut)
+
+        if _personnel(request):
+            response['X-SQL-Requetes'] = str(releve.nb)
+            response['X-SQL-Duree-Ms'] = f'{releve.duree * 1000:.1f}'
+            response['X-SQL-Doublons'] = str(releve.doublons())
+        return response
+
+    def _suivre(self, request, contenu, releve, debut):
+        with releve.installer(ExitStack()):
+            yield from contenu
+        self._conclure(request, releve, debut)
+
+    def _conclure(self, request, releve, debut):
+        duree_ms = (time.perf_counter() - debut) * 1000
+        for sql, nombre, cumul_ms in releve.n_plus_un():
+            logger.warning('N+1 probable sur %s : %d requêtes (%.1f ms) %s', request.path, nombre, cumul_ms, sql)
+        if duree_ms >= instrumentation.seuil_requete_lente():
+            pires = '\n'.join(f'  {cumul_ms:.1f} ms x{nombre} {sql}' for sql, nombre, cumul_ms in releve.pires())
+            logger.warning(
+                'Requête lente %s %s : %.0f ms dont %.0f ms SQL (%d requêtes)\n%s',
+                request.method, request.path, duree_ms, releve.duree * 1000, releve.nb, pires,
+            )
+
+
+class ServerTimingMiddleware:
+    """Ajoute l'en-tête ``Server-Timing`` aux réponses (voir ``instrumentation``).
+
+    Seules les requêtes de l'échantillon (``SQL_INSTRUMENTATION_TAUX``, même
+    tirage que ``InstrumentationSQLMiddleware``) et celles du personnel sont
+    chronométrées ; le nombre de requêtes SQL n'est indiqué qu'au personnel.
+
+    Avec le paramètre ``?profil=1``, une requête du personnel est exécutée sous
+    cProfile ; le profil est enregistré dans ``PROFILS_DIR`` et son URL de
+    téléchargement renvoyée dans l'en-tête ``X-Profil``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not (instrumentation.echantillonnee(request) or _personnel(request)):
+            return self.get_response(request)
+
+        debut = time.perf_counter()
+        releve, pile = instrumentation.relever()
+        with pile, instrumentation.suivre_requete(releve) as mesures:
+            if request.GET.get(PARAMETRE_PROFIL) and _personnel(request):
+                response, nom_profil = self._profiler(request)
+                response['X-Profil'] = reverse('telecharger_profil', args=[nom_profil])
+            else:
+                response = self.get_response(request)
+        response['Server-Timing'] = mesures.server_timing(time.perf_counter() - debut, detail=_personnel(request))
+        return response
+
+    def _profiler(self, request):
+        profil = cProfile.Profile()
+        profil.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profil.disable()
+        dossier = dossier_profils()
+        dossier.mkdir(parents=True, exist_ok=True)
+        chemin = re.sub(r'[^a-zA-Z0-9]+', '-', request.path).strip('-') or 'racine'
+        nom = f"{time.strftime('%Y%m%d-%H%M%S')}-{chemin[:60]}-{uuid.uuid4().hex[:8]}.prof"
+        profil.dump_stats(dossier / nom)
+        return response, nom
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0006_alter_contrat_date_fin_alter_contrat_mode_paiement_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatistiqueMensuelle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mois', models.DateField(unique=True)),
+                ('nb_contrats', models.PositiveIntegerField(default=0)),
+                ('revenus', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Statistique mensuelle',
+                'verbose_name_plural': 'Statistiques mensuelles',
+                'ordering': ['mois'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StatistiquesFlotte',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_clients', models.PositiveIntegerField(default=0)),
+                ('total_vehicules', models.PositiveIntegerField(default=0)),
+                ('vehicules_disponibles', models.PositiveIntegerField(default=0)),
+                ('contrats_actifs', models.PositiveIntegerField(default=0)),
+                ('contrats_retard', models.PositiveIntegerField(default=0)),
+                ('date_maj', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Statistiques de la flotte',
+                'verbose_name_plural': 'Statistiques de la flotte',
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:14
+
+from datetime import timedelta
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def remplir_calendrier(apps, schema_editor):
+    Contrat = apps.get_model("gestion", "Contrat")
+    Reservation = apps.get_model("gestion", "Reservation")
+    contrats = Contrat.objects.filter(statut__in=["actif", "en_retard"])
+    Reservation.objects.bulk_create(
+        [
+            Reservation(
+                contrat_id=c.pk,
+                vehicule_id=c.vehicule_id,
+                date_debut=c.date_debut,
+                date_fin=c.date_fin or c.date_debut + timedelta(days=c.nb_jours),
+            )
+            for c in contrats.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0007_statistiques'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_debut', models.DateField()),
+                ('date_fin', models.DateField()),
+                ('contrat', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reservation', to='gestion.contrat')),
+                ('vehicule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='gestion.vehicule')),
+            ],
+            options={
+                'verbose_name': 'Réservation',
+                'verbose_name_plural': 'Réservations',
+                'indexes': [models.Index(fields=['vehicule', 'date_fin', 'date_debut'], name='reservation_vehicule_fin_idx')],
+            },
+        ),
+        migrations.RunPython(remplir_calendrier, migrations.RunPython.noop),
+    ]
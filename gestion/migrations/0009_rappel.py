@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0008_reservation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Rappel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_rappel', models.DateField()),
+                ('telephone', models.CharField(max_length=20)),
+                ('message', models.TextField()),
+                ('envoye', models.BooleanField(default=False)),
+                ('contrat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rappels', to='gestion.contrat')),
+            ],
+            options={
+                'verbose_name': 'Rappel',
+                'verbose_name_plural': 'Rappels',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['date_rappel', 'envoye'], name='rappel_date_envoye_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='rappel',
+            constraint=models.UniqueConstraint(fields=('contrat', 'date_rappel'), name='rappel_unique_par_jour'),
+        ),
+    ]
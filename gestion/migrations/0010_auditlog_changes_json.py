@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:19
+
+import json
+
+from django.db import migrations, models
+
+
+def texte_vers_json(apps, schema_editor):
+    # Les anciennes entrées contiennent str(model_to_dict(...)) : les conserver
+    # comme chaînes JSON pour que la conversion de colonne reste valide.
+    AuditLog = apps.get_model("gestion", "AuditLog")
+    for entree in AuditLog.objects.exclude(changes__isnull=True).iterator():
+        entree.changes = json.dumps(entree.changes) if entree.changes else None
+        entree.save(update_fields=["changes"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0009_rappel'),
+    ]
+
+    operations = [
+        migrations.RunPython(texte_vers_json, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='auditlog',
+            name='changes',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0011_auditlog_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['nom', 'prenom', 'id'], name='client_nom_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contrat',
+            index=models.Index(fields=['statut', 'date_fin'], name='contrat_statut_fin_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contrat',
+            index=models.Index(fields=['statut', 'date_creation', 'id'], name='contrat_statut_creation_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contrat',
+            index=models.Index(fields=['vehicule', 'date_debut', 'date_fin'], name='contrat_vehicule_dates_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contrat',
+            index=models.Index(fields=['date_creation', 'id'], name='contrat_creation_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicule',
+            index=models.Index(condition=models.Q(('disponible', True)), fields=['-date_ajout', '-id'], name='vehicule_catalogue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicule',
+            index=models.Index(fields=['date_ajout', 'id'], name='vehicule_ajout_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicule',
+            index=models.Index(fields=['marque', 'modele', 'id'], name='vehicule_marque_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicule',
+            index=models.Index(fields=['prix_journalier', 'id'], name='vehicule_prix_idx'),
+        ),
+    ]
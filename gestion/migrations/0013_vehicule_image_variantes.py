@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0012_index_requetes_frequentes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehicule',
+            name='image_variantes',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
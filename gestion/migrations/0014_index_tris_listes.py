@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 20:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0013_vehicule_image_variantes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['date_creation', 'id'], name='client_creation_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contrat',
+            index=models.Index(fields=['date_debut', 'id'], name='contrat_debut_idx'),
+        ),
+    ]
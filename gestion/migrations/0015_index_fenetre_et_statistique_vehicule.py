@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-18 20:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def remplir_statistiques_vehicules(apps, schema_editor):
+    Contrat = apps.get_model('gestion', 'Contrat')
+    StatistiqueVehicule = apps.get_model('gestion', 'StatistiqueVehicule')
+    StatistiqueVehicule.objects.bulk_create([
+        StatistiqueVehicule(vehicule_id=ligne['vehicule_id'], nb_contrats=ligne['nb'])
+        for ligne in Contrat.objects.values('vehicule_id').annotate(nb=models.Count('id')).order_by()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0014_index_tris_listes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatistiqueVehicule',
+            fields=[
+                ('vehicule', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='statistique', serialize=False, to='gestion.vehicule')),
+                ('nb_contrats', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Statistique véhicule',
+                'verbose_name_plural': 'Statistiques véhicules',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='contrat',
+            index=models.Index(fields=['date_fin', 'date_debut'], name='contrat_fenetre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='statistiquevehicule',
+            index=models.Index(fields=['nb_contrats', 'vehicule'], name='statvehicule_contrats_idx'),
+        ),
+        migrations.RunPython(remplir_statistiques_vehicules, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+def oublier_variantes(apps, schema_editor):
+    # Anciens noms de variantes (nom de fichier sans extension ni dossier) : des photos
+    # homonymes ont pu écraser leurs variantes. L'original est servi jusqu'à
+    # `generate_vehicle_images`, qui régénère les variantes sous les nouveaux noms.
+    Vehicule = apps.get_model('gestion', 'Vehicule')
+    Vehicule.objects.update(image_variantes={})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0015_index_fenetre_et_statistique_vehicule'),
+    ]
+
+    operations = [
+        migrations.RunPython(oublier_variantes, migrations.RunPython.noop),
+    ]
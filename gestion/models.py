@@ -3,6 +3,8 @@ from django.core.validators import MinValueValidator
 from datetime import date, timedelta
 import json
 from django.utils import timezone
+from .tarifs import prix_location
+from . import images
 
 class Client(models.Model):
     nom = models.CharField(max_length=100)
@@ -23,6 +25,11 @@ class Client(models.Model):
     class Meta:
         verbose_name = "Client"
         verbose_name_plural = "Clients"
+        indexes = [
+            # liste_clients (tri par nom ou par date de création, pagination par curseur)
+            models.Index(fields=['nom', 'prenom', 'id'], name='client_nom_idx'),
+            models.Index(fields=['date_creation', 'id'], name='client_creation_idx'),
+        ]
 
 class Vehicule(models.Model):
     TYPE_VEHICULE = [
@@ -41,23 +48,28 @@ class Vehicule(models.Model):
     disponible = models.BooleanField(default=True)
     # Image principale du véhicule (optionnelle)
     image = models.ImageField(upload_to='vehicules/', blank=True, null=True)
+    # Variantes redimensionnées de l'image (voir images.py)
+    image_variantes = models.JSONField(default=dict, blank=True, editable=False)
     date_ajout = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
         return f"{self.marque} {self.modele} ({self.immatriculation})"
     
+    @property
+    def image_srcset(self):
+        return images.srcset(self)
+
+    @property
+    def image_miniature_url(self):
+        return images.url(self, images.MINIATURE)
+
+    @property
+    def image_carte_url(self):
+        return images.url(self, images.CARTE)
+
     def calculer_prix_location(self, nb_jours):
-        prix_total = float(self.prix_journalier) * nb_jours
-        
-        # Réductions pour locations longue durée
-        if nb_jours > 30:
-            prix_total *= 0.7  # 30% de réduction pour plus d'un mois
-        elif nb_jours > 14:
-            prix_total *= 0.85  # 15% de réduction pour plus de 2 semaines
-        elif nb_jours > 7:
-            prix_total *= 0.9  # 10% de réduction pour plus d'une semaine
-            
-        return round(prix_total, 2)
+        # Réductions pour locations longue durée (voir tarifs.REMISES_DUREE)
+        return prix_location(self.prix_journalier, nb_jours)
     
     def to_dict(self):
         """Convertit l'objet en dictionnaire pour la sérialisation JSON."""
@@ -92,6 +104,19 @@ class Vehicule(models.Model):
     class Meta:
         verbose_name = "Véhicule"
         verbose_name_plural = "Véhicules"
+        indexes = [
+            # Catalogue public : véhicules disponibles, les plus récents d'abord
+            models.Index(
+                fields=['-date_ajout', '-id'],
+                condition=models.Q(disponible=True),
+                name='vehicule_catalogue_idx',
+            ),
+            # Recherche de disponibilités et liste_vehicules (plus récents d'abord)
+            models.Index(fields=['date_ajout', 'id'], name='vehicule_ajout_idx'),
+            # liste_vehicules (tris par marque et par prix)
+            models.Index(fields=['marque', 'modele', 'id'], name='vehicule_marque_idx'),
+            models.Index(fields=['prix_journalier', 'id'], name='vehicule_prix_idx'),
+        ]
 
 class Contrat(models.Model):
     STATUT_CHOICES = [
@@ -185,8 +210,9 @@ class Contrat(models.Model):
 
         return round(remboursement_net, 2)
     
-    def sauvegarder_json(self):
-        data = {
+    def instantane(self):
+        """Données du contrat enregistrées dans le journal (voir ``journal``)."""
+        return {
             'contrat_id': self.id,
             'client': {
                 'nom': self.client.nom,
@@ -203,30 +229,32 @@ class Contrat(models.Model):
             'dates': {
                 'creation': self.date_creation.isoformat(),
                 'debut': self.date_debut.isoformat(),
-                'fin': self.date_fin.isoformat(),
+                'fin': self.date_fin.isoformat() if self.date_fin else None,
             },
             'details_location': {
                 'nb_jours': self.nb_jours,
-                'montant_total': float(self.montant_total),
+                'montant_total': float(self.montant_total) if self.montant_total is not None else None,
                 'statut': self.statut,
             }
         }
-        
-        try:
-            import os
-            os.makedirs('contrats', exist_ok=True)
-            with open(f'contrats/contrat_{self.id}.json', 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=4, ensure_ascii=False)
-        except Exception as e:
-            print(f"Erreur sauvegarde JSON: {e}")
+
+    def sauvegarder_json(self):
+        """Ajoute l'instantané du contrat au journal, après le commit et hors du thread de la requête."""
+        from .journal import enregistrer_apres_commit
+        enregistrer_apres_commit(self.pk)
     
-    def envoyer_rappel(self):
+    def message_rappel(self):
+        """Texte du rappel de fin de location, ou None si aucun rappel n'est dû."""
         jours_restants = self.jours_restants()
         if jours_restants <= 2 and jours_restants > 0:
-            message = f"Rappel: Votre location du véhicule {self.vehicule} se termine dans {jours_restants} jour(s)."
-            print(f"ENVOI RAPPEL À {self.client.telephone}: {message}")
-            return message
+            return f"Rappel: Votre location du véhicule {self.vehicule} se termine dans {jours_restants} jour(s)."
         return None
+
+    def envoyer_rappel(self):
+        message = self.message_rappel()
+        if message:
+            print(f"ENVOI RAPPEL À {self.client.telephone}: {message}")
+        return message
     
     def save(self, *args, **kwargs):
         if self.est_en_retard() and self.statut == 'actif':
@@ -238,6 +266,21 @@ class Contrat(models.Model):
     class Meta:
         verbose_name = "Contrat"
         verbose_name_plural = "Contrats"
+        # Requêtes vérifiées par la commande explain_hot_queries
+        indexes = [
+            # tasks (statut='actif' + date_fin), compteurs et exports par statut
+            models.Index(fields=['statut', 'date_fin'], name='contrat_statut_fin_idx'),
+            # liste_contrats filtrée par statut, triée par date de création
+            models.Index(fields=['statut', 'date_creation', 'id'], name='contrat_statut_creation_idx'),
+            # historique par véhicule
+            models.Index(fields=['vehicule', 'date_debut', 'date_fin'], name='contrat_vehicule_dates_idx'),
+            # occupation : contrats qui se terminent après le début de la fenêtre
+            models.Index(fields=['date_fin', 'date_debut'], name='contrat_fenetre_idx'),
+            # statistiques mensuelles, contrats récents, liste_contrats
+            models.Index(fields=['date_creation', 'id'], name='contrat_creation_idx'),
+            # liste_contrats triée par date de début
+            models.Index(fields=['date_debut', 'id'], name='contrat_debut_idx'),
+        ]
 
 # Simple audit log to record create/update/delete on key models
 from django.db import models as _models
@@ -247,9 +290,98 @@ class AuditLog(_models.Model):
     model = _models.CharField(max_length=150)
     object_id = _models.CharField(max_length=150)
     action = _models.CharField(max_length=50)  # created/updated/deleted
-    changes = _models.TextField(blank=True, null=True)
+    changes = _models.JSONField(blank=True, null=True)  # {champ: [ancienne, nouvelle]}
 
     class Meta:
-        ordering = ['-timestamp']
+        ordering = ['-timestamp', '-id']
         verbose_name = 'Audit Log'
         verbose_name_plural = 'Audit Logs'
+        # Index des filtres du journal, tous terminés par timestamp pour la pagination par curseur
+        indexes = [
+            _models.Index(fields=['timestamp', 'id'], name='auditlog_ts_id_idx'),
+            _models.Index(fields=['model', 'object_id', 'timestamp'], name='auditlog_objet_ts_idx'),
+            _models.Index(fields=['model', 'timestamp'], name='auditlog_model_ts_idx'),
+            _models.Index(fields=['actor', 'timestamp'], name='auditlog_actor_ts_idx'),
+            _models.Index(fields=['action', 'timestamp'], name='auditlog_action_ts_idx'),
+        ]
+
+
+class StatistiquesFlotte(models.Model):
+    """Compteurs globaux de la flotte, tenus à jour par les signaux (une seule ligne, pk=1)."""
+    total_clients = models.PositiveIntegerField(default=0)
+    total_vehicules = models.PositiveIntegerField(default=0)
+    vehicules_disponibles = models.PositiveIntegerField(default=0)
+    contrats_actifs = models.PositiveIntegerField(default=0)
+    contrats_retard = models.PositiveIntegerField(default=0)
+    date_maj = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Statistiques de la flotte"
+        verbose_name_plural = "Statistiques de la flotte"
+
+
+class StatistiqueMensuelle(models.Model):
+    """Nombre de contrats et revenus cumulés par mois de création."""
+    mois = models.DateField(unique=True)
+    nb_contrats = models.PositiveIntegerField(default=0)
+    revenus = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['mois']
+        verbose_name = "Statistique mensuelle"
+        verbose_name_plural = "Statistiques mensuelles"
+
+
+class StatistiqueVehicule(models.Model):
+    """Nombre de contrats par véhicule (top véhicules du tableau de bord)."""
+    vehicule = models.OneToOneField(Vehicule, on_delete=models.CASCADE, primary_key=True, related_name='statistique')
+    nb_contrats = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Statistique véhicule"
+        verbose_name_plural = "Statistiques véhicules"
+        indexes = [
+            # Top véhicules : lecture des premières lignes de l'index, sans tri
+            models.Index(fields=['nb_contrats', 'vehicule'], name='statvehicule_contrats_idx'),
+        ]
+
+
+class Reservation(models.Model):
+    """Intervalle bloquant d'un contrat (actif ou en retard) dans le calendrier d'un véhicule.
+
+    Tenue à jour par les signaux de ``Contrat`` (voir ``calendrier``).
+    """
+    contrat = models.OneToOneField(Contrat, on_delete=models.CASCADE, related_name='reservation')
+    vehicule = models.ForeignKey(Vehicule, on_delete=models.CASCADE, related_name='reservations')
+    date_debut = models.DateField()
+    date_fin = models.DateField()
+
+    class Meta:
+        verbose_name = "Réservation"
+        verbose_name_plural = "Réservations"
+        indexes = [
+            models.Index(fields=['vehicule', 'date_fin', 'date_debut'], name='reservation_vehicule_fin_idx'),
+        ]
+
+
+class Rappel(models.Model):
+    """Rappel de fin de location précalculé pour un jour donné (voir ``tasks.generer_rappels``)."""
+    contrat = models.ForeignKey(Contrat, on_delete=models.CASCADE, related_name='rappels')
+    date_rappel = models.DateField()
+    telephone = models.CharField(max_length=20)
+    message = models.TextField()
+    envoye = models.BooleanField(default=False)
+
+    def __str__(self):
+        return self.message
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = "Rappel"
+        verbose_name_plural = "Rappels"
+        constraints = [
+            models.UniqueConstraint(fields=['contrat', 'date_rappel'], name='rappel_unique_par_jour'),
+        ]
+        indexes = [
+            models.Index(fields=['date_rappel', 'envoye'], name='rappel_date_envoye_idx'),
+        ]
@@ -0,0 +1,94 @@
+"""Calcul du taux d'occupation des véhicules sur une fenêtre glissante.
+
+Tous les intervalles de contrats qui chevauchent la fenêtre sont lus en une
+seule requête, triés par véhicule puis par date de début. Chaque intervalle
+est découpé aux bornes de la fenêtre et fusionné avec le précédent du même
+véhicule, ce qui donne le nombre réel de jours loués (sans double comptage
+des contrats qui se recouvrent) en un seul passage linéaire.
+
+Un contrat occupe le véhicule sur ``[date_debut, date_fin)`` : ``date_fin``
+est calculée comme ``date_debut + nb_jours``. Les contrats rompus ne comptent
+pas : leur date de rupture n'est pas enregistrée, et leur ``date_fin`` est
+celle prévue avant la rupture.
+"""
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Vehicule, Contrat
+
+FENETRES_JOURS = (7, 30, 90, 365)
+# Contrats pendant lesquels le véhicule a réellement été loué
+STATUTS_OCCUPATION = ('actif', 'en_retard', 'termine')
+
+
+def bornes_fenetre(jours, aujourdhui=None):
+    """Fenêtre ``[debut, fin)`` des ``jours`` derniers jours, aujourd'hui inclus."""
+    aujourdhui = aujourdhui or timezone.now().date()
+    fin = aujourdhui + timedelta(days=1)
+    return fin - timedelta(days=jours), fin
+
+
+def intervalles_fenetre(debut, fin):
+    """Intervalles ``(vehicule_id, date_debut, date_fin, nb_jours)`` qui chevauchent ``[debut, fin)``."""
+    return (
+        Contrat.objects
+        .filter(statut__in=STATUTS_OCCUPATION, date_debut__lt=fin)
+        .filter(Q(date_fin__gt=debut) | Q(date_fin__isnull=True))
+        .order_by('vehicule_id', 'date_debut')
+        .values_list('vehicule_id', 'date_debut', 'date_fin', 'nb_jours')
+    )
+
+
+def jours_loues_par_vehicule(debut, fin):
+    """Retourne ``{vehicule_id: jours_loues}`` pour la fenêtre ``[debut, fin)``."""
+    intervalles = intervalles_fenetre(debut, fin)
+
+    resultat = {}
+    vehicule_courant = None
+    bloc_debut = bloc_fin = None
+    total = 0
+    for vehicule_id, date_debut, date_fin, nb_jours in intervalles.iterator():
+        if date_fin is None:
+            date_fin = date_debut + timedelta(days=nb_jours)
+        d = max(date_debut, debut)
+        f = min(date_fin, fin)
+        if f <= d:
+            continue
+
+        if vehicule_id != vehicule_courant:
+            if vehicule_courant is not None:
+                resultat[vehicule_courant] = total + (bloc_fin - bloc_debut).days
+            vehicule_courant = vehicule_id
+            bloc_debut, bloc_fin, total = d, f, 0
+        elif d <= bloc_fin:
+            # Recouvrement ou contiguïté : prolonger le bloc courant
+            bloc_fin = max(bloc_fin, f)
+        else:
+            total += (bloc_fin - bloc_debut).days
+            bloc_debut, bloc_fin = d, f
+
+    if vehicule_courant is not None:
+        resultat[vehicule_courant] = total + (bloc_fin - bloc_debut).days
+    return resultat
+
+
+def occupation_vehicules(jours=30, aujourdhui=None):
+    """Taux d'occupation de chaque véhicule sur les ``jours`` derniers jours.
+
+    Deux requêtes au total, quel que soit le nombre de véhicules ou de contrats.
+    """
+    debut, fin = bornes_fenetre(jours, aujourdhui)
+    jours_loues = jours_loues_par_vehicule(debut, fin)
+
+    data = []
+    vehicules = Vehicule.objects.order_by('id').values_list('id', 'marque', 'modele')
+    for vehicule_id, marque, modele in vehicules.iterator():
+        loues = jours_loues.get(vehicule_id, 0)
+        data.append({
+            'vehicule': f"{marque} {modele}",
+            'jours_loues': loues,
+            'taux_occupation': round(loues / jours * 100, 2),
+        })
+    return data
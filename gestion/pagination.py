@@ -0,0 +1,136 @@
+"""Pagination par curseur (keyset).
+
+Au lieu de ``OFFSET n`` (coût proportionnel à la profondeur de la page) et
+d'un ``COUNT(*)`` sur toute la table, chaque page est lue à partir des
+valeurs de tri de la dernière ligne affichée :
+``WHERE timestamp <= :t AND (timestamp < :t OR (timestamp = :t AND id < :id))
+ORDER BY timestamp DESC, id DESC LIMIT n``.
+La borne seule sur le premier champ de tri est redondante, mais c'est elle
+que SQLite sait utiliser comme intervalle d'index (``SEARCH``) : sans elle,
+la disjonction l'oblige à parcourir l'index depuis le début (``SCAN``).
+Avec un index sur les colonnes de tri, le coût d'une page ne dépend alors
+pas de sa position.
+
+Le dernier champ de ``ordre`` doit être unique (en général ``id``) et les
+champs de tri ne doivent pas être nuls.
+"""
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.db.models import Q
+
+
+class CurseurInvalide(ValueError):
+    pass
+
+
+def _encoder_valeur(valeur):
+    if isinstance(valeur, (datetime, date)):
+        return valeur.isoformat()
+    if isinstance(valeur, Decimal):
+        return str(valeur)
+    return valeur
+
+
+def encoder_curseur(sens, valeurs):
+    brut = json.dumps([sens] + [_encoder_valeur(v) for v in valeurs], separators=(',', ':'))
+    return base64.urlsafe_b64encode(brut.encode()).decode().rstrip('=')
+
+
+def decoder_curseur(curseur, champs):
+    """Retourne ``(sens, valeurs)`` ; ``sens`` vaut 'a' (après) ou 'b' (avant)."""
+    try:
+        brut = base64.urlsafe_b64decode(curseur + '=' * (-len(curseur) % 4))
+        sens, *valeurs = json.loads(brut)
+        if sens not in ('a', 'b') or len(valeurs) != len(champs):
+            raise ValueError(curseur)
+        return sens, [champ.to_python(v) for champ, v in zip(champs, valeurs)]
+    except Exception as e:
+        raise CurseurInvalide(curseur) from e
+
+
+def _condition_apres(ordre, valeurs):
+    """Q des lignes situées strictement après ``valeurs`` dans l'ordre donné."""
+    condition = Q()
+    egalites = Q()
+    for nom, valeur in zip(ordre, valeurs):
+        champ = nom.lstrip('-')
+        lookup = 'lt' if nom.startswith('-') else 'gt'
+        condition |= egalites & Q(**{f'{champ}__{lookup}': valeur})
+        egalites &= Q(**{champ: valeur})
+    # Borne du premier champ : intervalle d'index pour la base
+    premier = ordre[0]
+    borne = Q(**{f"{premier.lstrip('-')}__{'lte' if premier.startswith('-') else 'gte'}": valeurs[0]})
+    return borne & condition
+
+
+def _inverser(ordre):
+    return [nom[1:] if nom.startswith('-') else f'-{nom}' for nom in ordre]
+
+
+class PageCurseur:
+    """Une page de résultats et les curseurs des pages voisines."""
+
+    def __init__(self, object_list, ordre, has_next, has_previous):
+        self.object_list = object_list
+        self.ordre = ordre
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def _valeurs(self, obj):
+        return [getattr(obj, nom.lstrip('-')) for nom in self.ordre]
+
+    @property
+    def curseur_suivant(self):
+        if self.has_next and self.object_list:
+            return encoder_curseur('a', self._valeurs(self.object_list[-1]))
+        return None
+
+    @property
+    def curseur_precedent(self):
+        if self.has_previous and self.object_list:
+            return encoder_curseur('b', self._valeurs(self.object_list[0]))
+        return None
+
+
+def requete_page(queryset, ordre, valeurs=None, par_page=25):
+    """Requête d'une page (``par_page + 1`` lignes) située après ``valeurs`` dans l'ordre donné."""
+    if valeurs is not None:
+        queryset = queryset.filter(_condition_apres(ordre, valeurs))
+    return queryset.order_by(*ordre)[:par_page + 1]
+
+
+def paginer_par_curseur(queryset, ordre, curseur=None, par_page=25):
+    """Page de ``queryset`` triée selon ``ordre`` (ex. ``['-timestamp', '-id']``).
+
+    Un curseur invalide renvoie à la première page.
+    """
+    champs = [queryset.model._meta.get_field(nom.lstrip('-')) for nom in ordre]
+    sens, valeurs = 'a', None
+    if curseur:
+        try:
+            sens, valeurs = decoder_curseur(curseur, champs)
+        except CurseurInvalide:
+            sens, valeurs = 'a', None
+
+    if sens == 'b':
+        lignes = list(requete_page(queryset, _inverser(ordre), valeurs, par_page))
+        has_previous = len(lignes) > par_page
+        lignes = lignes[:par_page]
+        lignes.reverse()
+        return PageCurseur(lignes, ordre, has_next=True, has_previous=has_previous)
+
+    lignes = list(requete_page(queryset, ordre, valeurs, par_page))
+    has_next = len(lignes) > par_page
+    return PageCurseur(lignes[:par_page], ordre, has_next=has_next, has_previous=valeurs is not None)
@@ -0,0 +1,115 @@
+"""Cache des PDF de contrats.
+
+Chaque PDF est stocké sous ``<CONTRATS_PDF_DIR>/<contrat_id>/<empreinte>.pdf``,
+où l'empreinte est un SHA-256 des lignes affichées dans le document (donc du
+contrat, de son client et de son véhicule). Un téléchargement répété est un
+simple envoi de fichier, avec l'empreinte comme ETag (réponse 304 si le
+navigateur a déjà la bonne version).
+
+Une modification du contrat, du client ou du véhicule change l'empreinte :
+l'ancien fichier n'est plus jamais servi. Les signaux de ``signals_pdf``
+suppriment ces fichiers périmés après le commit. La commande
+``warm_contract_pdfs`` génère à l'avance les PDF des contrats récents.
+"""
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+
+from .instrumentation import mesurer
+
+# À incrémenter quand la mise en page change, pour régénérer tous les PDF
+VERSION_MISE_EN_PAGE = 1
+
+
+def _dossier():
+    dossier = getattr(settings, 'CONTRATS_PDF_DIR', None) or Path(settings.BASE_DIR) / 'contrats' / 'pdf'
+    return Path(dossier)
+
+
+def lignes(contrat):
+    """Lignes affichées dans le PDF (contrat chargé avec client et véhicule)."""
+    return [
+        f'Client: {contrat.client}',
+        f'Vehicule: {contrat.vehicule}',
+        f'Date de création: {contrat.date_creation.strftime("%d/%m/%Y %H:%M") if contrat.date_creation else "-"}',
+        f'Date début: {contrat.date_debut}',
+        f'Date fin: {contrat.date_fin}',
+        f'Nombre de jours: {contrat.nb_jours}',
+        f'Montant total: {contrat.montant_total} FCFA',
+        f'Statut: {contrat.get_statut_display()}',
+    ]
+
+
+def empreinte(contrat):
+    contenu = '\n'.join([f'v{VERSION_MISE_EN_PAGE}', f'Contrat #{contrat.id}'] + lignes(contrat))
+    return hashlib.sha256(contenu.encode('utf-8')).hexdigest()
+
+
+def chemin(contrat, cle=None):
+    return _dossier() / str(contrat.id) / f'{cle or empreinte(contrat)}.pdf'
+
+
+def generer(contrat):
+    """Construit le PDF avec reportlab et retourne son contenu (ImportError sans reportlab)."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+
+    # En-tête
+    c.setFont('Helvetica-Bold', 16)
+    c.drawString(40, height - 60, f'Contrat #{contrat.id} - ACA Location')
+
+    c.setFont('Helvetica', 12)
+    y = height - 100
+    for ligne in lignes(contrat):
+        c.drawString(40, y, ligne)
+        y -= 20
+        if y < 80:
+            c.showPage()
+            y = height - 60
+
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def obtenir(contrat, generateur=generer):
+    """Retourne ``(chemin, empreinte)`` du PDF à jour, en le générant si besoin."""
+    cle = empreinte(contrat)
+    fichier = chemin(contrat, cle)
+    if not fichier.exists():
+        with mesurer('pdf'):
+            contenu = generateur(contrat)
+        fichier.parent.mkdir(parents=True, exist_ok=True)
+        # Écriture dans un fichier temporaire puis renommage : un lecteur
+        # concurrent ne voit jamais de PDF partiel
+        descripteur, temporaire = tempfile.mkstemp(dir=fichier.parent, suffix='.tmp')
+        with os.fdopen(descripteur, 'wb') as f:
+            f.write(contenu)
+        os.replace(temporaire, fichier)
+    return fichier, cle
+
+
+def purger(contrat_ids):
+    """Supprime les PDF périmés des contrats donnés ; seuls ceux qui ont des PDF sont chargés."""
+    from .models import Contrat
+
+    ids = [i for i in dict.fromkeys(contrat_ids) if (_dossier() / str(i)).is_dir()]
+    contrats = Contrat.objects.filter(id__in=ids).select_related('client', 'vehicule')
+    for contrat in contrats:
+        a_garder = f'{empreinte(contrat)}.pdf'
+        for fichier in (_dossier() / str(contrat.id)).iterdir():
+            if fichier.name != a_garder:
+                fichier.unlink(missing_ok=True)
+
+
+def supprimer(contrat_id):
+    shutil.rmtree(_dossier() / str(contrat_id), ignore_errors=True)
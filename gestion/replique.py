@@ -0,0 +1,186 @@
+"""Réplique en lecture pour les rapports, exports et tableaux de bord.
+
+``RouteurReplique`` (``DATABASE_ROUTERS``) envoie sur l'alias
+``REPLIQUE_ALIAS`` les lectures faites dans un bloc ``utiliser_replique()``
+ou dans une vue décorée par ``vue_replique`` (exports CSV, endpoints de
+statistiques, tableau de bord de l'admin). Toutes les écritures, et les
+lectures qui doivent voir l'écriture qui précède (``creer_contrat``,
+``retour_contrat``...), restent sur la base principale.
+
+La réplique n'est utilisée que si son instantané date de moins de
+``REPLIQUE_RETARD_MAX`` secondes ; sinon, ou sans réplique, la lecture se
+fait sur la base principale. ``exiger_fraicheur(date)`` impose en plus un
+instantané postérieur à une date : ``cache_json`` l'utilise pour ne pas
+remettre en cache, après une invalidation, des données antérieures à
+l'écriture qui l'a provoquée.
+
+Réplique locale : ``rafraichir()`` copie la base principale SQLite dans le
+fichier de la réplique avec l'API de sauvegarde de SQLite (copie cohérente,
+sans bloquer les écritures en mode WAL), puis remplace le fichier d'un coup.
+La date de l'instantané est la date de modification du fichier. La commande
+``refresh_replica`` (cron ou ``--intervalle``) la rafraîchit régulièrement.
+Les connexions à la réplique sont en lecture seule (``query_only``).
+
+Réglages (``settings``) : ``REPLIQUE_ALIAS`` (``None`` : pas de réplique),
+``REPLIQUE_RETARD_MAX``.
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_lecture = ContextVar('replique_lecture', default=None)
+
+
+def alias():
+    return getattr(settings, 'REPLIQUE_ALIAS', None)
+
+
+def retard_max():
+    return getattr(settings, 'REPLIQUE_RETARD_MAX', 300)
+
+
+def instantane():
+    """Date de l'instantané de la réplique, ou ``None`` sans réplique utilisable."""
+    nom = alias()
+    if not nom or nom not in connections.settings:
+        return None
+    try:
+        date = os.path.getmtime(connections[nom].settings_dict['NAME'])
+    except (OSError, TypeError):
+        return None
+    return datetime.fromtimestamp(date, tz=dt_timezone.utc)
+
+
+def _alias_lecture(apres=None):
+    date = instantane()
+    if date is None:
+        return None
+    limite = timezone.now() - timedelta(seconds=retard_max())
+    if apres is not None:
+        # Versions du cache datées à la seconde près
+        limite = max(limite, apres + timedelta(seconds=1))
+    if date < limite:
+        logger.info('Réplique du %s trop ancienne : lecture sur la base principale', date)
+        return None
+    return alias()
+
+
+@contextmanager
+def utiliser_replique():
+    """Lectures du bloc sur la réplique si elle est assez récente ; retourne l'alias utilisé (ou ``None``)."""
+    jeton = _lecture.set(_alias_lecture())
+    try:
+        yield _lecture.get()
+    finally:
+        _lecture.reset(jeton)
+
+
+@contextmanager
+def exiger_fraicheur(date):
+    """Dans un bloc ``utiliser_replique()``, revient à la base principale si l'instantané précède ``date``."""
+    if _lecture.get() is None:
+        yield
+        return
+    jeton = _lecture.set(_alias_lecture(apres=date))
+    try:
+        yield
+    finally:
+        _lecture.reset(jeton)
+
+
+def _flux(contenu, alias_lecture):
+    # Le contenu d'une réponse en flux est lu après la vue : chaque morceau
+    # est produit avec la même base que la vue
+    iterateur = iter(contenu)
+    while True:
+        jeton = _lecture.set(alias_lecture)
+        try:
+            morceau = next(iterateur)
+        except StopIteration:
+            return
+        finally:
+            _lecture.reset(jeton)
+        yield morceau
+
+
+def vue_replique(vue):
+    """Décorateur : la vue (et le contenu d'une réponse en flux) lit sur la réplique."""
+    if asyncio.iscoroutinefunction(vue):
+        @wraps(vue)
+        async def wrapper_async(request, *args, **kwargs):
+            with utiliser_replique():
+                return await vue(request, *args, **kwargs)
+        return wrapper_async
+
+    @wraps(vue)
+    def wrapper(request, *args, **kwargs):
+        with utiliser_replique() as alias_lecture:
+            response = vue(request, *args, **kwargs)
+        if alias_lecture and response.streaming:
+            response.streaming_content = _flux(response.streaming_content, alias_lecture)
+        return response
+    return wrapper
+
+
+class RouteurReplique:
+    """Lectures des blocs ``utiliser_replique()`` sur la réplique, écritures sur la base principale."""
+
+    def db_for_read(self, model, **hints):
+        return _lecture.get()
+
+    def db_for_write(self, model, **hints):
+        # Y compris pour un objet lu sur la réplique
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplique reçoit le schéma avec la copie de la base principale
+        if db == alias():
+            return False
+        return None
+
+
+def rafraichir(destination=None):
+    """Copie la base principale dans le fichier de la réplique ; retourne la date de l'instantané."""
+    source = connections[DEFAULT_DB_ALIAS]
+    if source.vendor != 'sqlite' or source.is_in_memory_db():
+        raise ImproperlyConfigured('La réplique locale nécessite une base principale SQLite sur disque.')
+    if destination is None:
+        if not alias():
+            raise ImproperlyConfigured('REPLIQUE_ALIAS non configuré.')
+        destination = connections[alias()].settings_dict['NAME']
+    destination = str(destination)
+    temporaire = f'{destination}.tmp'
+    if os.path.exists(temporaire):
+        os.remove(temporaire)
+
+    debut = time.time()
+    # Connexion dédiée : la copie ne dépend pas d'une transaction ouverte par Django
+    origine = sqlite3.connect(str(source.settings_dict['NAME']), timeout=30)
+    cible = sqlite3.connect(temporaire)
+    try:
+        origine.backup(cible)
+        # Fichier autonome : pas de journal WAL à côté de la réplique
+        cible.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        cible.close()
+        origine.close()
+    # Date de l'instantané : début de la copie
+    os.utime(temporaire, (debut, debut))
+    os.replace(temporaire, destination)
+    return datetime.fromtimestamp(debut, tz=dt_timezone.utc)
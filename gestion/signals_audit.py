@@ -1,47 +1,60 @@
-
-from django.db.models.signals import post_save, post_delete
-from django.dispatch import receiver
-from .models import AuditLog, Client, Vehicule, Contrat
-from django.forms.models import model_to_dict
-from django.conf import settings
-
-def actor_from_sender(sender, instance):
-    # placeholder; we can't reliably get request.user here without middleware.
-    return getattr(instance, '_last_actor', '')
-
-@receiver(post_save, sender=Client)
-def audit_client_save(sender, instance, created, **kwargs):
-    AuditLog.objects.create(
-        actor=actor_from_sender(sender, instance),
-        model=sender.__name__,
-        object_id=str(instance.id),
-        action='created' if created else 'updated',
-        changes=str(model_to_dict(instance))
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.signals import post_init, post_save, post_delete
+import json
+from .models import Client, Vehicule, Contrat
+from . import audit
+
+MODELES_AUDITES = (Client, Vehicule, Contrat)
+
+def etat(instance):
+    """Valeurs brutes des champs chargés de l'instance."""
+    return {
+        field.attname: instance.__dict__[field.attname]
+        for field in instance._meta.concrete_fields
+        if field.attname in instance.__dict__
+    }
+
+def serialiser(changes):
+    # Passage par l'encodeur Django pour les dates, décimaux et fichiers
+    return json.loads(json.dumps(changes, cls=DjangoJSONEncoder, default=str))
+
+def memoriser_etat(sender, instance, **kwargs):
+    # État initial pour ne journaliser que les champs modifiés
+    instance._audit_etat = etat(instance) if instance.pk else {}
+
+# L'acteur vient du contexte d'audit (AuditMiddleware ou ``audit.tampon``)
+def audit_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    avant = getattr(instance, '_audit_etat', {})
+    apres = etat(instance)
+    instance._audit_etat = apres
+    if created:
+        changes = {champ: [None, valeur] for champ, valeur in apres.items()}
+    else:
+        changes = {
+            champ: [avant[champ], valeur]
+            for champ, valeur in apres.items()
+            if champ in avant and avant[champ] != valeur
+        }
+    if not changes:
+        return
+    audit.enregistrer(
+        sender.__name__,
+        instance.pk,
+        'created' if created else 'updated',
+        serialiser(changes),
     )
 
-@receiver(post_delete, sender=Client)
-def audit_client_delete(sender, instance, **kwargs):
-    AuditLog.objects.create(
-        actor=actor_from_sender(sender, instance),
-        model=sender.__name__,
-        object_id=str(instance.id),
-        action='deleted',
-        changes=''
+def audit_delete(sender, instance, **kwargs):
+    audit.enregistrer(
+        sender.__name__,
+        instance.pk,
+        'deleted',
+        {},
     )
 
-# same for Vehicule and Contrat
-@receiver(post_save, sender=Vehicule)
-def audit_vehicule_save(sender, instance, created, **kwargs):
-    AuditLog.objects.create(actor=actor_from_sender(sender, instance), model=sender.__name__, object_id=str(instance.id), action='created' if created else 'updated', changes=str(model_to_dict(instance)))
-
-@receiver(post_delete, sender=Vehicule)
-def audit_vehicule_delete(sender, instance, **kwargs):
-    AuditLog.objects.create(actor=actor_from_sender(sender, instance), model=sender.__name__, object_id=str(instance.id), action='deleted', changes='')
-
-@receiver(post_save, sender=Contrat)
-def audit_contrat_save(sender, instance, created, **kwargs):
-    AuditLog.objects.create(actor=actor_from_sender(sender, instance), model=sender.__name__, object_id=str(instance.id), action='created' if created else 'updated', changes=str(model_to_dict(instance)))
-
-@receiver(post_delete, sender=Contrat)
-def audit_contrat_delete(sender, instance, **kwargs):
-    AuditLog.objects.create(actor=actor_from_sender(sender, instance), model=sender.__name__, object_id=str(instance.id), action='deleted', changes='')
+for modele in MODELES_AUDITES:
+    post_init.connect(memoriser_etat, sender=modele, dispatch_uid=f'audit_init_{modele.__name__}')
+    post_save.connect(audit_save, sender=modele, dispatch_uid=f'audit_save_{modele.__name__}')
+    post_delete.connect(audit_delete, sender=modele, dispatch_uid=f'audit_delete_{modele.__name__}')
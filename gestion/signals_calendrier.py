@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .models import Contrat
+from . import calendrier
+
+# La suppression d'un contrat supprime sa réservation par cascade.
+
+@receiver(post_save, sender=Contrat)
+def calendrier_contrat_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    calendrier.synchroniser(instance)
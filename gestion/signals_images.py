@@ -0,0 +1,19 @@
+from django.db.models.signals import post_init, post_save
+from django.dispatch import receiver
+from .models import Vehicule
+from . import images
+
+# Les variantes sont générées une fois par photo téléversée, après le commit.
+
+@receiver(post_init, sender=Vehicule)
+def images_memoriser_photo(sender, instance, **kwargs):
+    instance._images_source = instance.__dict__.get('image')
+
+@receiver(post_save, sender=Vehicule)
+def images_photo_change(sender, instance, raw=False, **kwargs):
+    nom_image = instance.image.name if instance.image else ''
+    source = instance._images_source
+    instance._images_source = nom_image
+    if raw or not nom_image or nom_image == getattr(source, 'name', source):
+        return
+    images.generer_apres_commit(instance.id)
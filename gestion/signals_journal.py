@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from .models import Contrat
+from . import journal
+
+# Les sauvegardes sont journalisées par Contrat.save() ; la suppression ajoute
+# une pierre tombale pour que relecture et export ignorent le contrat.
+
+@receiver(post_delete, sender=Contrat)
+def journal_contrat_delete(sender, instance, **kwargs):
+    journal.supprimer_apres_commit(instance.pk)
@@ -0,0 +1,57 @@
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from .models import Client, Vehicule, Contrat
+from . import pdf_contrats
+
+# Le PDF d'un contrat n'affiche du client et du véhicule que leur libellé (__str__) :
+# seul un changement de libellé rend périmés les PDF de leurs contrats.
+
+CHAMPS_LIBELLE = {
+    Client: ('prenom', 'nom'),
+    Vehicule: ('marque', 'modele', 'immatriculation'),
+}
+
+def libelle(instance):
+    # None si un champ du libellé est différé (.only()) : pas de requête supplémentaire
+    if not instance.pk or any(champ not in instance.__dict__ for champ in CHAMPS_LIBELLE[type(instance)]):
+        return None
+    return str(instance)
+
+@receiver(post_init, sender=Client)
+@receiver(post_init, sender=Vehicule)
+def pdf_memoriser_libelle(sender, instance, **kwargs):
+    instance._pdf_libelle = libelle(instance)
+
+@receiver(post_save, sender=Client)
+@receiver(post_save, sender=Vehicule)
+def pdf_libelle_change(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # Gardes avant tout accès à l'instance : chargement de fixtures, champs du libellé
+    # non sauvegardés ou non chargés (un champ différé n'est pas écrit par save())
+    if raw:
+        return
+    champs = CHAMPS_LIBELLE[sender]
+    if not created and (
+        (update_fields is not None and not update_fields.intersection(champs))
+        or not any(champ in instance.__dict__ for champ in champs)
+    ):
+        return
+    ancien, instance._pdf_libelle = instance._pdf_libelle, libelle(instance)
+    # Libellé inconnu (champ différé) : purge par précaution
+    if created or (instance._pdf_libelle is not None and instance._pdf_libelle == ancien):
+        return
+    filtre = {'client': instance} if sender is Client else {'vehicule': instance}
+    transaction.on_commit(
+        lambda: pdf_contrats.purger(Contrat.objects.filter(**filtre).values_list('id', flat=True))
+    )
+
+@receiver(post_save, sender=Contrat)
+def pdf_contrat_save(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    transaction.on_commit(lambda: pdf_contrats.purger([instance.id]))
+
+@receiver(post_delete, sender=Contrat)
+def pdf_contrat_delete(sender, instance, **kwargs):
+    contrat_id = instance.id
+    transaction.on_commit(lambda: pdf_contrats.supprimer(contrat_id))
@@ -0,0 +1,90 @@
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from .models import Client, Vehicule, Contrat
+from . import stats
+from .cache_stats import invalider_pour_modele
+from .tasks import synchroniser_rappel
+
+# Les tables de cumul reçoivent l'écart produit par l'écriture (+1/-1, ± montant),
+# calculé à partir de l'état mémorisé au chargement de l'instance.
+# Les chargements de fixtures (raw=True) sont ignorés : lancer `rebuild_stats` ensuite.
+# Les mêmes signaux invalident le cache des endpoints JSON du dashboard (cache_stats)
+# et tiennent à jour, après le commit, le rappel du jour du contrat modifié
+# (les rappels sont générés par check_contracts : tasks.generer_rappels).
+
+CHAMPS_CONTRAT = ('statut', 'date_creation', 'montant_total', 'vehicule_id')
+
+def etat_contrat(instance):
+    # None si un champ est différé (.only()) : pas de requête supplémentaire
+    if any(champ not in instance.__dict__ for champ in CHAMPS_CONTRAT):
+        return None
+    return tuple(instance.__dict__[champ] for champ in CHAMPS_CONTRAT)
+
+@receiver(post_init, sender=Vehicule)
+def stats_memoriser_vehicule(sender, instance, **kwargs):
+    instance._stats_disponible = instance.__dict__.get('disponible') if instance.pk else None
+
+@receiver(post_init, sender=Contrat)
+def stats_memoriser_contrat(sender, instance, **kwargs):
+    instance._stats_etat = etat_contrat(instance) if instance.pk else None
+
+@receiver(post_save, sender=Client)
+def stats_client_save(sender, instance, created, raw=False, **kwargs):
+    invalider_pour_modele(sender.__name__)
+    if raw or not created:
+        return
+    stats.appliquer_ecarts(total_clients=1)
+
+@receiver(post_delete, sender=Client)
+def stats_client_delete(sender, instance, **kwargs):
+    invalider_pour_modele(sender.__name__)
+    stats.appliquer_ecarts(total_clients=-1)
+
+@receiver(post_save, sender=Vehicule)
+def stats_vehicule_save(sender, instance, created, raw=False, **kwargs):
+    invalider_pour_modele(sender.__name__)
+    if raw:
+        return
+    avant = instance._stats_disponible
+    instance._stats_disponible = instance.disponible
+    if created:
+        stats.appliquer_ecarts(total_vehicules=1, vehicules_disponibles=int(bool(instance.disponible)))
+    elif avant is None:
+        stats.rafraichir_vehicules()
+    else:
+        stats.appliquer_ecarts(vehicules_disponibles=int(bool(instance.disponible)) - int(bool(avant)))
+
+@receiver(post_delete, sender=Vehicule)
+def stats_vehicule_delete(sender, instance, **kwargs):
+    invalider_pour_modele(sender.__name__)
+    if instance._stats_disponible is None:
+        stats.rafraichir_vehicules()
+    else:
+        stats.appliquer_ecarts(total_vehicules=-1, vehicules_disponibles=-int(bool(instance._stats_disponible)))
+
+@receiver(post_save, sender=Contrat)
+def stats_contrat_save(sender, instance, created, raw=False, **kwargs):
+    invalider_pour_modele(sender.__name__)
+    if raw:
+        return
+    transaction.on_commit(lambda: synchroniser_rappel(instance))
+    avant = instance._stats_etat
+    instance._stats_etat = apres = etat_contrat(instance)
+    if apres is None or (avant is None and not created):
+        # État précédent inconnu : recalcul de la partie touchée
+        stats.rafraichir_contrats()
+        stats.rafraichir_mois(instance.date_creation)
+        stats.rafraichir_vehicules_contrats([instance.vehicule_id])
+        return
+    stats.appliquer_contrat(None if created else avant, apres)
+
+@receiver(post_delete, sender=Contrat)
+def stats_contrat_delete(sender, instance, **kwargs):
+    invalider_pour_modele(sender.__name__)
+    if instance._stats_etat is None:
+        stats.rafraichir_contrats()
+        if 'date_creation' in instance.__dict__:
+            stats.rafraichir_mois(instance.date_creation)
+        return
+    stats.appliquer_contrat(instance._stats_etat, None)
@@ -0,0 +1,88 @@
+"""Réglages SQLite et transactions ``IMMEDIATE``.
+
+Profil de connexion
+    ``configurer_connexion`` (signal ``connection_created``) applique à chaque
+    nouvelle connexion SQLite les PRAGMA de ``SQLITE_PROFIL`` : journal WAL
+    (les lecteurs ne sont plus bloqués par l'écrivain), ``busy_timeout``,
+    ``synchronous``, ``mmap_size``, ``cache_size``, ``temp_store``.
+    ``SQLITE_PROFIL = None`` laisse les réglages par défaut de SQLite. Une
+    base peut avoir son propre profil (clé ``SQLITE_PROFIL`` de son entrée
+    dans ``DATABASES``, ex. la réplique en lecture seule).
+
+Transactions ``IMMEDIATE``
+    SQLite n'accepte qu'un écrivain à la fois ; avec des transactions
+    ``DEFERRED`` (le ``BEGIN`` de Django), une transaction qui a lu puis
+    veut écrire pendant qu'une autre vient d'écrire échoue en « database is
+    locked » sans attendre le ``busy_timeout``. ``ecrire(fonction)`` exécute
+    la fonction dans une transaction ouverte par ``BEGIN IMMEDIATE`` : le
+    verrou d'écriture est pris dès le début, en attendant au plus
+    ``busy_timeout``. Django 4.2 n'a pas de réglage pour ce mode ; le
+    ``BEGIN`` d'``atomic()`` est remplacé par un ``execute_wrapper`` posé
+    le temps de la transaction (``transaction_immediate``).
+
+Pas de file d'écriture
+    Avec WAL, ``busy_timeout`` et ``BEGIN IMMEDIATE``, les écrivains attendent
+    le verrou au lieu d'échouer : il n'y a plus d'erreur « database is
+    locked ». Un thread écrivain qui regroupe les écritures n'apporte rien
+    de plus : mesuré avec ``benchmark_sqlite``, il divisait le débit
+    d'écriture par deux (un aller-retour de thread par écriture), et
+    regrouper plusieurs écritures dans une transaction exigerait d'exécuter
+    les actions ``on_commit`` de chacune dans le contexte de son appelant,
+    ce que Django ne permet pas sans toucher à ses attributs internes.
+
+Réglage (``settings``) : ``SQLITE_PROFIL``.
+"""
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+PROFIL_DEFAUT = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 5000,  # ms
+    'synchronous': 'NORMAL',  # sûr en WAL : seule la dernière transaction peut être perdue en cas de coupure
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64000,  # négatif : en Kio
+    'temp_store': 'MEMORY',
+}
+
+
+def profil():
+    return getattr(settings, 'SQLITE_PROFIL', PROFIL_DEFAUT)
+
+
+def configurer_connexion(sender, connection, **kwargs):
+    """Applique le profil aux nouvelles connexions SQLite (sauf base en mémoire)."""
+    reglages = connection.settings_dict.get('SQLITE_PROFIL', profil())
+    if connection.vendor != 'sqlite' or not reglages:
+        return
+    en_memoire = connection.is_in_memory_db()
+    with connection.cursor() as cursor:
+        for pragma, valeur in reglages.items():
+            if pragma == 'journal_mode' and en_memoire:
+                continue
+            cursor.execute(f'PRAGMA {pragma} = {valeur}')
+
+
+def _begin_immediate(execute, sql, params, many, context):
+    if sql == 'BEGIN':
+        sql = 'BEGIN IMMEDIATE'
+    return execute(sql, params, many, context)
+
+
+@contextmanager
+def transaction_immediate(using=DEFAULT_DB_ALIAS):
+    """``transaction.atomic()`` dont la transaction SQLite est ouverte par ``BEGIN IMMEDIATE``."""
+    connexion = connections[using]
+    if connexion.vendor != 'sqlite' or connexion.in_atomic_block:
+        with transaction.atomic(using=using):
+            yield
+        return
+    with connexion.execute_wrapper(_begin_immediate), transaction.atomic(using=using):
+        yield
+
+
+def ecrire(fonction, using=DEFAULT_DB_ALIAS):
+    """Exécute ``fonction()`` dans une transaction ``IMMEDIATE`` et retourne son résultat."""
+    with transaction_immediate(using):
+        return fonction()
@@ -0,0 +1,267 @@
+"""Tables de cumul des statistiques de la flotte.
+
+Les compteurs affichés sur l'accueil, le dashboard admin et le context processor
+sont lus dans ``StatistiquesFlotte`` (une ligne), ``StatistiqueMensuelle`` et
+``StatistiqueVehicule`` (top véhicules) au lieu d'être recalculés par des COUNT à chaque page. Les signaux de
+``signals_stats`` y ajoutent l'écart produit par chaque écriture (+1/-1,
+± montant) par des UPDATE ``champ = champ + écart`` : le coût ne dépend pas
+de l'historique. Les ``rafraichir_*`` recomptent une partie après un
+chargement en masse ; ``reconstruire()`` (commande ``rebuild_stats``) repart
+de zéro.
+
+Une écriture qui échappe aux signaux (``bulk_create``, ``update()``) fait
+dériver les compteurs : un écart qui rendrait un compteur négatif le ramène
+à 0 au lieu de violer la contrainte de la colonne (ce qui annulerait la
+transaction de l'écriture), et la dérive est journalisée.
+"""
+import logging
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Greatest, TruncMonth
+from django.utils import timezone
+
+from .models import Client, Vehicule, Contrat, StatistiquesFlotte, StatistiqueMensuelle, StatistiqueVehicule
+
+logger = logging.getLogger(__name__)
+
+STATS_PK = 1
+CHAMPS_STATS = [
+    'total_clients',
+    'total_vehicules',
+    'vehicules_disponibles',
+    'contrats_actifs',
+    'contrats_retard',
+]
+
+
+def _compter_clients():
+    return {'total_clients': Client.objects.count()}
+
+
+def _compter_vehicules():
+    return Vehicule.objects.aggregate(
+        total_vehicules=Count('id'),
+        vehicules_disponibles=Count('id', filter=Q(disponible=True)),
+    )
+
+
+def _compter_contrats():
+    return Contrat.objects.aggregate(
+        contrats_actifs=Count('id', filter=Q(statut='actif')),
+        contrats_retard=Count('id', filter=Q(statut='en_retard')),
+    )
+
+
+def _enregistrer(valeurs):
+    # Si la ligne n'existe pas encore, une reconstruction complète évite
+    # de créer une ligne où seuls quelques compteurs seraient renseignés.
+    if not StatistiquesFlotte.objects.filter(pk=STATS_PK).update(date_maj=timezone.now(), **valeurs):
+        reconstruire()
+
+
+def _ajouter(lignes, ecarts, **valeurs):
+    """UPDATE ``compteur = compteur + écart`` des lignes ; retourne le nombre de lignes mises à jour.
+
+    Un compteur inférieur à l'écart retiré (dérive) est ramené à 0.
+    """
+    bornes = {f'{champ}__gte': -ecart for champ, ecart in ecarts.items() if ecart < 0}
+    maj = lignes.filter(**bornes).update(**valeurs, **{champ: F(champ) + ecart for champ, ecart in ecarts.items()})
+    if maj or not bornes:
+        return maj
+    maj = lignes.update(**valeurs, **{champ: Greatest(F(champ) + ecart, 0) for champ, ecart in ecarts.items()})
+    if maj:
+        logger.warning(
+            'Dérive des statistiques (%s, écarts %s) : compteurs ramenés à 0, lancer rebuild_stats',
+            lignes.model.__name__, ecarts,
+        )
+    return maj
+
+
+def appliquer_ecarts(**ecarts):
+    """Ajoute des écarts aux compteurs globaux ; retourne False si la ligne a dû être reconstruite."""
+    ecarts = {champ: ecart for champ, ecart in ecarts.items() if ecart}
+    if not ecarts:
+        return True
+    if _ajouter(StatistiquesFlotte.objects.filter(pk=STATS_PK), ecarts, date_maj=timezone.now()):
+        return True
+    # Reconstruction à partir des données sources, qui incluent déjà l'écriture
+    reconstruire()
+    return False
+
+
+def rafraichir_clients():
+    _enregistrer(_compter_clients())
+
+
+def rafraichir_vehicules():
+    _enregistrer(_compter_vehicules())
+
+
+def rafraichir_contrats():
+    _enregistrer(_compter_contrats())
+
+
+def debut_mois(valeur):
+    """Premier jour du mois (dans le fuseau courant) d'une date ou d'un datetime."""
+    if isinstance(valeur, datetime):
+        if timezone.is_aware(valeur):
+            valeur = timezone.localtime(valeur)
+        valeur = valeur.date()
+    return valeur.replace(day=1)
+
+
+def _bornes_mois(mois):
+    suivant = (mois + timedelta(days=32)).replace(day=1)
+    debut = datetime.combine(mois, datetime.min.time())
+    fin = datetime.combine(suivant, datetime.min.time())
+    if settings.USE_TZ:
+        debut = timezone.make_aware(debut)
+        fin = timezone.make_aware(fin)
+    return debut, fin
+
+
+def rafraichir_mois(mois):
+    """Recalcule la ligne mensuelle du mois contenant ``mois``."""
+    mois = debut_mois(mois)
+    debut, fin = _bornes_mois(mois)
+    agregat = Contrat.objects.filter(
+        date_creation__gte=debut, date_creation__lt=fin
+    ).aggregate(nb_contrats=Count('id'), revenus=Sum('montant_total'))
+    if agregat['nb_contrats']:
+        StatistiqueMensuelle.objects.update_or_create(
+            mois=mois,
+            defaults={
+                'nb_contrats': agregat['nb_contrats'],
+                'revenus': agregat['revenus'] or Decimal('0'),
+            },
+        )
+    else:
+        StatistiqueMensuelle.objects.filter(mois=mois).delete()
+
+
+def ajouter_au_mois(mois, nb_contrats, revenus):
+    """Ajoute des écarts à la ligne mensuelle du mois contenant ``mois``."""
+    if not nb_contrats and not revenus:
+        return
+    mois = debut_mois(mois)
+    lignes = StatistiqueMensuelle.objects.filter(mois=mois)
+    if not _ajouter(lignes, {'nb_contrats': nb_contrats}, revenus=F('revenus') + revenus):
+        # Premier contrat du mois : la ligne est créée à partir des contrats du mois
+        rafraichir_mois(mois)
+    elif nb_contrats < 0:
+        lignes.filter(nb_contrats=0).delete()
+
+
+def _compter_par_vehicule(contrats):
+    return [
+        StatistiqueVehicule(vehicule_id=ligne['vehicule_id'], nb_contrats=ligne['nb'])
+        for ligne in contrats.values('vehicule_id').annotate(nb=Count('id')).order_by()
+    ]
+
+
+def rafraichir_vehicules_contrats(vehicule_ids):
+    """Recompte les contrats des véhicules donnés (après un chargement en masse)."""
+    vehicule_ids = list(vehicule_ids)
+    StatistiqueVehicule.objects.filter(vehicule_id__in=vehicule_ids).delete()
+    StatistiqueVehicule.objects.bulk_create(_compter_par_vehicule(Contrat.objects.filter(vehicule_id__in=vehicule_ids)))
+
+
+def ajouter_au_vehicule(vehicule_id, nb_contrats):
+    """Ajoute un écart au nombre de contrats d'un véhicule."""
+    if not nb_contrats:
+        return
+    maj = _ajouter(StatistiqueVehicule.objects.filter(vehicule_id=vehicule_id), {'nb_contrats': nb_contrats})
+    # Premier contrat du véhicule ; sans ligne, rien à retirer (véhicule en cours de suppression)
+    if not maj and nb_contrats > 0:
+        rafraichir_vehicules_contrats([vehicule_id])
+
+
+def montant(valeur):
+    """Montant tel qu'enregistré en base (arrondi au centime), 0 si absent."""
+    if valeur is None:
+        return Decimal('0')
+    return Contrat._meta.get_field('montant_total').to_python(valeur).quantize(Decimal('0.01'))
+
+
+def appliquer_contrat(avant, apres):
+    """Répercute le passage d'un contrat de l'état ``avant`` à l'état ``apres``.
+
+    Un état est ``(statut, date_creation, montant_total, vehicule_id)``, ou
+    ``None`` si le contrat n'existe pas (création, suppression).
+    """
+    ecarts = {'contrats_actifs': 0, 'contrats_retard': 0}
+    par_mois = {}
+    par_vehicule = {}
+    for etat, signe in ((avant, -1), (apres, 1)):
+        if etat is None:
+            continue
+        statut, date_creation, valeur, vehicule_id = etat
+        par_vehicule[vehicule_id] = par_vehicule.get(vehicule_id, 0) + signe
+        if statut == 'actif':
+            ecarts['contrats_actifs'] += signe
+        elif statut == 'en_retard':
+            ecarts['contrats_retard'] += signe
+        if date_creation:
+            mois = debut_mois(date_creation)
+            nb, revenus = par_mois.get(mois, (0, Decimal('0')))
+            par_mois[mois] = (nb + signe, revenus + signe * montant(valeur))
+    if not appliquer_ecarts(**ecarts):
+        return
+    for mois, (nb, revenus) in par_mois.items():
+        ajouter_au_mois(mois, nb, revenus)
+    for vehicule_id, nb in par_vehicule.items():
+        ajouter_au_vehicule(vehicule_id, nb)
+
+
+@transaction.atomic
+def reconstruire():
+    """Reconstruit entièrement les tables de cumul à partir des données sources."""
+    valeurs = {}
+    valeurs.update(_compter_clients())
+    valeurs.update(_compter_vehicules())
+    valeurs.update(_compter_contrats())
+    StatistiquesFlotte.objects.update_or_create(pk=STATS_PK, defaults=valeurs)
+
+    StatistiqueMensuelle.objects.all().delete()
+    par_mois = (
+        Contrat.objects
+        .annotate(m=TruncMonth('date_creation'))
+        .values('m')
+        .annotate(nb_contrats=Count('id'), revenus=Sum('montant_total'))
+        .order_by('m')
+    )
+    StatistiqueMensuelle.objects.bulk_create([
+        StatistiqueMensuelle(
+            mois=debut_mois(ligne['m']),
+            nb_contrats=ligne['nb_contrats'],
+            revenus=ligne['revenus'] or Decimal('0'),
+        )
+        for ligne in par_mois if ligne['m'] is not None
+    ])
+
+    StatistiqueVehicule.objects.all().delete()
+    StatistiqueVehicule.objects.bulk_create(_compter_par_vehicule(Contrat.objects.all()), batch_size=500)
+    return valeurs
+
+
+def get_stats_globales():
+    """Retourne le dictionnaire des compteurs globaux en une seule lecture par clé primaire."""
+    stats = StatistiquesFlotte.objects.filter(pk=STATS_PK).values(*CHAMPS_STATS).first()
+    if stats is None:
+        stats = reconstruire()
+    return stats
+
+
+def get_tendances_mensuelles(depuis):
+    """Contrats et revenus par mois depuis ``depuis``, au format des anciens agrégats TruncMonth."""
+    lignes = StatistiqueMensuelle.objects.filter(mois__gte=debut_mois(depuis)).order_by('mois')
+    contrats_par_mois = []
+    revenus_par_mois = []
+    for ligne in lignes:
+        contrats_par_mois.append({'mois': ligne.mois, 'total': ligne.nb_contrats})
+        revenus_par_mois.append({'mois': ligne.mois, 'total': ligne.revenus})
+    return contrats_par_mois, revenus_par_mois
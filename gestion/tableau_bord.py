@@ -0,0 +1,138 @@
+"""Agrégats du tableau de bord, calculés en parallèle par les vues asynchrones.
+
+Les agrégats du dashboard (compteurs, tendances, top véhicules, contrats
+récents, occupation...) sont des requêtes indépendantes. ``calculer()`` les
+exécute l'une après l'autre (vues synchrones, déploiement WSGI).
+``acalculer()`` les lance toutes en même temps (vues asynchrones, ASGI :
+``settings.VUES_ASYNC``). Chaque agrégat tourne dans un thread du pool
+d'``asgiref`` (``sync_to_async(thread_sensitive=False)``) avec sa propre
+connexion, fermée à la fin. La réponse attend alors l'agrégat le plus lent
+au lieu de la somme de tous.
+
+``TABLEAU_BORD_CONCURRENCE`` limite le nombre d'agrégats simultanés d'une
+requête. Avec 1, ils s'exécutent l'un après l'autre sur la connexion de la
+requête (base en mémoire). Chaque agrégat s'exécute dans une copie du
+contexte de l'appelant : la base choisie par ``utiliser_replique()``
+s'applique aussi.
+
+``AGREGATS_ADMIN`` alimente l'index de ``GestionAdminSite``, ``AGREGATS_API``
+la réponse JSON de ``stats_tableau_bord`` (mise en cache par ``cache_json`` :
+chaque agrégat ne dépend que de modèles qui invalident ses groupes).
+"""
+import asyncio
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections
+from django.utils import timezone
+
+from .models import Contrat, StatistiqueVehicule, Vehicule
+from .occupation import occupation_vehicules
+from .stats import get_stats_globales, get_tendances_mensuelles
+
+
+def concurrence():
+    return getattr(settings, 'TABLEAU_BORD_CONCURRENCE', 8)
+
+
+def contrats_par_mois():
+    """Nombre de contrats par mois sur les 12 derniers mois (``{'labels': [...], 'data': [...]}``).
+
+    Lu dans la table de cumul mensuelle : le regroupement par mois des
+    contrats eux-mêmes était de loin l'agrégat le plus lent du dashboard.
+    """
+    lignes, _ = get_tendances_mensuelles(timezone.now() - timedelta(days=365))
+    return {
+        'labels': [ligne['mois'].strftime('%B %Y') for ligne in lignes],
+        'data': [ligne['total'] for ligne in lignes],
+    }
+
+
+def _tendances():
+    return get_tendances_mensuelles(timezone.now() - timedelta(days=180))
+
+
+def requete_top_vehicules():
+    """Les 5 véhicules les plus loués, lus dans la table de cumul (premières lignes de son index)."""
+    return StatistiqueVehicule.objects.select_related('vehicule').order_by('-nb_contrats', '-vehicule_id')[:5]
+
+
+def _top_vehicules():
+    vehicules = []
+    for ligne in requete_top_vehicules():
+        ligne.vehicule.nombre_contrats = ligne.nb_contrats
+        vehicules.append(ligne.vehicule)
+    return vehicules
+
+
+def _contrats_recents():
+    return list(Contrat.objects.select_related('client', 'vehicule').order_by('-date_creation')[:5])
+
+
+def _vehicules_disponibles():
+    return list(Vehicule.objects.filter(disponible=True).order_by('prix_journalier')[:5])
+
+
+def _top_vehicules_json():
+    return [
+        {'id': v.id, 'vehicule': str(v), 'nombre_contrats': v.nombre_contrats}
+        for v in _top_vehicules()
+    ]
+
+
+def _contrats_recents_json():
+    return [
+        {'id': c.id, 'client': str(c.client), 'vehicule': str(c.vehicule), 'statut': c.statut}
+        for c in _contrats_recents()
+    ]
+
+
+AGREGATS_ADMIN = {
+    'stats': get_stats_globales,
+    'tendances': _tendances,
+    'top_vehicules': _top_vehicules,
+    'contrats_recent': _contrats_recents,
+    'vehicules_disponibles': _vehicules_disponibles,
+    'total_users': lambda: User.objects.count(),
+}
+
+AGREGATS_API = {
+    'stats': get_stats_globales,
+    'contrats_par_mois': contrats_par_mois,
+    'occupation': lambda: occupation_vehicules(30),
+    'top_vehicules': _top_vehicules_json,
+    'contrats_recents': _contrats_recents_json,
+}
+
+
+def calculer(agregats):
+    """``{nom: valeur}`` des agrégats, calculés l'un après l'autre."""
+    return {nom: fonction() for nom, fonction in agregats.items()}
+
+
+def _isole(fonction):
+    # Thread du pool : la connexion ouverte pour l'agrégat ne doit pas lui survivre
+    def executer():
+        try:
+            return fonction()
+        finally:
+            connections.close_all()
+    return executer
+
+
+async def acalculer(agregats):
+    """``{nom: valeur}`` des agrégats, calculés en parallèle."""
+    limite = concurrence()
+    if limite <= 1:
+        return await sync_to_async(calculer)(agregats)
+
+    semaphore = asyncio.Semaphore(limite)
+
+    async def executer(fonction):
+        async with semaphore:
+            return await sync_to_async(_isole(fonction), thread_sensitive=False)()
+
+    valeurs = await asyncio.gather(*(executer(fonction) for fonction in agregats.values()))
+    return dict(zip(agregats, valeurs))
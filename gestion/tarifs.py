@@ -0,0 +1,66 @@
+"""Règles de tarification des locations.
+
+Source unique des paliers de réduction utilisés par
+``Vehicule.calculer_prix_location``, par la grille de devis en lot et par
+le formulaire de création de contrat, qui calcule l'estimation localement
+à partir de ``regles_tarifaires()``.
+"""
+
+# (durée minimale exclue en jours, coefficient appliqué au prix), du plus long au plus court
+REMISES_DUREE = [
+    (30, 0.7),   # 30% de réduction pour plus d'un mois
+    (14, 0.85),  # 15% de réduction pour plus de 2 semaines
+    (7, 0.9),    # 10% de réduction pour plus d'une semaine
+]
+
+DUREE_MAX_GRILLE = 365
+VEHICULES_MAX_GRILLE = 500
+
+
+def coefficient_remise(nb_jours):
+    """Coefficient de réduction pour la durée, ou None si aucune réduction ne s'applique."""
+    for seuil, coefficient in REMISES_DUREE:
+        if nb_jours > seuil:
+            return coefficient
+    return None
+
+
+def prix_location(prix_journalier, nb_jours):
+    """Prix d'une location, arrondi au centime (calcul en float)."""
+    prix_total = float(prix_journalier) * nb_jours
+    coefficient = coefficient_remise(nb_jours)
+    if coefficient is not None:
+        prix_total *= coefficient
+    return round(prix_total, 2)
+
+
+def grille_prix(prix_journaliers, durees):
+    """Matrice ``prix[i][j]`` pour chaque prix journalier × chaque durée.
+
+    Les coefficients sont calculés une fois par durée puis appliqués à toute
+    la colonne ; chaque case reproduit exactement ``prix_location``.
+    """
+    coefficients = [coefficient_remise(d) for d in durees]
+    grille = []
+    for prix in prix_journaliers:
+        prix = float(prix)
+        ligne = []
+        for nb_jours, coefficient in zip(durees, coefficients):
+            total = prix * nb_jours
+            if coefficient is not None:
+                total *= coefficient
+            ligne.append(round(total, 2))
+        grille.append(ligne)
+    return grille
+
+
+def regles_tarifaires(prix_journaliers, version=''):
+    """Document JSON des règles de prix : paliers de réduction et prix journaliers par véhicule.
+
+    ``prix_journaliers`` est une suite de couples ``(id, prix_journalier)``.
+    """
+    return {
+        'version': version,
+        'remises': [[seuil, coefficient] for seuil, coefficient in REMISES_DUREE],
+        'vehicules': {str(vehicule_id): float(prix) for vehicule_id, prix in prix_journaliers},
+    }
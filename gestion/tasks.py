@@ -1,61 +1,212 @@
+import logging
+from itertools import chain, islice
+
 from django.utils import timezone
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage, get_connection
 from django.conf import settings
-from .models import Contrat
+from django.db import transaction
+from .models import Contrat, Rappel, Vehicule
+from . import audit
+from .cache_stats import invalider_pour_modele
+from .journal import enregistrer_apres_commit
+from .stats import appliquer_ecarts
 
-def verifier_contrats_expires():
-    """Vérifie les contrats expirés et envoie des notifications."""
-    aujourdhui = timezone.now().date()
-    
-    # Contrats qui expirent dans 2 jours ou moins
-    contrats_proche_expiration = Contrat.objects.filter(
-        statut='actif',
-        date_fin__range=[aujourdhui, aujourdhui + timezone.timedelta(days=2)]
-    )
-    
-    # Contrats expirés
-    contrats_expires = Contrat.objects.filter(
-        statut='actif',
-        date_fin__lt=aujourdhui
-    )
-    
-    # Envoyer notifications pour contrats proche expiration
-    for contrat in contrats_proche_expiration:
-        jours_restants = (contrat.date_fin - aujourdhui).days
-        if contrat.client.email:
-            send_mail(
-                f'Rappel: Location se termine dans {jours_restants} jour(s)',
-                f"""Bonjour {contrat.client.prenom},
+logger = logging.getLogger(__name__)
+
+TAILLE_LOT = 500  # contrats mis à jour / messages envoyés par lot
+
+def _message_rappel(contrat, jours_restants):
+    return EmailMessage(
+        f'Rappel: Location se termine dans {jours_restants} jour(s)',
+        f"""Bonjour {contrat.client.prenom},
                 
                 Votre location du véhicule {contrat.vehicule} se termine dans {jours_restants} jour(s).
                 Merci de prévoir le retour du véhicule.
                 
                 Cordialement,
                 L'équipe de location""",
-                settings.DEFAULT_FROM_EMAIL,
-                [contrat.client.email],
-                fail_silently=True,
-            )
-    
-    # Marquer les contrats expirés
-    for contrat in contrats_expires:
-        contrat.statut = 'en_retard'
-        contrat.save()
-        
-        if contrat.client.email:
-            send_mail(
-                'Location expirée - Action requise',
-                f"""Bonjour {contrat.client.prenom},
+        settings.DEFAULT_FROM_EMAIL,
+        [contrat.client.email],
+    )
+
+def _message_expiration(contrat):
+    return EmailMessage(
+        'Location expirée - Action requise',
+        f"""Bonjour {contrat.client.prenom},
                 
                 Votre location du véhicule {contrat.vehicule} est expirée.
                 Merci de retourner le véhicule dès que possible.
                 
                 Cordialement,
                 L'équipe de location""",
-                settings.DEFAULT_FROM_EMAIL,
-                [contrat.client.email],
-                fail_silently=True,
+        settings.DEFAULT_FROM_EMAIL,
+        [contrat.client.email],
+    )
+
+def _par_lots(elements, taille):
+    elements = iter(elements)
+    while lot := list(islice(elements, taille)):
+        yield lot
+
+def envoyer_messages(messages_par_contrat, taille_lot=TAILLE_LOT):
+    """Envoie des messages ``(contrat_id, EmailMessage)`` (liste ou itérable) par lots.
+
+    Chaque lot réutilise une seule connexion au serveur de mail. Un échec
+    n'interrompt pas l'envoi : il est relevé avec l'identifiant du contrat.
+    Retourne ``(nb_envoyes, [(contrat_id, erreur), ...])``.
+    """
+    envoyes = 0
+    echecs = []
+    for lot in _par_lots(messages_par_contrat, taille_lot):
+        try:
+            connexion = get_connection()
+            connexion.open()
+        except Exception as e:
+            echecs.extend((contrat_id, str(e)) for contrat_id, _ in lot)
+            continue
+        try:
+            for contrat_id, message in lot:
+                message.connection = connexion
+                try:
+                    envoyes += connexion.send_messages([message]) or 0
+                except Exception as e:
+                    echecs.append((contrat_id, str(e)))
+        finally:
+            connexion.close()
+    if echecs:
+        logger.warning('%d notification(s) non envoyée(s)', len(echecs))
+    return envoyes, echecs
+
+def verifier_contrats_expires(taille_lot=TAILLE_LOT):
+    """Vérifie les contrats expirés et envoie des notifications.
+
+    Les contrats expirés passent en retard par un seul UPDATE (sans save()
+    ligne à ligne). Seuls les contrats effectivement modifiés par cet UPDATE
+    sont audités et notifiés : un contrat rendu entre-temps est ignoré. Les
+    notifications sont lues en flux (client et véhicule chargés par
+    jointure) et envoyées par lots.
+    """
+    aujourdhui = timezone.now().date()
+    
+    # Contrats qui expirent dans 2 jours ou moins
+    contrats_proche_expiration = (
+        Contrat.objects
+        .filter(
+            statut='actif',
+            date_fin__range=[aujourdhui, aujourdhui + timezone.timedelta(days=2)]
+        )
+        .select_related('client', 'vehicule')
+    )
+    
+    # Contrats expirés : identifiants verrouillés (select_for_update) jusqu'au commit
+    # de l'UPDATE, qui ne modifie donc que ces contrats
+    with transaction.atomic():
+        ids = list(
+            Contrat.objects.select_for_update()
+            .filter(statut='actif', date_fin__lt=aujourdhui)
+            .values_list('id', flat=True)
+        )
+        nb_expires = Contrat.objects.filter(id__in=ids, statut='actif').update(statut='en_retard') if ids else 0
+        if nb_expires != len(ids):
+            # Base sans verrou de ligne : ne garder que les contrats passés en retard par l'UPDATE
+            ids = list(Contrat.objects.filter(id__in=ids, statut='en_retard').values_list('id', flat=True))
+        if ids:
+            # update() ne déclenche pas les signaux : données dérivées mises à jour ici
+            audit.enregistrer_lot(
+                'Contrat', ((contrat_id, {'statut': ['actif', 'en_retard']}) for contrat_id in ids), action='updated',
             )
+            appliquer_ecarts(contrats_actifs=-nb_expires, contrats_retard=nb_expires)
+            enregistrer_apres_commit(*ids)
+            invalider_pour_modele('Contrat')
+    
+    rappels = (
+        (contrat.id, _message_rappel(contrat, (contrat.date_fin - aujourdhui).days))
+        for contrat in contrats_proche_expiration.iterator(chunk_size=taille_lot)
+        if contrat.client.email
+    )
+    expirations = (
+        (contrat.id, _message_expiration(contrat))
+        for contrat in Contrat.objects.filter(id__in=ids).select_related('client', 'vehicule').iterator(chunk_size=taille_lot)
+        if contrat.client.email
+    )
+    envoyes, echecs = envoyer_messages(chain(rappels, expirations), taille_lot)
+    return {
+        'expires': nb_expires,
+        'envoyes': envoyes,
+        'echecs': echecs,
+    }
+
+def marquer_departs_du_jour():
+    """Marque indisponibles les véhicules dont une location active a commencé.
+
+    ``creer_contrat`` laisse disponible le véhicule d'une réservation future ;
+    ce traitement quotidien (``check_contracts``) le bascule au premier jour de
+    la location. Les véhicules sont sauvegardés un à un pour que les signaux
+    (statistiques, cache, audit) suivent.
+    """
+    aujourdhui = timezone.now().date()
+    vehicules = Vehicule.objects.filter(
+        disponible=True,
+        contrat__statut='actif',
+        contrat__date_debut__lte=aujourdhui,
+        contrat__date_fin__gte=aujourdhui,
+    ).distinct()
+    nb = 0
+    for vehicule in vehicules:
+        vehicule.disponible = False
+        vehicule.save()
+        nb += 1
+    return nb
+
+def _rappel(contrat, aujourdhui):
+    message = contrat.message_rappel()
+    if not message:
+        return None
+    return Rappel(contrat=contrat, date_rappel=aujourdhui, telephone=contrat.client.telephone, message=message)
+
+def generer_rappels():
+    """Précalcule les rappels du jour pour les contrats actifs qui se terminent dans 1 ou 2 jours.
+
+    Lancé une fois par jour par ``check_contracts`` (cron) ; ``synchroniser_rappel``
+    tient ensuite à jour le rappel d'un contrat modifié dans la journée.
+    """
+    aujourdhui = timezone.now().date()
+    contrats = (
+        Contrat.objects
+        .filter(
+            statut='actif',
+            date_fin__range=[aujourdhui + timezone.timedelta(days=1), aujourdhui + timezone.timedelta(days=2)],
+        )
+        .select_related('client', 'vehicule')
+    )
+
+    rappels = [rappel for rappel in (_rappel(contrat, aujourdhui) for contrat in contrats) if rappel]
+
+    # Les rappels déjà générés aujourd'hui sont ignorés (contrainte unique contrat/jour)
+    Rappel.objects.bulk_create(rappels, ignore_conflicts=True)
+    return len(rappels)
+
+def synchroniser_rappel(contrat):
+    """Crée, met à jour ou supprime le rappel du jour (non envoyé) d'un seul contrat."""
+    aujourdhui = timezone.now().date()
+    rappel = _rappel(contrat, aujourdhui) if contrat.statut == 'actif' and contrat.date_fin else None
+    if rappel is None:
+        Rappel.objects.filter(contrat_id=contrat.pk, date_rappel=aujourdhui, envoye=False).delete()
+        return
+    Rappel.objects.update_or_create(
+        contrat_id=contrat.pk,
+        date_rappel=aujourdhui,
+        defaults={'telephone': rappel.telephone, 'message': rappel.message},
+    )
+
+def rappels_du_jour():
+    """Rappels du jour restant à envoyer (générés par ``check_contracts``)."""
+    aujourdhui = timezone.now().date()
+    return (
+        Rappel.objects
+        .filter(date_rappel=aujourdhui, envoye=False, contrat__statut='actif')
+        .select_related('contrat')
+    )
 
 def nettoyer_anciens_contrats():
     """Archive les vieux contrats terminés (plus de 6 mois)."""
@@ -1,4 +1,6 @@
-from django.test import TestCase, Client as TestClient
+import os
+import tempfile
+from django.test import TestCase, TransactionTestCase, Client as TestClient, override_settings
 from django.contrib.auth.models import User
 from django.urls import reverse
 from .models import Client, Vehicule, Contrat
@@ -6,6 +8,12 @@ from datetime import date, timedelta
 from django.utils import timezone
 from decimal import Decimal
 
+JOURNAL_TEST_DIR = tempfile.mkdtemp(prefix='journal-contrats-')
+PDF_TEST_DIR = tempfile.mkdtemp(prefix='pdf-contrats-')
+
+# Agrégats du dashboard sur la connexion du test : la base en mémoire n'est visible que d'elle
+@override_settings(CONTRATS_JOURNAL_DIR=JOURNAL_TEST_DIR, CONTRATS_JOURNAL_ASYNC=False, CONTRATS_PDF_DIR=PDF_TEST_DIR,
+                   TABLEAU_BORD_CONCURRENCE=1)
 class GestionTestCase(TestCase):
     def setUp(self):
         # Créer un superutilisateur pour les tests
@@ -178,7 +186,7 @@ class GestionTestCase(TestCase):
         response = self.client.get(reverse('export_clients_en_retard_csv'))
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response['Content-Type'], 'text/csv')
-        content = response.content.decode('utf-8')
+        content = b''.join(response.streaming_content).decode('utf-8')
         self.assertIn('Nom', content)
         self.assertIn(str(contrat_retard.id), content)
 
@@ -186,7 +194,7 @@ class GestionTestCase(TestCase):
         response = self.client.get(reverse('export_vehicules_loues_csv'))
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response['Content-Type'], 'text/csv')
-        content = response.content.decode('utf-8')
+        content = b''.join(response.streaming_content).decode('utf-8')
         self.assertIn(self.test_vehicule.immatriculation, content)
 
         # Page clients en retard
@@ -194,3 +202,961 @@ class GestionTestCase(TestCase):
         self.assertEqual(response.status_code, 200)
         page_text = response.content.decode('utf-8')
         self.assertIn(self.test_client.nom, page_text)
+
+    def test_statistiques_cumul(self):
+        """Les tables de cumul suivent les écritures et se lisent en une requête."""
+        from .stats import get_stats_globales, reconstruire
+        Contrat.objects.create(
+            client=self.test_client,
+            vehicule=self.test_vehicule,
+            date_debut=date.today(),
+            date_fin=date.today() + timedelta(days=3),
+            nb_jours=3,
+            montant_total=Decimal('150.00'),
+        )
+        self.test_vehicule.disponible = False
+        self.test_vehicule.save()
+
+        with self.assertNumQueries(1):
+            stats = get_stats_globales()
+        self.assertEqual(stats, {
+            'total_clients': 1,
+            'total_vehicules': 1,
+            'vehicules_disponibles': 0,
+            'contrats_actifs': 1,
+            'contrats_retard': 0,
+        })
+        self.assertEqual(reconstruire(), stats)
+
+    def test_statistiques_ecarts(self):
+        """Une écriture ajoute son écart aux cumuls sans recompter l'historique."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .models import StatistiqueMensuelle, StatistiqueVehicule
+        from .stats import get_stats_globales, reconstruire
+        contrats = [
+            Contrat.objects.create(
+                client=self.test_client,
+                vehicule=self.test_vehicule,
+                date_debut=date.today(),
+                date_fin=date.today() + timedelta(days=3),
+                nb_jours=3,
+                montant_total=montant,
+            )
+            for montant in (Decimal('150.00'), 99.999, None)
+        ]
+        contrat = Contrat.objects.get(pk=contrats[0].pk)
+        with CaptureQueriesContext(connection) as requetes:
+            contrat.statut = 'termine'
+            contrat.montant_total = Decimal('120.50')
+            contrat.save()
+        self.assertFalse([q['sql'] for q in requetes if 'COUNT(' in q['sql'] or 'SUM(' in q['sql']])
+        contrats[1].delete()
+        Client.objects.create(nom='Martin', prenom='Paul', telephone='0600000000')
+
+        stats = get_stats_globales()
+        mensuelles = list(StatistiqueMensuelle.objects.values_list('mois', 'nb_contrats', 'revenus'))
+        self.assertEqual(stats['contrats_actifs'], 1)
+        self.assertEqual(mensuelles[0][1:], (2, Decimal('120.50')))
+        self.assertEqual(StatistiqueVehicule.objects.get(vehicule=self.test_vehicule).nb_contrats, 2)
+        self.assertEqual(reconstruire(), stats)
+        self.assertEqual(list(StatistiqueMensuelle.objects.values_list('mois', 'nb_contrats', 'revenus')), mensuelles)
+        self.assertEqual(StatistiqueVehicule.objects.get(vehicule=self.test_vehicule).nb_contrats, 2)
+
+    def test_statistiques_derive(self):
+        """Des contrats chargés sans signaux n'empêchent pas l'expiration : les compteurs sont ramenés à 0."""
+        from .stats import get_stats_globales, reconstruire
+        from .tasks import verifier_contrats_expires
+        reconstruire()
+        Contrat.objects.bulk_create([
+            Contrat(
+                client=self.test_client,
+                vehicule=self.test_vehicule,
+                date_debut=date.today() - timedelta(days=10),
+                date_fin=date.today() - timedelta(days=2),
+                nb_jours=8,
+                montant_total=Decimal('400.00'),
+            )
+            for _ in range(3)
+        ])
+        self.assertEqual(get_stats_globales()['contrats_actifs'], 0)
+        with self.assertLogs('gestion.stats', 'WARNING'):
+            verifier_contrats_expires()
+        stats = get_stats_globales()
+        self.assertEqual((stats['contrats_actifs'], stats['contrats_retard']), (0, 3))
+        self.assertEqual(Contrat.objects.filter(statut='en_retard').count(), 3)
+
+    def test_occupation_vehicules(self):
+        """L'occupation compte les jours réellement loués dans la fenêtre, sans doublon."""
+        from .occupation import occupation_vehicules
+        aujourdhui = date.today()
+        for debut, nb, statut in [
+            (aujourdhui - timedelta(days=40), 15, 'termine'),
+            (aujourdhui - timedelta(days=5), 3, 'termine'),
+            (aujourdhui - timedelta(days=4), 4, 'termine'),
+            # Contrat rompu : ne compte pas, bien que prévu sur la fenêtre
+            (aujourdhui - timedelta(days=20), 10, 'rompu'),
+        ]:
+            Contrat.objects.create(
+                client=self.test_client,
+                vehicule=self.test_vehicule,
+                date_debut=debut,
+                date_fin=debut + timedelta(days=nb),
+                nb_jours=nb,
+                montant_total=Decimal('100.00'),
+                statut=statut,
+            )
+
+        with self.assertNumQueries(2):
+            data = occupation_vehicules(30)
+        # 4 jours du premier contrat (fenêtre de 30 jours, aujourd'hui inclus) + 5 jours fusionnés des deux autres
+        self.assertEqual(data[0]['jours_loues'], 9)
+        self.assertEqual(data[0]['taux_occupation'], round(9 / 30 * 100, 2))
+
+        response = self.client.get(reverse('stats_occupation_vehicules'), {'jours': 12})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cache_stats_dashboard(self):
+        """Les endpoints du dashboard sont servis depuis le cache et invalidés par les signaux."""
+        from django.core.cache import cache
+        cache.clear()
+        url = reverse('stats_contrats_par_mois')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Contrat.objects.create(
+                client=self.test_client,
+                vehicule=self.test_vehicule,
+                date_debut=date.today(),
+                date_fin=date.today() + timedelta(days=2),
+                nb_jours=2,
+                montant_total=Decimal('100.00'),
+            )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(sum(response.json()['data']), 1)
+
+    def test_calendrier_reservations(self):
+        """Le calendrier bloque les périodes réservées, y compris dans le futur."""
+        from .forms import ContratForm
+        debut = date.today() + timedelta(days=20)
+        contrat = Contrat.objects.create(
+            client=self.test_client,
+            vehicule=self.test_vehicule,
+            date_debut=debut,
+            date_fin=debut + timedelta(days=5),
+            nb_jours=5,
+            montant_total=Decimal('250.00'),
+        )
+        self.test_vehicule.disponible = False
+        self.test_vehicule.save()
+
+        def formulaire(date_debut, nb_jours):
+            return ContratForm(data={
+                'client': self.test_client.id,
+                'vehicule': self.test_vehicule.id,
+                'date_debut': date_debut.isoformat(),
+                'nb_jours': nb_jours,
+                'mode_paiement': 'especes',
+            })
+
+        self.assertFalse(formulaire(debut + timedelta(days=2), 3).is_valid())
+        self.assertTrue(formulaire(date.today(), 5).is_valid())
+
+        contrat.statut = 'termine'
+        contrat.save()
+        self.assertTrue(formulaire(debut + timedelta(days=2), 3).is_valid())
+
+    def test_recherche_disponibilites(self):
+        """La recherche par période exclut les véhicules réservés et chiffre la location."""
+        autre = Vehicule.objects.create(
+            type_vehicule='moto',
+            marque='Yamaha',
+            modele='MT-07',
+            annee=2021,
+            immatriculation='CC-456-DD',
+            prix_journalier=Decimal('30.00'),
+        )
+        debut = date.today() + timedelta(days=7)
+        Contrat.objects.create(
+            client=self.test_client,
+            vehicule=self.test_vehicule,
+            date_debut=debut,
+            date_fin=debut + timedelta(days=3),
+            nb_jours=3,
+            montant_total=Decimal('150.00'),
+        )
+
+        params = {'date_debut': (debut + timedelta(days=1)).isoformat(), 'nb_jours': 10}
+        response = self.client.get(reverse('api_disponibilites'), params)
+        self.assertEqual(response.status_code, 200)
+        vehicules = response.json()['vehicules']
+        self.assertEqual([v['id'] for v in vehicules], [autre.id])
+        self.assertEqual(vehicules[0]['prix_total'], autre.calculer_prix_location(10))
+
+        response = self.client.get(reverse('catalogue'), params)
+        self.assertContains(response, 'MT-07')
+        self.assertNotContains(response, 'Clio')
+
+        response = self.client.get(reverse('api_disponibilites'), {'nb_jours': 3})
+        self.assertEqual(response.status_code, 400)
+
+    def test_rappels_precalcules(self):
+        """Les rappels sont générés une fois par jour et lus en une requête sur l'accueil."""
+        from .models import Rappel
+        from .tasks import generer_rappels, rappels_du_jour
+        Contrat.objects.create(
+            client=self.test_client,
+            vehicule=self.test_vehicule,
+            date_debut=date.today() - timedelta(days=3),
+            date_fin=date.today() + timedelta(days=2),
+            nb_jours=5,
+            montant_total=Decimal('250.00'),
+        )
+        self.assertEqual(generer_rappels(), 1)
+        generer_rappels()
+        self.assertEqual(Rappel.objects.count(), 1)
+
+        with self.assertNumQueries(1):
+            rappels = list(rappels_du_jour())
+        self.assertIn('2 jour(s)', str(rappels[0]))
+
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Rappels à envoyer')
+
+    def test_rappels_synchronises(self):
+        """Une écriture met à jour le rappel de son seul contrat après le commit ; l'accueil n'en génère aucun."""
+        from .models import Rappel
+        with self.captureOnCommitCallbacks(execute=True):
+            contrat = Contrat.objects.create(
+                client=self.test_client,
+                vehicule=self.test_vehicule,
+                date_debut=date.today() - timedelta(days=3),
+                date_fin=date.today() + timedelta(days=1),
+                nb_jours=4,
+                montant_total=Decimal('200.00'),
+            )
+        self.assertIn('1 jour(s)', Rappel.objects.get(contrat=contrat).message)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            contrat.statut = 'termine'
+            contrat.save()
+        self.assertFalse(Rappel.objects.exists())
+
+        # Contrat écrit sans signal : pas de génération à l'affichage de l'accueil
+        Contrat.objects.filter(pk=contrat.pk).update(statut='actif')
+        self.client.get(reverse('index'))
+        self.assertFalse(Rappel.objects.exists())
+
+    def test_verifier_contrats_expires(self):
+        """Les contrats expirés passent en retard en lot et les notifications partent par lots."""
+        from django.core import mail
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .models import AuditLog
+        from .stats import get_stats_globales, reconstruire
+        from .tasks import verifier_contrats_expires
+        for i in range(3):
+            Contrat.objects.create(
+                client=self.test_client,
+                vehicule=self.test_vehicule,
+                date_debut=date.today() - timedelta(days=10 + i),
+                date_fin=date.today() + timedelta(days=1) if i == 0 else date.today() - timedelta(days=i),
+                nb_jours=10,
+                montant_total=Decimal('500.00'),
+            )
+        Contrat.objects.filter(statut='en_retard').update(statut='actif')
+        reconstruire()
+
+        with CaptureQueriesContext(connection) as requetes, self.captureOnCommitCallbacks(execute=True):
+            resultat = verifier_contrats_expires(taille_lot=2)
+        self.assertEqual(len([q for q in requetes if q['sql'].startswith('UPDATE "gestion_contrat"')]), 1)
+        self.assertEqual(resultat['expires'], 2)
+        self.assertEqual(resultat['envoyes'], 3)
+        self.assertEqual(resultat['echecs'], [])
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(Contrat.objects.filter(statut='en_retard').count(), 2)
+        self.assertEqual(AuditLog.objects.filter(action='updated', changes__statut=['actif', 'en_retard']).count(), 2)
+        self.assertEqual(get_stats_globales(), reconstruire())
+
+        # Rien à faire au second passage : ni audit ni notification d'expiration
+        mail.outbox.clear()
+        self.assertEqual(verifier_contrats_expires()['expires'], 0)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_exports_en_flux(self):
+        """Les exports CSV sont envoyés en flux avec des colonnes valides."""
+        Contrat.objects.create(
+            client=self.test_client,
+            vehicule=self.test_vehicule,
+            date_debut=date.today(),
+            date_fin=date.today() + timedelta(days=3),
+            nb_jours=3,
+            montant_total=Decimal('150.00'),
+        )
+        for nom, attendu in [('export_vehicules_csv', 'AA-123-BB'), ('export_contrats_csv', 'Dupont Jean')]:
+            response = self.client.get(reverse(nom))
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.streaming)
+            content = b''.join(response.streaming_content).decode('utf-8')
+            self.assertIn(attendu, content)
+
+    def test_journal_contrats(self):
+        """Les instantanés sont ajoutés au journal après commit et relus via l'index."""
+        from django.core.management import call_command
+        from .journal import lire_instantane
+        for compression in (False, True):
+            with self.settings(CONTRATS_JOURNAL_COMPRESSION=compression):
+                with self.captureOnCommitCallbacks(execute=True):
+                    contrat = Contrat.objects.create(
+                        client=self.test_client,
+                        vehicule=self.test_vehicule,
+                        date_debut=date.today(),
+                        date_fin=date.today() + timedelta(days=3),
+                        nb_jours=3,
+                        montant_total=Decimal('150.00'),
+                    )
+                with self.captureOnCommitCallbacks(execute=True):
+                    contrat.statut = 'termine'
+                    contrat.save()
+                data = lire_instantane(contrat.id)
+                self.assertEqual(data['details_location']['statut'], 'termine')
+                self.assertEqual(data['vehicule']['immatriculation'], 'AA-123-BB')
+
+        dest = tempfile.mkdtemp()
+        call_command('export_contrats_json', contrat.id, dest=dest, stdout=open(os.devnull, 'w'))
+        self.assertTrue(os.path.exists(os.path.join(dest, f'contrat_{contrat.id}.json')))
+
+        # Suppression : pierre tombale, contrat absent de la relecture et de l'export
+        from .journal import derniers_instantanes, vider
+        contrat_id = contrat.id
+        with self.captureOnCommitCallbacks(execute=True):
+            contrat.delete()
+        self.assertIsNone(lire_instantane(contrat_id))
+        self.assertNotIn(contrat_id, [data['contrat_id'] for data in derniers_instantanes()])
+        call_command('export_contrats_json', dest=dest, stdout=open(os.devnull, 'w'))
+        self.assertFalse(os.path.exists(os.path.join(dest, f'contrat_{contrat_id}.json')))
+
+        # Pierre tombale écrite par le thread d'écriture
+        with self.captureOnCommitCallbacks(execute=True):
+            contrat = Contrat.objects.create(
+                client=self.test_client, vehicule=self.test_vehicule, date_debut=date.today(),
+                date_fin=date.today() + timedelta(days=1), nb_jours=1, montant_total=Decimal('50.00'),
+            )
+        contrat_id = contrat.id
+        self.assertIsNotNone(lire_instantane(contrat_id))
+        with self.settings(CONTRATS_JOURNAL_ASYNC=True):
+            with self.captureOnCommitCallbacks(execute=True):
+                contrat.delete()
+            vider()
+        self.assertIsNone(lire_instantane(contrat_id))
+
+    def test_journal_compression_par_blocs(self):
+        """Les segments pleins sont compressés par blocs, plus petits que les enregistrements bruts, et restent relisibles."""
+        import json
+        import shutil
+        from pathlib import Path
+        from unittest import mock
+        from . import journal
+        dossier = Path(tempfile.mkdtemp(prefix='journal-gz-'))
+        self.addCleanup(shutil.rmtree, dossier, True)
+        instantanes = [
+            {'contrat_id': i, 'client': {'nom': 'Dupont', 'prenom': 'Jean'}, 'details_location': {'nb_jours': i % 7 + 1, 'statut': 'actif'}}
+            for i in range(1, 201)
+        ]
+        taille_brute = sum(len(json.dumps(i, separators=(',', ':'))) + 1 for i in instantanes)
+        with self.settings(CONTRATS_JOURNAL_DIR=dossier, CONTRATS_JOURNAL_COMPRESSION=True, CONTRATS_JOURNAL_SEGMENT_MAX=4096), \
+                mock.patch.object(journal, 'TAILLE_BLOC', 1000):
+            for instantane in instantanes:
+                journal.ajouter([instantane])
+            compresses = sorted(dossier.glob('segment_*.jsonl.gz'))
+            self.assertGreater(len(compresses), 1)
+            taille_compressee = sum(f.stat().st_size for f in compresses) + sum(f.stat().st_size for f in dossier.glob('segment_*.jsonl'))
+            self.assertLess(taille_compressee, taille_brute / 2)
+            # Enregistrements à cheval sur deux blocs compris
+            self.assertEqual(list(journal.derniers_instantanes()), instantanes)
+
+    def test_audit_champs_modifies(self):
+        """L'audit n'enregistre que les champs modifiés, avec l'utilisateur de la requête."""
+        from .models import AuditLog
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('modifier_client', args=[self.test_client.id]), {
+                'nom': 'Dupont',
+                'prenom': 'Paul',
+                'telephone': '0123456789',
+                'email': 'jean@example.com',
+            })
+        entree = AuditLog.objects.get(model='Client', action='updated')
+        self.assertEqual(entree.actor, 'admin')
+        self.assertEqual(entree.changes, {'prenom': ['Jean', 'Paul']})
+        self.assertEqual(AuditLog.objects.filter(changes__prenom__1='Paul').count(), 1)
+
+    def test_audit_list_curseur(self):
+        """Le journal d'audit est filtrable et paginé par curseur sans COUNT."""
+        from .models import AuditLog
+        AuditLog.objects.bulk_create([
+            AuditLog(actor='admin', model='Client', object_id=str(i % 3), action='updated', changes={'nom': ['a', str(i)]})
+            for i in range(120)
+        ])
+        response = self.client.get(reverse('audit_list'), {'model': 'Client', 'object_id': '1'})
+        self.assertEqual(response.status_code, 200)
+        page = response.context['audits']
+        self.assertEqual(len(page), 40)
+        self.assertFalse(page.has_next)
+
+        vus = []
+        curseur = None
+        while True:
+            params = {'curseur': curseur} if curseur else {}
+            page = self.client.get(reverse('audit_list'), params).context['audits']
+            vus.extend(a.id for a in page)
+            if not page.has_next:
+                break
+            curseur = page.curseur_suivant
+        self.assertEqual(len(vus), 120)
+        self.assertEqual(len(set(vus)), 120)
+
+        precedente = self.client.get(reverse('audit_list'), {'curseur': page.curseur_precedent}).context['audits']
+        self.assertEqual([a.id for a in precedente], vus[50:100])
+
+        # Page profonde : intervalle d'index (SEARCH), pas de parcours depuis le début de l'index
+        from .pagination import requete_page
+        plan = requete_page(AuditLog.objects.all(), ['-timestamp', '-id'], [timezone.now(), 10], 50).explain()
+        self.assertIn('SEARCH', plan)
+        self.assertNotIn('SCAN', plan)
+
+    def test_listes_paginees(self):
+        """Les listes sont paginées par curseur avec un nombre de requêtes constant."""
+        for i in range(30):
+            Contrat.objects.create(
+                client=self.test_client,
+                vehicule=self.test_vehicule,
+                date_debut=date.today(),
+                date_fin=date.today() + timedelta(days=3),
+                nb_jours=3,
+                montant_total=Decimal('150.00'),
+                statut='termine',
+            )
+        response = self.client.get(reverse('liste_contrats'))
+        page = response.context['contrats']
+        self.assertEqual(len(page), 25)
+        self.assertTrue(page.has_next)
+
+        with self.assertNumQueries(3):  # session, utilisateur, page de contrats
+            self.client.get(reverse('liste_contrats'), {'curseur': page.curseur_suivant, 'tri': 'recent'})
+
+        response = self.client.get(reverse('liste_clients'), {'q': 'Dup', 'tri': '-nom'})
+        self.assertContains(response, 'Dupont')
+        Contrat.objects.filter(pk=Contrat.objects.first().pk).update(statut='actif')
+        with self.assertNumQueries(4):  # session, utilisateur, page de clients, contrats actifs de la page
+            response = self.client.get(reverse('liste_clients'), {'tri': 'recent'})
+        self.assertEqual([c.nb_contrats_actifs for c in response.context['clients']], [1])
+        response = self.client.get(reverse('liste_vehicules'), {'type': 'moto'})
+        self.assertNotContains(response, 'AA-123-BB')
+
+    def test_explain_hot_queries(self):
+        """Aucune requête fréquente ne parcourt une table entière sans index."""
+        from io import StringIO
+        from django.core.management import call_command
+        sortie = StringIO()
+        call_command('explain_hot_queries', stdout=sortie)
+        self.assertIn('utilisent un index', sortie.getvalue())
+        self.assertIn('dashboard: top véhicules', sortie.getvalue())
+        self.assertIn('liste_contrats (tri debut) : page suivante', sortie.getvalue())
+
+        # Un parcours d'index n'est borné que par un LIMIT sans tri temporaire
+        from .management.commands.explain_hot_queries import parcours_complets
+        plan = '3 0 0 SCAN gestion_contrat USING INDEX contrat_vehicule_dates_idx'
+        self.assertTrue(parcours_complets(plan))
+        self.assertFalse(parcours_complets(plan, limite=True))
+        self.assertTrue(parcours_complets(plan + '\n9 0 0 USE TEMP B-TREE FOR ORDER BY', limite=True))
+
+    def test_grille_devis(self):
+        """La grille de devis reproduit exactement le prix unitaire."""
+        Vehicule.objects.create(
+            type_vehicule='moto', marque='Honda', modele='CB', annee=2019,
+            immatriculation='EE-789-FF', prix_journalier=Decimal('33.33'),
+        )
+        with self.assertNumQueries(3):  # session, utilisateur, véhicules
+            response = self.client.get(reverse('api_devis'), {'jours_min': 1, 'jours_max': 60})
+        data = response.json()
+        self.assertEqual(len(data['vehicules']), 2)
+        for i, v in enumerate(data['vehicules']):
+            vehicule = Vehicule.objects.get(id=v['id'])
+            for j, nb_jours in enumerate(data['durees']):
+                self.assertEqual(data['prix'][i][j], vehicule.calculer_prix_location(nb_jours))
+
+        response = self.client.get(reverse('api_devis'), {'durees': '0,5'})
+        self.assertEqual(response.status_code, 400)
+        # Bornes refusées sans construire la liste des durées ; valeurs non entières en 400
+        for params in ({'jours_max': 10 ** 9}, {'jours_min': 5, 'jours_max': 4}, {'jours_min': 0},
+                       {'jours_max': 'abc'}, {'jours_min': '1.5'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(reverse('api_devis'), params).status_code, 400)
+
+    def test_regles_tarifaires(self):
+        """Les règles de prix sont versionnées et le montant est recalculé à la création."""
+        from django.core.cache import cache
+        cache.clear()
+        response = self.client.get(reverse('creer_contrat'))
+        tarifs_url = response.context['tarifs_url']
+        response = self.client.get(tarifs_url)
+        self.assertIn('max-age', response['Cache-Control'])
+        data = response.json()
+        self.assertEqual(data['vehicules'][str(self.test_vehicule.id)], 50.0)
+        self.assertEqual(data['remises'][0], [30, 0.7])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.test_vehicule.prix_journalier = Decimal('60.00')
+            self.test_vehicule.save()
+        response = self.client.get(reverse('creer_contrat'))
+        self.assertNotEqual(response.context['tarifs_url'], tarifs_url)
+
+        response = self.client.post(reverse('creer_contrat'), {
+            'client': self.test_client.id,
+            'vehicule': self.test_vehicule.id,
+            'date_debut': (date.today() + timedelta(days=1)).isoformat(),
+            'nb_jours': 2,
+            'mode_paiement': 'especes',
+            'montant_estime': '100.00',
+        }, follow=True)
+        self.assertEqual(Contrat.objects.get().montant_total, Decimal('120.00'))
+        self.assertContains(response, 'Le montant a été recalculé')
+
+    def test_reservation_future_disponible(self):
+        """Une réservation future laisse le véhicule disponible jusqu'à son premier jour."""
+        from .tasks import marquer_departs_du_jour
+        aujourdhui = date.today()
+        donnees = {'client': self.test_client.id, 'vehicule': self.test_vehicule.id, 'mode_paiement': 'especes'}
+        self.client.post(reverse('creer_contrat'), {
+            **donnees, 'date_debut': (aujourdhui + timedelta(days=5)).isoformat(), 'nb_jours': 2,
+        })
+        self.assertEqual(Contrat.objects.count(), 1)
+        self.test_vehicule.refresh_from_db()
+        self.assertTrue(self.test_vehicule.disponible)
+
+        self.client.post(reverse('creer_contrat'), {**donnees, 'date_debut': aujourdhui.isoformat(), 'nb_jours': 1})
+        self.assertEqual(Contrat.objects.count(), 2)
+        self.test_vehicule.refresh_from_db()
+        self.assertFalse(self.test_vehicule.disponible)
+
+        Vehicule.objects.filter(pk=self.test_vehicule.pk).update(disponible=True)
+        self.assertEqual(marquer_departs_du_jour(), 1)
+        self.test_vehicule.refresh_from_db()
+        self.assertFalse(self.test_vehicule.disponible)
+        self.assertEqual(marquer_departs_du_jour(), 0)
+
+    def test_cache_pdf_contrat(self):
+        """Le PDF est servi depuis le cache avec ETag et invalidé quand le client change."""
+        from . import pdf_contrats
+        contrat = Contrat.objects.create(
+            client=self.test_client,
+            vehicule=self.test_vehicule,
+            date_debut=date.today(),
+            date_fin=date.today() + timedelta(days=2),
+            nb_jours=2,
+            montant_total=Decimal('100.00'),
+        )
+        fichier, cle = pdf_contrats.obtenir(contrat, generateur=lambda c: b'%PDF-test')
+        url = reverse('contrat_pdf', args=[contrat.id])
+
+        response = self.client.get(url)
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-test')
+        self.assertEqual(response['ETag'], f'"{cle}"')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=f'"{cle}"')
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.test_client.nom = 'Durand'
+            self.test_client.save()
+        self.assertFalse(fichier.exists())
+        contrat.refresh_from_db()
+        self.assertNotEqual(pdf_contrats.empreinte(contrat), cle)
+
+        # Client chargé sans son libellé : ni requête de chargement ni purge
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        fichier, cle = pdf_contrats.obtenir(contrat, generateur=lambda c: b'%PDF-test')
+        client = Client.objects.only('email').get(pk=self.test_client.pk)
+        with CaptureQueriesContext(connection) as requetes, self.captureOnCommitCallbacks(execute=True):
+            client.email = 'autre@example.com'
+            client.save()
+        self.assertTrue(fichier.exists())
+        self.assertFalse([q for q in requetes if q['sql'].startswith('SELECT') and '"nom"' in q['sql']])
+
+    def test_images_derivees(self):
+        """Les variantes WebP sont générées après le commit et servies en srcset."""
+        from io import BytesIO
+        from PIL import Image
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        photo = BytesIO()
+        Image.new('RGB', (2000, 1000), 'red').save(photo, 'JPEG')
+
+        with self.settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='media-'), VEHICULES_IMAGES_ASYNC=False):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.test_vehicule.image = SimpleUploadedFile('clio.jpg', photo.getvalue(), content_type='image/jpeg')
+                self.test_vehicule.save()
+            vehicule = Vehicule.objects.get(id=self.test_vehicule.id)
+            self.assertEqual(vehicule.image_variantes['largeurs'], [160, 480, 1200])
+            self.assertTrue(vehicule.image_carte_url.endswith('_480.webp'))
+
+            response = self.client.get(reverse('catalogue'))
+            self.assertContains(response, '_1200.webp 1200w')
+            self.assertContains(response, 'loading="lazy"')
+
+        # Même nom de fichier, extension ou dossier différents : variantes distinctes
+        from .images import nom_derive
+        noms = {nom_derive(nom, 480) for nom in ('vehicules/clio.jpg', 'vehicules/clio.png', 'vehicules/2024/clio.jpg')}
+        self.assertEqual(len(noms), 3)
+
+    def test_cache_catalogue(self):
+        """Le catalogue anonyme est servi sans requête SQL et invalidé par la version de la flotte."""
+        from django.core.cache import cache
+        cache.clear()
+        visiteur = TestClient()
+        url = reverse('catalogue')
+        visiteur.get(url)
+        with self.assertNumQueries(0):
+            response = visiteur.get(url)
+        self.assertContains(response, 'Renault Clio')
+        etag = response['ETag']
+        self.assertEqual(visiteur.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.test_vehicule.modele = 'Megane'
+            self.test_vehicule.save()
+        response = visiteur.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Renault Megane')
+
+        # Utilisateur connecté : page rendue, lien réservé au personnel
+        self.assertContains(self.client.get(url), 'Détails / Réserver')
+
+    def test_import_data(self):
+        """Import par lots : références résolues en mémoire, effets de bord produits par lot."""
+        from io import StringIO
+        from .importation import importer
+        from .models import AuditLog, Reservation
+        from .stats import get_stats_globales
+        clients = StringIO(
+            'nom,prenom,telephone,email\n'
+            'Martin,Paul,0600000001,paul@example.com\n'
+            'Sans,Prenom,,\n'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            nb, erreurs = importer(clients, 'clients')
+        self.assertEqual(nb, 1)
+        self.assertEqual(erreurs[0][0], 3)
+        self.assertEqual(get_stats_globales()['total_clients'], 2)
+
+        debut = (date.today() + timedelta(days=3)).isoformat()
+        contrats = StringIO(
+            f'{{"client_email": "PAUL@example.com", "vehicule_immatriculation": "AA-123-BB", "date_debut": "{debut}", "nb_jours": 10}}\n'
+            f'{{"client_email": "inconnu@example.com", "vehicule_immatriculation": "AA-123-BB", "date_debut": "{debut}", "nb_jours": 2}}\n'
+            'pas du json\n'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            nb, erreurs = importer(contrats, 'contrats', format_fichier='jsonl', taille_lot=1)
+        self.assertEqual((nb, [numero for numero, _ in erreurs]), (1, [2, 3]))
+        contrat = Contrat.objects.get(client__email='paul@example.com')
+        self.assertEqual(contrat.montant_total, Decimal('450.00'))
+        self.assertTrue(Reservation.objects.filter(contrat=contrat).exists())
+        self.assertTrue(AuditLog.objects.filter(model='Contrat', object_id=str(contrat.id), actor='import_data').exists())
+
+        # Chevauchements : avec le calendrier, puis avec une ligne déjà lue du fichier
+        ligne = '{{"client_email": "paul@example.com", "vehicule_immatriculation": "AA-123-BB", "date_debut": "{}", "nb_jours": {}{}}}\n'
+        jour = lambda n: (date.today() + timedelta(days=n)).isoformat()
+        contrats = StringIO(
+            ligne.format(jour(5), 2, '')
+            + ligne.format(jour(20), 2, '')
+            + ligne.format(jour(21), 1, '')
+            + ligne.format(jour(5), 2, ', "statut": "termine"')
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            nb, erreurs = importer(contrats, 'contrats', format_fichier='jsonl', taille_lot=1)
+        self.assertEqual((nb, [numero for numero, _ in erreurs]), (2, [1, 3]))
+        self.assertIn('déjà réservé', erreurs[0][1])
+        self.assertEqual(Reservation.objects.filter(vehicule=self.test_vehicule).count(), 2)
+
+    def test_benchmark(self):
+        """Le banc d'essai couvre les URL de gestion et détecte une requête SQL supplémentaire."""
+        from .benchmark import generer_donnees, urls_a_mesurer, mesurer, comparer
+        generer_donnees(nb_clients=5, nb_vehicules=3, nb_contrats=20)
+        self.assertEqual(Contrat.objects.count(), 20)
+        urls = dict((nom, url) for nom, url, _ in urls_a_mesurer())
+        self.assertIn('liste_contrats', urls)
+        self.assertIn('detail_contrat', urls)
+
+        mesure = mesurer(self.client, urls['liste_contrats'], {}, repetitions=3)
+        self.assertEqual(mesure['statut'], 200)
+        reference = {'liste_contrats': dict(mesure, requetes_sql=mesure['requetes_sql'] - 1)}
+        self.assertEqual(len(comparer(reference, {'liste_contrats': mesure})), 1)
+
+    def test_instrumentation_sql(self):
+        """Les requêtes de même forme sont regroupées et les en-têtes X-SQL-* envoyés au personnel."""
+        from .instrumentation import relever
+        releve, pile = relever()
+        with pile:
+            for i in range(3):
+                Client.objects.filter(id=i).first()
+            Client.objects.filter(id__in=[1, 2, 3]).count()
+        self.assertEqual(releve.nb, 4)
+        self.assertEqual(releve.doublons(), 2)
+        [(sql, nombre, _)] = releve.n_plus_un(seuil=3)
+        self.assertEqual(nombre, 3)
+
+        response = self.client.get(reverse('liste_clients'))
+        self.assertGreater(int(response['X-SQL-Requetes']), 0)
+        self.assertNotIn('X-SQL-Requetes', TestClient().get(reverse('catalogue')))
+
+    def test_server_timing_et_profil(self):
+        """Chaque réponse porte Server-Timing ; ?profil=1 enregistre un profil téléchargeable par le personnel."""
+        response = self.client.get(reverse('index'))
+        categories = [entree.split(';')[0] for entree in response['Server-Timing'].split(', ')]
+        self.assertEqual(categories[0], 'db')
+        self.assertIn('gabarit', categories)
+        self.assertEqual(categories[-2:], ['vue', 'total'])
+
+        with self.settings(PROFILS_DIR=tempfile.mkdtemp(prefix='profils-')):
+            response = self.client.get(reverse('liste_contrats'), {'profil': 1})
+            url_profil = response['X-Profil']
+            response = self.client.get(url_profil)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('X-Profil', TestClient().get(reverse('catalogue'), {'profil': 1}))
+
+    def test_server_timing_echantillon(self):
+        """Server-Timing suit l'échantillonnage (sauf pour le personnel) et réutilise le relevé SQL."""
+        from unittest import mock
+        from .instrumentation import ReleveSQL
+        with self.settings(SQL_INSTRUMENTATION_TAUX=0):
+            self.assertNotIn('Server-Timing', TestClient().get(reverse('catalogue')))
+            response = self.client.get(reverse('liste_clients'))
+            self.assertIn('requêtes', response['Server-Timing'])
+            self.assertNotIn('X-SQL-Requetes', response)
+
+        with self.settings(SQL_INSTRUMENTATION_TAUX=1.0):
+            # Visiteur de l'échantillon : durées sans le nombre de requêtes
+            response = TestClient().get(reverse('catalogue'))
+            self.assertTrue(response['Server-Timing'].startswith('db;dur='))
+            self.assertNotIn('desc=', response['Server-Timing'])
+
+            # Un seul relevé installé pour les deux middlewares
+            with mock.patch.object(ReleveSQL, 'installer', autospec=True, side_effect=ReleveSQL.installer) as installer:
+                response = self.client.get(reverse('liste_clients'))
+            self.assertEqual(installer.call_count, 1)
+            self.assertIn(f'desc="{response["X-SQL-Requetes"]} requêtes"', response['Server-Timing'])
+
+    def test_sqlite_profil_et_immediate(self):
+        """Le profil SQLite est appliqué aux connexions et les transactions IMMEDIATE évitent les verrous."""
+        from django.db import connection
+        from .benchmark import mesurer_concurrence
+        from .sqlite import ecrire
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+        # Dans une transaction ouverte, l'écriture est exécutée directement
+        self.assertEqual(ecrire(lambda: Client.objects.filter(nom='Dupont').update(prenom='Jeanne')), 1)
+
+        mesure = mesurer_concurrence(tempfile.mkdtemp(prefix='sqlite-'), nb_lecteurs=2, nb_ecrivains=3,
+                                     duree=0.3, via_ecrire=True, nb_contrats=100)
+        self.assertGreater(mesure['ecritures_par_s'], 0)
+        self.assertEqual(mesure['verrous'], 0)
+
+    def test_routeur_replique(self):
+        """Rapports lus sur la réplique si elle est récente, écritures toujours sur la base principale."""
+        from unittest import mock
+        from django.db import router
+        from .replique import utiliser_replique, exiger_fraicheur
+        maintenant = timezone.now()
+        with mock.patch('gestion.replique.instantane', return_value=maintenant):
+            with utiliser_replique():
+                self.assertEqual(router.db_for_read(Contrat), 'replica')
+                self.assertEqual(router.db_for_write(Contrat), 'default')
+                # Instantané antérieur à la dernière invalidation du cache
+                with self.assertLogs('gestion.replique', 'INFO'), exiger_fraicheur(maintenant + timedelta(minutes=1)):
+                    self.assertEqual(router.db_for_read(Contrat), 'default')
+            self.assertEqual(router.db_for_read(Contrat), 'default')
+        with mock.patch('gestion.replique.instantane', return_value=maintenant - timedelta(hours=1)):
+            with self.assertLogs('gestion.replique', 'INFO'), utiliser_replique() as alias:
+                self.assertIsNone(alias)
+
+        # Sans réplique disponible (tests), les exports lisent la base principale
+        response = self.client.get(reverse('export_clients_csv'))
+        self.assertIn(b'Dupont', b''.join(response.streaming_content))
+
+    def test_tableau_bord_cache(self):
+        """L'endpoint combiné du dashboard est mis en cache et invalidé par les contrats et les clients."""
+        from django.core.cache import cache
+        from . import tableau_bord
+        cache.clear()
+        url = reverse('stats_tableau_bord')
+        response = self.client.get(url)
+        self.assertEqual(set(response.json()), set(tableau_bord.AGREGATS_API))
+        self.assertEqual(response.json()['stats']['total_clients'], 1)
+        etag = response['ETag']
+
+        # Succès de cache : aucune requête SQL pour les données
+        with self.assertNumQueries(2):  # session + utilisateur
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Client.objects.create(nom='Martin', prenom='Paul', telephone='0600000000')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['stats']['total_clients'], 2)
+        etag = response['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Contrat.objects.create(
+                client=self.test_client, vehicule=self.test_vehicule,
+                date_debut=date.today(), date_fin=date.today() + timedelta(days=2),
+                nb_jours=2, montant_total=Decimal('100.00'),
+            )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['contrats_recents']), 1)
+
+
+    def test_tableau_bord_async(self):
+        """Les versions asynchrones des endpoints répondent comme les synchrones, avec le même cache."""
+        import json
+        from asgiref.sync import async_to_sync
+        from django.core.cache import cache
+        from django.test import RequestFactory
+        from . import views
+        cache.clear()
+
+        def appeler(vue, url, **entetes):
+            request = RequestFactory().get(url, **entetes)
+            request.user = self.admin_user
+            return async_to_sync(vue)(request)
+
+        for nom in ('stats_tableau_bord', 'stats_contrats_par_mois', 'stats_occupation_vehicules'):
+            with self.subTest(vue=nom):
+                url = reverse(nom)
+                attendu = self.client.get(url)
+                response = appeler(getattr(views, f'{nom}_async'), url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(json.loads(response.content), attendu.json())
+                self.assertEqual(response['ETag'], attendu['ETag'])
+                self.assertEqual(appeler(getattr(views, f'{nom}_async'), url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        url = reverse('stats_occupation_vehicules') + '?jours=12'
+        self.assertEqual(appeler(views.stats_occupation_vehicules_async, url).status_code, 400)
+
+
+@override_settings(CONTRATS_JOURNAL_DIR=JOURNAL_TEST_DIR, CONTRATS_JOURNAL_ASYNC=False, CONTRATS_PDF_DIR=PDF_TEST_DIR)
+class ImmediateSQLiteTestCase(TransactionTestCase):
+    """Écritures des vues en transaction IMMEDIATE (hors transaction de test)."""
+
+    def setUp(self):
+        User.objects.create_superuser(username='admin', email='admin@example.com', password='admin123')
+        self.client.login(username='admin', password='admin123')
+        self.vehicule = Vehicule.objects.create(
+            type_vehicule='voiture', marque='Renault', modele='Clio', annee=2020,
+            immatriculation='AA-123-BB', prix_journalier=Decimal('50.00'), disponible=False,
+        )
+        self.contrat = Contrat.objects.create(
+            client=Client.objects.create(nom='Dupont', prenom='Jean', telephone='0123456789'),
+            vehicule=self.vehicule,
+            date_debut=date.today(),
+            date_fin=date.today() + timedelta(days=3),
+            nb_jours=3,
+            montant_total=Decimal('150.00'),
+        )
+
+    def test_retour_immediate(self):
+        """Le retour d'un contrat est écrit dans une transaction BEGIN IMMEDIATE, avec ses actions après commit."""
+        from unittest import mock
+        from . import sqlite
+        from .models import AuditLog
+        debuts = []
+        original = sqlite._begin_immediate
+
+        def espion(execute, *args):
+            # SQL transmis à la base, après réécriture du BEGIN
+            def noter(sql, *reste):
+                if sql.startswith('BEGIN'):
+                    debuts.append(sql)
+                return execute(sql, *reste)
+            return original(noter, *args)
+
+        with mock.patch.object(sqlite, '_begin_immediate', espion):
+            response = self.client.post(reverse('retour_contrat', args=[self.contrat.id]))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('BEGIN IMMEDIATE', debuts)
+        self.contrat.refresh_from_db()
+        self.vehicule.refresh_from_db()
+        self.assertEqual(self.contrat.statut, 'termine')
+        self.assertTrue(self.vehicule.disponible)
+        # Audit de la requête écrit après le commit
+        self.assertTrue(AuditLog.objects.filter(model='Contrat', object_id=str(self.contrat.id), actor='admin').exists())
+
+
+@override_settings(CONTRATS_JOURNAL_DIR=JOURNAL_TEST_DIR, CONTRATS_JOURNAL_ASYNC=False, CONTRATS_PDF_DIR=PDF_TEST_DIR,
+                   TABLEAU_BORD_CONCURRENCE=4)
+class TableauBordParalleleTestCase(TransactionTestCase):
+    """Agrégats du dashboard calculés en parallèle sur la base de test (données commitées)."""
+
+    def setUp(self):
+        vehicules = [
+            Vehicule.objects.create(
+                type_vehicule='voiture', marque='Renault', modele=f'Clio {i}', annee=2020,
+                immatriculation=f'AA-{i:03d}-BB', prix_journalier=Decimal('50.00'), disponible=i % 2 == 0,
+            )
+            for i in range(4)
+        ]
+        for i in range(12):
+            Contrat.objects.create(
+                client=Client.objects.create(nom=f'Client {i}', prenom='Jean', telephone=f'06000000{i:02d}'),
+                vehicule=vehicules[i % 3],
+                date_debut=date.today() - timedelta(days=i),
+                date_fin=date.today() + timedelta(days=3),
+                nb_jours=3 + i,
+                montant_total=Decimal('150.00'),
+                statut='termine' if i % 4 == 0 else 'actif',
+            )
+
+    def test_acalculer_parallele(self):
+        """Avec une concurrence > 1, chaque agrégat lit la base depuis son thread : mêmes valeurs qu'en séquentiel."""
+        import threading
+        from asgiref.sync import async_to_sync
+        from . import tableau_bord
+        threads = set()
+
+        def noter(fonction):
+            def executer():
+                threads.add(threading.get_ident())
+                return fonction()
+            return executer
+
+        for agregats in (tableau_bord.AGREGATS_API, tableau_bord.AGREGATS_ADMIN):
+            with self.subTest(agregats=sorted(agregats)):
+                attendu = tableau_bord.calculer(agregats)
+                threads.clear()
+                valeurs = async_to_sync(tableau_bord.acalculer)({nom: noter(f) for nom, f in agregats.items()})
+                self.assertGreater(len(threads), 1)
+                self.assertNotIn(threading.get_ident(), threads)
+                self.assertEqual(list(valeurs), list(agregats))
+                self.assertEqual(valeurs, attendu)
+
+    def test_vue_async_parallele(self):
+        """L'endpoint asynchrone du dashboard, agrégats en parallèle, répond comme la version synchrone."""
+        import json
+        from asgiref.sync import async_to_sync
+        from django.test import RequestFactory
+        from . import views
+        admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='admin123')
+        self.client.force_login(admin)
+        attendu = self.client.get(reverse('stats_tableau_bord')).json()
+        request = RequestFactory().get(reverse('stats_tableau_bord'))
+        request.user = admin
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}):
+            response = async_to_sync(views.stats_tableau_bord_async)(request)
+        self.assertEqual(json.loads(response.content), attendu)
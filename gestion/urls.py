@@ -1,6 +1,17 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# Endpoints du dashboard : versions asynchrones sous ASGI (voir asgi.py)
+if settings.VUES_ASYNC:
+    stats_contrats_par_mois = views.stats_contrats_par_mois_async
+    stats_occupation_vehicules = views.stats_occupation_vehicules_async
+    stats_tableau_bord = views.stats_tableau_bord_async
+else:
+    stats_contrats_par_mois = views.stats_contrats_par_mois
+    stats_occupation_vehicules = views.stats_occupation_vehicules
+    stats_tableau_bord = views.stats_tableau_bord
+
 urlpatterns = [
     path('', views.index, name='index'),
     
@@ -31,10 +42,12 @@ urlpatterns = [
     path('clients/en-retard/', views.clients_en_retard, name='clients_en_retard'),
 
     # Stats for admin dashboard
-    path('api/stats/contrats-par-mois/', views.stats_contrats_par_mois, name='stats_contrats_par_mois'),
-    path('api/stats/occupation-vehicules/', views.stats_occupation_vehicules, name='stats_occupation_vehicules'),
+    path('api/stats/contrats-par-mois/', stats_contrats_par_mois, name='stats_contrats_par_mois'),
+    path('api/stats/occupation-vehicules/', stats_occupation_vehicules, name='stats_occupation_vehicules'),
+    path('api/stats/tableau-de-bord/', stats_tableau_bord, name='stats_tableau_bord'),
     path('admin/dashboard/', views.admin_dashboard, name='admin_dashboard'),
-    path('admin/audit-logs/', views.audit_list, name='audit_list'),
+    # Masquée par le site admin (admin/) : le nom audit_list désigne /audit/
+    path('admin/audit-logs/', views.audit_list, name='audit_list_admin'),
     
     # Contrats
     path('contrats/', views.liste_contrats, name='liste_contrats'),
@@ -47,4 +60,10 @@ urlpatterns = [
     
     # API
     path('api/calculer-prix/', views.calculer_prix, name='calculer_prix'),
+    path('api/disponibilites/', views.api_disponibilites, name='api_disponibilites'),
+    path('api/devis/', views.api_devis, name='api_devis'),
+    path('api/tarifs/', views.api_tarifs, name='api_tarifs'),
+
+    # Profils cProfile (?profil=1, personnel)
+    path('profils/<str:nom>/', views.telecharger_profil, name='telecharger_profil'),
 ]
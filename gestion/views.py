@@ -1,91 +1,143 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.http.response import HttpResponseRedirect
-from django.http import JsonResponse, Http404, HttpResponse
+from django.http import JsonResponse, Http404, HttpResponse, StreamingHttpResponse
 import csv
 from django.contrib import messages
 from django.utils import timezone
 from datetime import date, timedelta, datetime
 from django.urls import reverse
-from .models import Client, Vehicule, Contrat
-from .forms import ClientForm, VehiculeForm, ContratForm
+from .models import Client, Vehicule, Contrat, AuditLog
+from .tasks import rappels_du_jour
+from .forms import ClientForm, VehiculeForm, ContratForm, RechercheDisponibiliteForm, AuditFiltreForm
+from .pagination import paginer_par_curseur
+from .middleware import dossier_profils, NOM_PROFIL
+from . import pdf_contrats
+from .sqlite import ecrire
+from .replique import vue_replique
+from . import tableau_bord
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from functools import partial, wraps
+from .tarifs import grille_prix, regles_tarifaires, DUREE_MAX_GRILLE, VEHICULES_MAX_GRILLE
+from .stats import get_stats_globales
+from .occupation import occupation_vehicules, FENETRES_JOURS
+from .cache_stats import cache_json, cache_page_anonyme, version, CATALOGUE, CLIENTS, CONTRATS, OCCUPATION, TARIFS, DUREE_CACHE
 from django.contrib.admin.views.decorators import staff_member_required
-from django.db.models import Count
-from django.db.models.functions import TruncMonth
+from django.db.models import Count, Q
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.core.paginator import Paginator
 from django.http import FileResponse
-import io
 
 @staff_member_required
 def admin_dashboard(request):
     return render(request, 'gestion/admin_dashboard.html')
 
+TAILLE_LOT_EXPORT = 2000  # lignes lues par aller-retour avec la base pendant un export
+
+
+class _Echo:
+    """Pseudo-fichier pour csv.writer : renvoie la ligne au lieu de l'écrire."""
+    def write(self, value):
+        return value
+
+
+def _export_csv(filename, entete, lignes):
+    """Réponse CSV en flux : chaque ligne est envoyée dès qu'elle est lue en base."""
+    writer = csv.writer(_Echo())
+
+    def contenu():
+        yield writer.writerow(entete)
+        for ligne in lignes:
+            yield writer.writerow(ligne)
+
+    response = StreamingHttpResponse(contenu(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
 @staff_member_required
+@vue_replique
 def export_clients_csv(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="clients.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Nom', 'Prénom', 'Email', 'Téléphone'])
-    
-    clients = Client.objects.all()
-    for client in clients:
-        writer.writerow([client.nom, client.prenom, client.email, client.telephone])
-    
-    return response
+    clients = (
+        Client.objects
+        .order_by('id')
+        .values_list('nom', 'prenom', 'email', 'telephone')
+        .iterator(chunk_size=TAILLE_LOT_EXPORT)
+    )
+    return _export_csv('clients.csv', ['Nom', 'Prénom', 'Email', 'Téléphone'], clients)
 
 @staff_member_required
+@vue_replique
 def export_vehicules_csv(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="vehicules.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Marque', 'Modèle', 'Année', 'Kilométrage', 'Prix journalier', 'Disponible'])
-    
-    vehicules = Vehicule.objects.all()
-    for vehicule in vehicules:
-        writer.writerow([vehicule.marque, vehicule.modele, vehicule.annee, vehicule.kilometrage, vehicule.prix_journalier, vehicule.disponible])
-    
-    return response
+    vehicules = (
+        Vehicule.objects
+        .order_by('id')
+        .values_list('marque', 'modele', 'annee', 'immatriculation', 'prix_journalier', 'disponible')
+        .iterator(chunk_size=TAILLE_LOT_EXPORT)
+    )
+    return _export_csv(
+        'vehicules.csv',
+        ['Marque', 'Modèle', 'Année', 'Immatriculation', 'Prix journalier', 'Disponible'],
+        vehicules,
+    )
 
 
 @staff_member_required
+@vue_replique
 def export_clients_en_retard_csv(request):
     """Export CSV des clients ayant des contrats en retard."""
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="clients_en_retard.csv"'
-
-    writer = csv.writer(response)
-    writer.writerow(['Nom', 'Prénom', 'Email', 'Téléphone', 'Contrat ID', 'Véhicule', 'Date fin prévue', 'Jours de retard'])
-
     today = timezone.now().date()
-    contrats_retard = Contrat.objects.filter(statut='en_retard')
-    for contrat in contrats_retard:
-        jours_retard = (today - contrat.date_fin).days if contrat.date_fin else ''
-        client = contrat.client
-        writer.writerow([client.nom, client.prenom, client.email, client.telephone, contrat.id, f"{contrat.vehicule.marque} {contrat.vehicule.modele}", contrat.date_fin, jours_retard])
+    contrats_retard = (
+        Contrat.objects
+        .filter(statut='en_retard')
+        .order_by('id')
+        .values_list(
+            'client__nom', 'client__prenom', 'client__email', 'client__telephone',
+            'id', 'vehicule__marque', 'vehicule__modele', 'date_fin',
+        )
+        .iterator(chunk_size=TAILLE_LOT_EXPORT)
+    )
 
-    return response
+    def lignes():
+        for nom, prenom, email, telephone, contrat_id, marque, modele, date_fin in contrats_retard:
+            jours_retard = (today - date_fin).days if date_fin else ''
+            yield [nom, prenom, email, telephone, contrat_id, f"{marque} {modele}", date_fin, jours_retard]
+
+    return _export_csv(
+        'clients_en_retard.csv',
+        ['Nom', 'Prénom', 'Email', 'Téléphone', 'Contrat ID', 'Véhicule', 'Date fin prévue', 'Jours de retard'],
+        lignes(),
+    )
 
 
 @staff_member_required
+@vue_replique
 def export_vehicules_loues_csv(request):
     """Export CSV des véhicules actuellement loués (contrats actifs)."""
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="vehicules_loues.csv"'
-
-    writer = csv.writer(response)
-    writer.writerow(['Véhicule', 'Immatriculation', 'Client', 'Date début', 'Date fin prévue', 'Contrat ID'])
+    contrats_actifs = (
+        Contrat.objects
+        .filter(statut='actif')
+        .order_by('id')
+        .values_list(
+            'vehicule__marque', 'vehicule__modele', 'vehicule__immatriculation',
+            'client__nom', 'client__prenom', 'date_debut', 'date_fin', 'id',
+        )
+        .iterator(chunk_size=TAILLE_LOT_EXPORT)
+    )
 
-    contrats_actifs = Contrat.objects.filter(statut='actif')
-    for contrat in contrats_actifs:
-        vehicule = contrat.vehicule
-        client = contrat.client
-        writer.writerow([f"{vehicule.marque} {vehicule.modele}", vehicule.immatriculation, f"{client.nom} {client.prenom}", contrat.date_debut, contrat.date_fin, contrat.id])
+    def lignes():
+        for marque, modele, immatriculation, nom, prenom, date_debut, date_fin, contrat_id in contrats_actifs:
+            yield [f"{marque} {modele}", immatriculation, f"{nom} {prenom}", date_debut, date_fin, contrat_id]
 
-    return response
+    return _export_csv(
+        'vehicules_loues.csv',
+        ['Véhicule', 'Immatriculation', 'Client', 'Date début', 'Date fin prévue', 'Contrat ID'],
+        lignes(),
+    )
 
 
 @staff_member_required
+@vue_replique
 def clients_en_retard(request):
     """Affiche une page listant les clients avec contrats en retard."""
     contrats_retard = Contrat.objects.filter(statut='en_retard').select_related('client', 'vehicule')
@@ -109,112 +161,123 @@ def clients_en_retard(request):
         'today': today,
     })
 
-@staff_member_required
 @staff_member_required
 def audit_list(request):
-    # Get the list of audits and paginate
-    audits = []
-    page = request.GET.get('page', 1)
-    paginator = Paginator(audits, 25)  # 25 audits per page
-    
-    try:
-        audits_page = paginator.page(page)
-    except:
-        audits_page = paginator.page(1)
-    
+    """Journal d'audit filtrable, paginé par curseur sur (timestamp, id)."""
+    filtres = AuditFiltreForm(request.GET)
+    audits = filtres.filtrer(AuditLog.objects.all())
+    page = paginer_par_curseur(audits, ['-timestamp', '-id'], request.GET.get('curseur'), par_page=50)
+
+    params = request.GET.copy()
+    params.pop('curseur', None)
     return render(request, 'gestion/audit_list.html', {
-        'audits': audits_page
+        'audits': page,
+        'filtres': filtres,
+        'params': params.urlencode(),
     })
 
+@staff_member_required
+@vue_replique
 def export_contrats_csv(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="contrats.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Client', 'Véhicule', 'Date début', 'Date fin prévue', 'Date retour', 'Statut', 'Montant total'])
-    
-    contrats = Contrat.objects.all()
-    for contrat in contrats:
-        writer.writerow([
-            f"{contrat.client.nom} {contrat.client.prenom}",
-            f"{contrat.vehicule.marque} {contrat.vehicule.modele}",
-            contrat.date_debut,
-            contrat.date_fin_prevue,
-            contrat.date_retour,
-            contrat.statut,
-            contrat.montant_total
-        ])
-    
-    return response
+    contrats = (
+        Contrat.objects
+        .order_by('id')
+        .values_list(
+            'client__nom', 'client__prenom', 'vehicule__marque', 'vehicule__modele',
+            'date_debut', 'date_fin', 'statut', 'montant_total',
+        )
+        .iterator(chunk_size=TAILLE_LOT_EXPORT)
+    )
+
+    def lignes():
+        for nom, prenom, marque, modele, date_debut, date_fin, statut, montant_total in contrats:
+            yield [f"{nom} {prenom}", f"{marque} {modele}", date_debut, date_fin, statut, montant_total]
+
+    return _export_csv(
+        'contrats.csv',
+        ['Client', 'Véhicule', 'Date début', 'Date fin prévue', 'Statut', 'Montant total'],
+        lignes(),
+    )
+
+def _staff_requis_async(vue):
+    """Équivalent de ``staff_member_required`` pour une vue asynchrone (Django 4.2)."""
+    @wraps(vue)
+    async def wrapper(request, *args, **kwargs):
+        # request.user lit la session en base : hors de la boucle d'événements
+        if not await sync_to_async(lambda: request.user.is_active and request.user.is_staff)():
+            return redirect_to_login(request.get_full_path(), reverse('admin:login'))
+        return await vue(request, *args, **kwargs)
+    return wrapper
+
+# Endpoints du dashboard : version synchrone (WSGI) et asynchrone (ASGI) de chacun,
+# choisie dans urls.py selon settings.VUES_ASYNC
 
 @staff_member_required
+@vue_replique
+@cache_json(CONTRATS)
 def stats_contrats_par_mois(request):
-    # Calculer les contrats par mois pour les 12 derniers mois
-    douze_mois = timezone.now() - timedelta(days=365)
-    contrats_par_mois = (
-        Contrat.objects
-        .filter(date_creation__gte=douze_mois)
-        .annotate(mois=TruncMonth('date_creation'))
-        .values('mois')
-        .annotate(total=Count('id'))
-        .order_by('mois')
-    )
-    
-    # Formater les données pour le graphique
-    labels = []
-    data = []
-    for stat in contrats_par_mois:
-        labels.append(stat['mois'].strftime('%B %Y'))
-        data.append(stat['total'])
-        
-    return JsonResponse({
-        'labels': labels,
-        'data': data
-    })
+    # Contrats par mois pour les 12 derniers mois, au format du graphique
+    return JsonResponse(tableau_bord.contrats_par_mois())
+
+@_staff_requis_async
+@vue_replique
+@cache_json(CONTRATS)
+async def stats_contrats_par_mois_async(request):
+    valeurs = await tableau_bord.acalculer({'contrats_par_mois': tableau_bord.contrats_par_mois})
+    return JsonResponse(valeurs['contrats_par_mois'])
+
+def _fenetre_occupation(request):
+    # Fenêtre en jours (?jours=7|30|90|365), 30 par défaut
+    try:
+        jours = int(request.GET.get('jours', 30))
+    except ValueError:
+        return None
+    return jours if jours in FENETRES_JOURS else None
+
+def _fenetre_invalide():
+    return JsonResponse({'error': 'Fenêtre invalide', 'fenetres': list(FENETRES_JOURS)}, status=400)
 
 @staff_member_required
+@vue_replique
+@cache_json(OCCUPATION)
 def stats_occupation_vehicules(request):
-    vehicules = Vehicule.objects.all()
-    data = []
-    
-    for vehicule in vehicules:
-        # Calculer le nombre de jours loués sur les 30 derniers jours
-        trente_jours = timezone.now().date() - timedelta(days=30)
-        jours_loues = (
-            Contrat.objects
-            .filter(vehicule=vehicule)
-            .filter(date_debut__gte=trente_jours)
-            .count()
-        )
-        
-        taux_occupation = (jours_loues / 30) * 100 if jours_loues > 0 else 0
-        
-        data.append({
-            'vehicule': f"{vehicule.marque} {vehicule.modele}",
-            'taux_occupation': round(taux_occupation, 2)
-        })
-    
-    return JsonResponse({'data': data})
+    jours = _fenetre_occupation(request)
+    if jours is None:
+        return _fenetre_invalide()
+    return JsonResponse({'jours': jours, 'data': occupation_vehicules(jours)})
+
+@_staff_requis_async
+@vue_replique
+@cache_json(OCCUPATION)
+async def stats_occupation_vehicules_async(request):
+    jours = _fenetre_occupation(request)
+    if jours is None:
+        return _fenetre_invalide()
+    valeurs = await tableau_bord.acalculer({'data': partial(occupation_vehicules, jours)})
+    return JsonResponse({'jours': jours, **valeurs})
+
+@staff_member_required
+@vue_replique
+@cache_json(CONTRATS, OCCUPATION, CLIENTS)
+def stats_tableau_bord(request):
+    """Tous les agrégats du dashboard en une réponse, calculés l'un après l'autre."""
+    return JsonResponse(tableau_bord.calculer(tableau_bord.AGREGATS_API))
+
+@_staff_requis_async
+@vue_replique
+@cache_json(CONTRATS, OCCUPATION, CLIENTS)
+async def stats_tableau_bord_async(request):
+    """Tous les agrégats du dashboard en une réponse, calculés en parallèle."""
+    return JsonResponse(await tableau_bord.acalculer(tableau_bord.AGREGATS_API))
 
 def index(request):
-    stats = {
-        'total_clients': Client.objects.count(),
-        'total_vehicules': Vehicule.objects.count(),
-        'vehicules_disponibles': Vehicule.objects.filter(disponible=True).count(),
-        'contrats_actifs': Contrat.objects.filter(statut='actif').count(),
-        'contrats_retard': Contrat.objects.filter(statut='en_retard').count(),
-    }
+    stats = get_stats_globales()
     
-    contrats_recent = Contrat.objects.all().order_by('-date_creation')[:5]
+    contrats_recent = Contrat.objects.select_related('client', 'vehicule').order_by('-date_creation')[:5]
     vehicules_disponibles = Vehicule.objects.filter(disponible=True)[:5]
     
-    # Envoyer les rappels automatiques
-    contrats_pour_rappel = Contrat.objects.filter(statut='actif')
-    rappels = []
-    for contrat in contrats_pour_rappel:
-        rappel = contrat.envoyer_rappel()
-        if rappel:
-            rappels.append(rappel)
+    # Rappels précalculés une fois par jour (tasks.generer_rappels)
+    rappels = rappels_du_jour()
     
     context = {
         'stats': stats,
@@ -224,10 +287,64 @@ def index(request):
     }
     return render(request, 'gestion/index.html', context)
 
+# Listes paginées par curseur : tri choisi parmi une liste blanche (?tri=),
+# dernier champ unique pour que le curseur soit stable
+PAR_PAGE_LISTES = 25
+
+TRIS_CLIENTS = {
+    'nom': ['nom', 'prenom', 'id'],
+    '-nom': ['-nom', '-prenom', '-id'],
+    'recent': ['-date_creation', '-id'],
+}
+
+TRIS_VEHICULES = {
+    'marque': ['marque', 'modele', 'id'],
+    'prix': ['prix_journalier', 'id'],
+    '-prix': ['-prix_journalier', '-id'],
+    'recent': ['-date_ajout', '-id'],
+}
+
+TRIS_CONTRATS = {
+    'recent': ['-date_creation', '-id'],
+    'debut': ['date_debut', 'id'],
+    '-debut': ['-date_debut', '-id'],
+}
+
+def _page_liste(request, queryset, tris, tri_defaut):
+    """Page par curseur et paramètres de l'URL (sans le curseur) pour la navigation."""
+    tri = request.GET.get('tri')
+    if tri not in tris:
+        tri = tri_defaut
+    page = paginer_par_curseur(queryset, tris[tri], request.GET.get('curseur'), PAR_PAGE_LISTES)
+    params = request.GET.copy()
+    params.pop('curseur', None)
+    return page, tri, params.urlencode()
+
 # Vues pour les clients
 def liste_clients(request):
-    clients = Client.objects.all().order_by('nom')
-    return render(request, 'gestion/client/liste.html', {'clients': clients})
+    clients = Client.objects.only('id', 'nom', 'prenom', 'telephone', 'email', 'date_creation')
+    recherche = request.GET.get('q', '').strip()
+    if recherche:
+        clients = clients.filter(Q(nom__istartswith=recherche) | Q(prenom__istartswith=recherche) | Q(telephone__startswith=recherche))
+
+    page, tri, params = _page_liste(request, clients, TRIS_CLIENTS, 'nom')
+    # Contrats actifs comptés pour les seuls clients de la page : un agrégat dans la
+    # requête de la page grouperait toute la table avant le LIMIT
+    actifs = dict(
+        Contrat.objects
+        .filter(client_id__in=[client.id for client in page], statut='actif')
+        .values('client_id')
+        .annotate(nombre=Count('id'))
+        .values_list('client_id', 'nombre')
+    )
+    for client in page:
+        client.nb_contrats_actifs = actifs.get(client.id, 0)
+    return render(request, 'gestion/client/liste.html', {
+        'clients': page,
+        'tri': tri,
+        'recherche': recherche,
+        'params': params,
+    })
 
 @staff_member_required
 def ajouter_client(request):
@@ -261,13 +378,66 @@ def detail_client(request, id):
 
 # Vues pour les véhicules
 def liste_vehicules(request):
-    vehicules = Vehicule.objects.all().order_by('marque')
-    return render(request, 'gestion/vehicules/liste.html', {'vehicules': vehicules})
+    vehicules = Vehicule.objects.only(
+        'id', 'type_vehicule', 'marque', 'modele', 'annee', 'immatriculation',
+        'prix_journalier', 'disponible', 'date_ajout',
+    )
+    type_vehicule = request.GET.get('type')
+    if type_vehicule in dict(Vehicule.TYPE_VEHICULE):
+        vehicules = vehicules.filter(type_vehicule=type_vehicule)
+    disponible = request.GET.get('disponible')
+    if disponible in ('1', '0'):
+        vehicules = vehicules.filter(disponible=disponible == '1')
+    recherche = request.GET.get('q', '').strip()
+    if recherche:
+        vehicules = vehicules.filter(Q(marque__istartswith=recherche) | Q(immatriculation__istartswith=recherche))
+
+    page, tri, params = _page_liste(request, vehicules, TRIS_VEHICULES, 'marque')
+    return render(request, 'gestion/vehicules/liste.html', {
+        'vehicules': page,
+        'tri': tri,
+        'type_filtre': type_vehicule,
+        'disponible_filtre': disponible,
+        'recherche': recherche,
+        'params': params,
+    })
 
+@cache_page_anonyme(CATALOGUE)
 def public_catalogue(request):
-    """Vue publique: catalogue client avec images et caractéristiques."""
-    vehicules = Vehicule.objects.filter(disponible=True).order_by('-date_ajout')
-    return render(request, 'gestion/public/catalogue.html', {'vehicules': vehicules})
+    """Vue publique: catalogue client avec images et caractéristiques.
+
+    Avec ``date_debut`` et ``nb_jours`` en paramètres, affiche les véhicules
+    libres sur cette période avec le prix de la location. La page sans
+    paramètres est servie depuis le cache aux visiteurs anonymes ; les cartes
+    des véhicules sont mises en cache pour la version courante de la flotte.
+    """
+    recherche = RechercheDisponibiliteForm(request.GET or None)
+    if recherche.is_bound and recherche.is_valid():
+        vehicules = recherche.rechercher()
+    else:
+        vehicules = Vehicule.objects.filter(disponible=True).order_by('-date_ajout')
+    return render(request, 'gestion/public/catalogue.html', {
+        'vehicules': vehicules,
+        'recherche': recherche,
+        'version_flotte': version(CATALOGUE)[0],
+        'duree_cache': DUREE_CACHE,
+    })
+
+def api_disponibilites(request):
+    """API: véhicules libres sur une période, avec le prix de la location."""
+    recherche = RechercheDisponibiliteForm(request.GET)
+    if not recherche.is_valid():
+        return JsonResponse({'error': 'Données invalides', 'details': recherche.errors}, status=400)
+
+    vehicules = recherche.rechercher()
+    date_debut = recherche.cleaned_data['date_debut']
+    nb_jours = recherche.cleaned_data['nb_jours']
+    return JsonResponse({
+        'date_debut': date_debut.isoformat(),
+        'date_fin': (date_debut + timedelta(days=nb_jours)).isoformat(),
+        'nb_jours': nb_jours,
+        'vehicules': [dict(v.to_dict(), prix_total=v.prix_total) for v in vehicules],
+    })
 
 @staff_member_required
 def ajouter_vehicule(request):
@@ -296,12 +466,30 @@ def modifier_vehicule(request, id):
 
 # Vues pour les contrats
 def liste_contrats(request):
+    contrats = (
+        Contrat.objects
+        .select_related('client', 'vehicule')
+        .only(
+            'id', 'date_creation', 'date_debut', 'date_fin', 'montant_total', 'statut',
+            'client__nom', 'client__prenom',
+            'vehicule__marque', 'vehicule__modele', 'vehicule__immatriculation',
+        )
+    )
     statut = request.GET.get('statut')
     if statut:
-        contrats = Contrat.objects.filter(statut=statut).order_by('-date_creation')
-    else:
-        contrats = Contrat.objects.all().order_by('-date_creation')
-    return render(request, 'gestion/contrats/liste.html', {'contrats': contrats, 'statut_filtre': statut})
+        contrats = contrats.filter(statut=statut)
+    for param in ('client', 'vehicule'):
+        valeur = request.GET.get(param)
+        if valeur and valeur.isdigit():
+            contrats = contrats.filter(**{f'{param}_id': int(valeur)})
+
+    page, tri, params = _page_liste(request, contrats, TRIS_CONTRATS, 'recent')
+    return render(request, 'gestion/contrats/liste.html', {
+        'contrats': page,
+        'statut_filtre': statut,
+        'tri': tri,
+        'params': params,
+    })
 
 @staff_member_required
 def creer_contrat(request):
@@ -318,6 +506,7 @@ def creer_contrat(request):
                 vehicule = form.cleaned_data['vehicule']
                 nb_jours = form.cleaned_data['nb_jours']
                 contrat.montant_total = vehicule.calculer_prix_location(nb_jours)
+                _verifier_montant_estime(request, contrat.montant_total)
 
                 # Gérer les détails de paiement
                 details_paiement = {}
@@ -343,22 +532,44 @@ def creer_contrat(request):
 
                 contrat.details_paiement = details_paiement
 
-                # Marquer le véhicule comme indisponible
-                vehicule.disponible = False
-                vehicule.save()
-
-                # Sauvegarder le contrat
-                contrat.save()
+                # Sauvegarder le contrat dans une transaction IMMEDIATE (sqlite.ecrire).
+                # Le véhicule n'est marqué indisponible que si la location commence
+                # aujourd'hui : une réservation future n'occupe que ses dates dans le
+                # calendrier, et ``marquer_departs_du_jour`` le bascule le jour venu.
+                def enregistrer():
+                    if contrat.date_debut <= date.today():
+                        vehicule.disponible = False
+                        vehicule.save()
+                    contrat.save()
+                ecrire(enregistrer)
 
                 messages.success(request, 'Contrat créé avec succès!')
                 return redirect('liste_contrats')
             except Exception as e:
                 messages.error(request, f'Erreur lors de la création du contrat : {str(e)}')
-                return render(request, 'gestion/contrats/creer.html', {'form': form})
+                return render(request, 'gestion/contrats/creer.html', _contexte_creation(form))
     else:
         form = ContratForm()
     
-    return render(request, 'gestion/contrats/creer.html', {'form': form})
+    return render(request, 'gestion/contrats/creer.html', _contexte_creation(form))
+
+def _contexte_creation(form):
+    # URL versionnée : le navigateur garde les règles de prix en cache jusqu'au
+    # prochain changement de véhicule
+    return {
+        'form': form,
+        'tarifs_url': f"{reverse('api_tarifs')}?v={version(TARIFS)[0]}",
+    }
+
+def _verifier_montant_estime(request, montant_total):
+    # Le montant affiché est calculé dans le navigateur : le serveur recalcule
+    # toujours le prix et signale un écart (règles modifiées entre-temps)
+    try:
+        estime = float(request.POST.get('montant_estime', ''))
+    except ValueError:
+        return
+    if round(estime, 2) != montant_total:
+        messages.warning(request, f'Le montant a été recalculé : {montant_total} FCFA (estimation affichée : {estime} FCFA).')
 
 @staff_member_required
 def retour_contrat(request, id):
@@ -381,14 +592,14 @@ def retour_contrat(request, id):
                 if remboursement > 0:
                     messages.info(request, f'Remboursement pour retour anticipé : {remboursement} FCFA')
         
-        # Marquer le véhicule comme disponible
+        # Marquer le véhicule comme disponible et le contrat comme terminé
         vehicule = contrat.vehicule
-        vehicule.disponible = True
-        vehicule.save()
-        
-        # Marquer le contrat comme terminé
-        contrat.statut = 'termine'
-        contrat.save()
+        def enregistrer():
+            vehicule.disponible = True
+            vehicule.save()
+            contrat.statut = 'termine'
+            contrat.save()
+        ecrire(enregistrer)
         
         messages.success(request, f'Véhicule {vehicule} retourné avec succès!')
         return redirect('liste_contrats')
@@ -428,11 +639,13 @@ def rupture_contrat(request, id):
             contrat.motif_rupture = motif_rupture
             contrat.frais_rupture = frais_rupture
             contrat.statut = 'rompu'
-            contrat.save()
 
-            # Libérer le véhicule
-            contrat.vehicule.disponible = True
-            contrat.vehicule.save()
+            # Rompre le contrat et libérer le véhicule
+            def enregistrer():
+                contrat.save()
+                contrat.vehicule.disponible = True
+                contrat.vehicule.save()
+            ecrire(enregistrer)
 
             messages.success(request, 'Le contrat a été rompu avec succès.')
             return redirect('liste_contrats')
@@ -460,49 +673,24 @@ def detail_contrat(request, id):
 
 @staff_member_required
 def contrat_pdf(request, id):
-    """Génère un PDF simple du contrat et renvoie en téléchargement."""
-    contrat = get_object_or_404(Contrat, id=id)
+    """Renvoie le PDF du contrat en téléchargement, généré une seule fois par version."""
+    contrat = get_object_or_404(Contrat.objects.select_related('client', 'vehicule'), id=id)
 
-    # Génération PDF avec reportlab
+    etag = f'"{pdf_contrats.empreinte(contrat)}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        return response
+
+    # Génération PDF avec reportlab (au premier téléchargement seulement)
     try:
-        from reportlab.lib.pagesizes import A4
-        from reportlab.pdfgen import canvas
-    except Exception:
+        fichier, _ = pdf_contrats.obtenir(contrat)
+    except ImportError:
         return HttpResponse('La génération PDF nécessite la bibliothèque reportlab.', status=500)
 
-    buffer = io.BytesIO()
-    c = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
-
-    # En-tête
-    c.setFont('Helvetica-Bold', 16)
-    c.drawString(40, height - 60, f'Contrat #{contrat.id} - ACA Location')
-
-    c.setFont('Helvetica', 12)
-    y = height - 100
-    lignes = [
-        f'Client: {contrat.client}',
-        f'Vehicule: {contrat.vehicule}',
-        f'Date de création: {contrat.date_creation.strftime("%d/%m/%Y %H:%M") if contrat.date_creation else "-"}',
-        f'Date début: {contrat.date_debut}',
-        f'Date fin: {contrat.date_fin}',
-        f'Nombre de jours: {contrat.nb_jours}',
-    f'Montant total: {contrat.montant_total} FCFA',
-        f'Statut: {contrat.get_statut_display()}',
-    ]
-
-    for ligne in lignes:
-        c.drawString(40, y, ligne)
-        y -= 20
-        if y < 80:
-            c.showPage()
-            y = height - 60
-
-    c.showPage()
-    c.save()
-
-    buffer.seek(0)
-    return FileResponse(buffer, as_attachment=True, filename=f'contrat_{contrat.id}.pdf')
+    response = FileResponse(open(fichier, 'rb'), as_attachment=True, filename=f'contrat_{contrat.id}.pdf')
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
 @staff_member_required
@@ -544,4 +732,71 @@ def calculer_prix(request):
             return JsonResponse({'prix': prix})
         except (Vehicule.DoesNotExist, ValueError):
             return JsonResponse({'error': 'Données invalides'})
-    return JsonResponse({'error': 'Requête invalide'})
\ No newline at end of file
+    return JsonResponse({'error': 'Requête invalide'})
+
+@cache_json(TARIFS)
+def _tarifs_json(request):
+    prix = Vehicule.objects.order_by('id').values_list('id', 'prix_journalier')
+    return JsonResponse(regles_tarifaires(prix, version(TARIFS)[0]))
+
+@staff_member_required
+def api_tarifs(request):
+    """API: règles de prix (paliers de réduction et prix journaliers) pour le calcul local des devis.
+
+    Avec le paramètre ``v`` égal à la version courante, la réponse peut être
+    gardée par le navigateur : l'URL change dès qu'un véhicule est modifié.
+    """
+    response = _tarifs_json(request)
+    if request.GET.get('v') == version(TARIFS)[0]:
+        patch_cache_control(response, private=True, max_age=DUREE_CACHE)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+def _liste_entiers(valeur):
+    return [int(v) for v in valeur.split(',') if v.strip()]
+
+@staff_member_required
+def api_devis(request):
+    """API: grille de prix véhicules × durées.
+
+    Paramètres : ``vehicules`` (ids séparés par des virgules, véhicules disponibles
+    par défaut) et ``durees`` (ex. ``1,7,14``) ou ``jours_min``/``jours_max`` (1 à 60).
+    """
+    try:
+        if request.GET.get('durees'):
+            durees = _liste_entiers(request.GET['durees'])
+        else:
+            durees = None
+            jours_min = int(request.GET.get('jours_min', 1))
+            jours_max = int(request.GET.get('jours_max', 60))
+        ids = _liste_entiers(request.GET['vehicules']) if request.GET.get('vehicules') else None
+    except ValueError:
+        return JsonResponse({'error': 'Données invalides'}, status=400)
+    if durees is None:
+        # Bornes vérifiées avant de construire la liste des durées
+        if not 1 <= jours_min <= jours_max or jours_max - jours_min + 1 > DUREE_MAX_GRILLE:
+            return JsonResponse({'error': 'Durées invalides'}, status=400)
+        durees = list(range(jours_min, jours_max + 1))
+    if not durees or len(durees) > DUREE_MAX_GRILLE or min(durees) < 1:
+        return JsonResponse({'error': 'Durées invalides'}, status=400)
+
+    vehicules = Vehicule.objects.order_by('id')
+    vehicules = vehicules.filter(id__in=ids) if ids is not None else vehicules.filter(disponible=True)
+    vehicules = list(vehicules.values_list('id', 'marque', 'modele', 'prix_journalier')[:VEHICULES_MAX_GRILLE + 1])
+    if len(vehicules) > VEHICULES_MAX_GRILLE:
+        return JsonResponse({'error': 'Trop de véhicules'}, status=400)
+
+    return JsonResponse({
+        'durees': durees,
+        'vehicules': [{'id': v[0], 'vehicule': f"{v[1]} {v[2]}", 'prix_journalier': float(v[3])} for v in vehicules],
+        'prix': grille_prix([v[3] for v in vehicules], durees),
+    })
+
+@staff_member_required
+def telecharger_profil(request, nom):
+    """Télécharge un profil cProfile enregistré par ServerTimingMiddleware (lisible avec pstats ou snakeviz)."""
+    chemin = dossier_profils() / nom
+    if not NOM_PROFIL.match(nom) or not chemin.is_file():
+        raise Http404('Profil introuvable')
+    return FileResponse(open(chemin, 'rb'), as_attachment=True, filename=nom)
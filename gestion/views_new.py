@@ -5,6 +5,7 @@ from django.utils import timezone
 from datetime import date, timedelta
 from django.urls import reverse
 from .models import Client, Vehicule, Contrat
+from .tasks import rappels_du_jour
 from .forms import ClientForm, VehiculeForm, ContratForm
 
 def index(request):
@@ -19,13 +20,8 @@ def index(request):
     contrats_recent = Contrat.objects.all().order_by('-date_creation')[:5]
     vehicules_disponibles = Vehicule.objects.filter(disponible=True)[:5]
     
-    # Envoyer les rappels automatiques
-    contrats_pour_rappel = Contrat.objects.filter(statut='actif')
-    rappels = []
-    for contrat in contrats_pour_rappel:
-        rappel = contrat.envoyer_rappel()
-        if rappel:
-            rappels.append(rappel)
+    # Rappels précalculés une fois par jour (tasks.generer_rappels)
+    rappels = rappels_du_jour()
     
     context = {
         'stats': stats,
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'location_vehicule.settings')
+# Endpoints du dashboard en version asynchrone (settings.VUES_ASYNC)
+os.environ.setdefault('GESTION_VUES_ASYNC', '1')
 
 application = get_asgi_application()
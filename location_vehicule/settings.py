@@ -33,6 +33,9 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'gestion.middleware.ServerTimingMiddleware',
+    'gestion.middleware.InstrumentationSQLMiddleware',
+    'gestion.middleware.AuditMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -41,7 +44,8 @@ ROOT_URLCONF = 'location_vehicule.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Moteur Django dont le rendu est chronométré pour l'en-tête Server-Timing
+        'BACKEND': 'gestion.gabarits.DjangoTemplatesChronometres',
         'DIRS': [ 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -62,7 +66,28 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    # Réplique en lecture des rapports, exports et tableaux de bord (voir gestion/replique.py) :
+    # instantané de db.sqlite3 rafraîchi par `manage.py refresh_replica`
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'replica.sqlite3',
+        'SQLITE_PROFIL': {'query_only': 1, 'mmap_size': 256 * 1024 * 1024, 'cache_size': -64000},
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+DATABASE_ROUTERS = ['gestion.replique.RouteurReplique']
+REPLIQUE_ALIAS = 'replica'
+REPLIQUE_RETARD_MAX = 300  # secondes : au-delà, lecture sur la base principale
+
+# Réglages SQLite appliqués à chaque connexion et écrivain unique (voir gestion/sqlite.py)
+SQLITE_PROFIL = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 5000,  # ms
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64000,  # Kio
+    'temp_store': 'MEMORY',
 }
 
 # Static files (CSS, JavaScript, Images)
@@ -76,6 +101,31 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Journal des instantanés de contrats (voir gestion/journal.py)
+CONTRATS_JOURNAL_DIR = BASE_DIR / 'contrats' / 'journal'
+CONTRATS_JOURNAL_SEGMENT_MAX = 8 * 1024 * 1024  # octets par segment
+CONTRATS_JOURNAL_COMPRESSION = False
+CONTRATS_JOURNAL_ASYNC = True
+
+# Cache des PDF de contrats (voir gestion/pdf_contrats.py)
+CONTRATS_PDF_DIR = BASE_DIR / 'contrats' / 'pdf'
+
+# Images dérivées des photos de véhicules (voir gestion/images.py)
+VEHICULES_IMAGES_ASYNC = True
+
+# Relevé des requêtes SQL par requête HTTP (voir gestion/instrumentation.py)
+SQL_INSTRUMENTATION_TAUX = 1.0 if DEBUG else 0.05  # part des requêtes instrumentées (0 : désactivé)
+SQL_REQUETE_LENTE_MS = 500
+SQL_SEUIL_N_PLUS_UN = 5
+
+# Endpoints du dashboard asynchrones, agrégats calculés en parallèle (voir gestion/tableau_bord.py) :
+# activés par asgi.py, versions synchrones sous WSGI
+VUES_ASYNC = os.environ.get('GESTION_VUES_ASYNC') == '1'
+TABLEAU_BORD_CONCURRENCE = 8  # agrégats simultanés par requête (1 : l'un après l'autre)
+
+# Profils cProfile demandés par le personnel avec ?profil=1 (voir gestion/middleware.py)
+PROFILS_DIR = BASE_DIR / 'profils'
+
 # Messages
 MESSAGE_STORAGE = 'django.contrib.messages.storage.session.SessionStorage'
 